@@ -0,0 +1,89 @@
+import asyncio
+import functools
+import os
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from logic.cache import current_generation, make_key, response_cache
+
+# Max number of uncached computations running at once per route (protects SQLite from stampedes)
+DEFAULT_ROUTE_CONCURRENCY = int(os.getenv("VOSTOKSTAT_ROUTE_CONCURRENCY", "4"))
+
+# key -> future of the computation currently running for it
+_inflight: dict[str, asyncio.Future] = {}
+_route_limits: dict[str, asyncio.Semaphore] = {}
+flight_stats = {"computed": 0, "coalesced": 0, "waiting": 0}
+
+
+def _route_semaphore(name: str, limit: int) -> asyncio.Semaphore:
+    sem = _route_limits.get(name)
+    if sem is None:
+        sem = _route_limits[name] = asyncio.Semaphore(limit)
+    return sem
+
+
+def cached_route(name: str, max_concurrency: int | None = None):
+    """
+    Cache a public GET handler's result per (route, params, data generation).
+    The DB session argument is not part of the key. Errors (HTTPException) are not cached.
+
+    Concurrent identical requests share one in-flight computation (single flight), and
+    at most max_concurrency different computations of this route run at the same time.
+    """
+    limit = max_concurrency or DEFAULT_ROUTE_CONCURRENCY
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            params = {k: v for k, v in kwargs.items() if not isinstance(v, AsyncSession)}
+            key = make_key(name, params, current_generation())
+
+            joined = False
+            while True:
+                cached = response_cache.get(key)
+                if cached is not None:
+                    return cached
+                inflight = _inflight.get(key)
+                if inflight is None:
+                    break
+                if not joined:
+                    flight_stats["coalesced"] += 1
+                    joined = True
+                try:
+                    return await asyncio.shield(inflight)
+                except asyncio.CancelledError:
+                    if not inflight.cancelled() or asyncio.current_task().cancelling():
+                        raise  # We were cancelled ourselves
+                    # The leader's request went away. The first waiter to get here takes
+                    # over (the leader already removed its future), the others join it.
+
+            future = asyncio.get_running_loop().create_future()
+            _inflight[key] = future
+            try:
+                sem = _route_semaphore(name, limit)
+                flight_stats["waiting"] += 1
+                try:
+                    await sem.acquire()
+                finally:
+                    flight_stats["waiting"] -= 1
+                try:
+                    result = await func(*args, **kwargs)
+                finally:
+                    sem.release()
+
+                flight_stats["computed"] += 1
+                response_cache.set(key, result)
+                future.set_result(result)
+                return result
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                future.exception()  # Mark as retrieved when nobody else was waiting
+                raise
+            finally:
+                if _inflight.get(key) is future:
+                    del _inflight[key]
+        return wrapper
+    return decorator
@@ -0,0 +1,169 @@
+"""
+Response compression for the JSON stats payloads.
+
+Encodings, best first: br (needs the brotli package), zstd (needs zstandard), gzip
+(always there). The encoding is picked from Accept-Encoding; bodies smaller than
+COMPRESS_MIN_BYTES, streamed responses and event streams are sent as they are.
+
+Responses of the public stats routes carry an ETag (api/conditional.py), which names
+the exact body: same data version, path, query and encoding. Their compressed form is
+kept in compressed_cache under that tag, so a body is compressed once per data
+version, and later requests for it are answered from there without running the
+handler at all.
+
+Bodies of COMPRESS_THREAD_BYTES or more are compressed in a worker thread, so a large
+mission page does not hold up the event loop for every other request.
+"""
+import asyncio
+import gzip
+import os
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from logic.cache import ResponseCache
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency
+    zstandard = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("VOSTOKSTAT_COMPRESS_MIN_BYTES", "1024"))
+COMPRESSED_CACHE_ENTRIES = int(os.getenv("VOSTOKSTAT_COMPRESSED_CACHE_ENTRIES", "256"))
+COMPRESS_THREAD_BYTES = int(os.getenv("VOSTOKSTAT_COMPRESS_THREAD_BYTES", "65536"))
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+ETAG_SCOPE_KEY = "vostokstat.etag"
+
+# Bodies that go to compressed_cache are compressed once, so they get somewhat slower
+# levels. Not the maximum: gzip 9 takes about 4x as long as 6 for ~10% less, and the
+# first request of every data version waits for it.
+LIVE_LEVELS = {"br": 4, "zstd": 3, "gzip": 5}
+STORED_LEVELS = {"br": 6, "zstd": 6, "gzip": 6}
+
+compressed_cache = ResponseCache(max_entries=COMPRESSED_CACHE_ENTRIES, cache_dir=None)
+compression_stats = {"compressed": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+def available_encodings() -> list:
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+
+ENCODINGS = available_encodings()
+
+
+def negotiate(accept_encoding) -> str | None:
+    """Best encoding we have that the client accepts (q > 0), or None"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, stored: bool = False) -> bytes:
+    level = (STORED_LEVELS if stored else LIVE_LEVELS)[encoding]
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def is_compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "")
+    if "content-encoding" in headers or content_type.startswith("text/event-stream"):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """Compress large bodies; reuse the compressed form of ETag'd bodies"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        etag = scope.get(ETAG_SCOPE_KEY)
+        store_key = f"{etag}:{encoding}" if etag and scope["method"] == "GET" else None
+        if store_key:
+            stored = compressed_cache.get(store_key)
+            if stored is not None:
+                status, raw_headers, body = stored
+                await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+                await send({"type": "http.response.body", "body": body})
+                return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message  # Held until we know what the body looks like
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(scope=start)
+            if message.get("more_body") or len(body) < COMPRESS_MIN_BYTES or not is_compressible(headers):
+                await send(start)
+                await send(message)
+                return
+
+            cacheable = store_key is not None and start["status"] == 200
+            if len(body) >= COMPRESS_THREAD_BYTES:
+                compressed = await asyncio.to_thread(compress, body, encoding, cacheable)
+            else:
+                compressed = compress(body, encoding, stored=cacheable)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            compression_stats["compressed"] += 1
+            compression_stats["bytes_in"] += len(body)
+            compression_stats["bytes_out"] += len(compressed)
+            if cacheable:
+                compressed_cache.set(store_key, (start["status"], list(start["headers"]), compressed))
+
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def get_compression_stats() -> dict:
+    stats = dict(compression_stats)
+    stats["ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 4) if stats["bytes_in"] else 0.0
+    stats["encodings"] = ENCODINGS
+    stats["stored"] = compressed_cache.stats()
+    return stats
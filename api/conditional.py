@@ -0,0 +1,109 @@
+"""
+HTTP conditional caching for the public stats routes.
+
+Every public response depends only on the request (path + query, and the encoding
+negotiated from Accept-Encoding) and on the stored data, and the data version changes
+whenever stored data changes. So the ETag can be derived from (data version, path, query,
+encoding) BEFORE the handler runs: a request whose If-None-Match matches gets a 304
+right away, without touching the handler or the DB. The tag is also handed to the
+compression middleware, which keys its stored bodies on it.
+
+The data version comes from event_log (logic/events.py), so every API worker hands out
+the same tags and they survive restarts. Set VOSTOKSTAT_RELEASE to something new on
+deploys that change response shapes, so clients do not revalidate old bodies.
+
+Last-Modified is the time of the newest change, for information only, and left out
+while that time is unknown (no event rows, or rows without created_at). If-Modified-Since
+is not honored: a change within the same second as an earlier response, or one another
+worker has not seen yet, would get a stale 304. Revalidation goes through the ETag.
+Cache-Control comes from CACHE_POLICIES, the first matching path pattern wins;
+paths without a policy (admin, auth) are passed through untouched.
+"""
+import hashlib
+import os
+import re
+from email.utils import formatdate
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+from api.compression import ETAG_SCOPE_KEY, negotiate
+from logic.cache import data_version
+
+# (path pattern, Cache-Control). "no-cache" = may be stored, but revalidate every time.
+CACHE_POLICIES = [
+    (re.compile(r"^/missions/\d+/?$"), "public, max-age=300"),   # Mission pages only change by admin edits
+    (re.compile(r"^/missions/\d+/"), "public, max-age=300"),     # Event feeds of a mission
+    (re.compile(r"^/missions/?$"), "public, no-cache"),          # New missions show up here first
+    (re.compile(r"^/search/?$"), "public, max-age=30"),
+    (re.compile(r"^/players/"), "public, no-cache"),
+    (re.compile(r"^/squads/"), "public, no-cache"),
+    (re.compile(r"^/leaderboard/"), "public, no-cache"),
+]
+
+RELEASE = os.getenv("VOSTOKSTAT_RELEASE", "")
+
+conditional_stats = {"tagged": 0, "not_modified": 0}
+
+
+def route_policy(path: str):
+    for pattern, cache_control in CACHE_POLICIES:
+        if pattern.match(path):
+            return cache_control
+    return None
+
+
+def make_etag(version: tuple, path: str, query: bytes, encoding: str | None = None) -> str:
+    # Parameter order does not matter: ?a=1&b=2 and ?b=2&a=1 share the tag
+    params = b"&".join(sorted(query.split(b"&"))) if query else b""
+    raw = f"{RELEASE}|{version[0]}.{version[1]}|{path}|{encoding or 'identity'}|".encode("utf-8") + params
+    return '"' + hashlib.sha1(raw).hexdigest()[:24] + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 asks for If-None-Match (proxies may add W/)
+    return any(t.strip().removeprefix("W/") == etag for t in if_none_match.split(","))
+
+
+class ConditionalGetMiddleware:
+    """ETag / Last-Modified / Cache-Control on public GET routes, 304 without running the handler"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+        cache_control = route_policy(scope["path"])
+        if cache_control is None:
+            return await self.app(scope, receive, send)
+
+        # Read before the handler runs: the body can only be newer than the tag, never older
+        version, modified = data_version()
+        if version is None:
+            return await self.app(scope, receive, send)  # Not loaded yet (first relay read)
+        request_headers = Headers(scope=scope)
+        encoding = negotiate(request_headers.get("accept-encoding"))
+        etag = make_etag(version, scope["path"], scope.get("query_string", b""), encoding)
+        validators = {"ETag": etag}
+        if modified:
+            validators["Last-Modified"] = formatdate(modified, usegmt=True)
+        validators.update({"Cache-Control": cache_control, "Vary": "Accept-Encoding"})
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match, etag):
+            conditional_stats["not_modified"] += 1
+            return await Response(status_code=304, headers=validators)(scope, receive, send)
+
+        scope[ETAG_SCOPE_KEY] = etag
+
+        async def send_with_validators(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                for name, value in validators.items():
+                    headers[name] = value
+                conditional_stats["tagged"] += 1
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
@@ -6,41 +6,54 @@ import time
 
 
 from api.routers import missions, players, squads, admin
-from logic.download_mission import main as download_main
+from logic.ingest_worker import EMBEDDED_INGEST, UPDATE_INTERVAL, IngestWorker
+from logic.mission_pars import backfill_death_events, migrate_event_blobs
+from logic.search_index import ensure_search_index
+from logic.squad_history import ensure_squad_history
+from logic.leaderboards import ensure_leaderboards
+from logic.events import relay_events
+from logic.autocomplete import AUTOCOMPLETE_ENABLED, autocomplete
 from database import init_db
 
 
-# Background task to run the download logic
+# Background ingestion inside the API process. With several API processes (or the
+# standalone worker, main.py) only the holder of the ingest lease downloads; the
+# others stand by. VOSTOKSTAT_EMBEDDED_INGEST=0 leaves ingestion to main.py.
+INGEST_START_DELAY = 5  # Seconds; the first round waits until the server is up
+
 async def background_mission_updater():
     print("Background mission updater started.")
     # Initial run might take time, so we delay it slightly to let server start
-    await asyncio.sleep(5) 
+    await asyncio.sleep(INGEST_START_DELAY)
     
-    print("=== Initial mission sync (init mode) ===")
+    worker = IngestWorker()
     try:
-        # Run init first to backfill any missing missions based on config
-        await asyncio.to_thread(download_main, mode="init")
-    except Exception as e:
-        print(f"Error in initial sync: {e}")
+        while True:
+            try:
+                # Run the synchronous download/process logic in a separate thread
+                await asyncio.to_thread(worker.step)
+            except Exception as e:
+                print(f"Error in background update: {e}")
+            
+            await asyncio.sleep(UPDATE_INTERVAL)
+    finally:
+        await asyncio.to_thread(worker.release)
+
+def load_scheduler():
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    return AsyncIOScheduler
 
-    while True:
+async def deferred_startup(state: dict):
+    """Startup work no request waits for: runs once the API is already serving"""
+    if AUTOCOMPLETE_ENABLED:
+        # Lookups build it themselves if they come first
         try:
-            print("=== Creating task for mission update ===")
-            # Run the synchronous download/process logic in a separate thread
-            await asyncio.to_thread(download_main, mode="update")
-            print("=== Update finished. Sleeping... ===")
+            await asyncio.to_thread(autocomplete.build_sync)
         except Exception as e:
-            print(f"Error in background update: {e}")
-        
-        await asyncio.sleep(20)  # Check every 20 seconds
+            print(f"Autocomplete build failed: {e}")
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Startup
-    await init_db()
-    
-    # Scheduler
-    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    # Scheduler. apscheduler is imported in a thread, importing it would stall the event loop
+    AsyncIOScheduler = await asyncio.to_thread(load_scheduler)
     from logic.backup import run_backup_task
     from database import get_app_config_sync
     
@@ -50,16 +63,38 @@ async def lifespan(app: FastAPI):
     scheduler.add_job(run_backup_task, 'cron', day_of_week='wed,sun', hour=23, minute=30, args=[get_app_config_sync])
     
     scheduler.start()
+    state["scheduler"] = scheduler
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: only idempotent checks that are cheap on an up-to-date DB (each one-off
+    # migration below returns after a marker or a LIMIT 1 lookup). Ingestion, including
+    # the initial sync of an empty DB, happens in the background.
+    started = time.perf_counter()
+    await init_db()
+    await asyncio.to_thread(backfill_death_events)
+    await asyncio.to_thread(migrate_event_blobs)
+    await asyncio.to_thread(ensure_search_index)
+    await asyncio.to_thread(ensure_squad_history)
+    await asyncio.to_thread(ensure_leaderboards)
     
-    task = asyncio.create_task(background_mission_updater())
+    state = {}
+    tasks = [asyncio.create_task(relay_events()), asyncio.create_task(deferred_startup(state))]
+    if EMBEDDED_INGEST:
+        tasks.append(asyncio.create_task(background_mission_updater()))
+    print(f"API startup took {time.perf_counter() - started:.2f}s")
     yield
     # Shutdown
-    task.cancel()
-    scheduler.shutdown()
-    try:
-        await task
-    except asyncio.CancelledError:
-        print("Background updater cancelled.")
+    for task in tasks:
+        task.cancel()
+    if "scheduler" in state:
+        state["scheduler"].shutdown()
+    for task in tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    print("Background tasks cancelled.")
 
 app = FastAPI(title="VostokStat API", lifespan=lifespan)
 
@@ -68,6 +103,14 @@ app = FastAPI(title="VostokStat API", lifespan=lifespan)
 from starlette.middleware.sessions import SessionMiddleware
 import os
 
+# gzip/br/zstd for large bodies; innermost, so it sees the ETag set by ConditionalGetMiddleware
+from api.compression import CompressionMiddleware
+app.add_middleware(CompressionMiddleware)
+
+# ETag / 304 for public stats routes. Added early, so it sits inside CORS and 304s get CORS headers too
+from api.conditional import ConditionalGetMiddleware
+app.add_middleware(ConditionalGetMiddleware)
+
 # Add Session Middleware for Auth (Required for api/routers/admin.py)
 app.add_middleware(SessionMiddleware, secret_key="vostok-secret-key-secure")
 
@@ -85,13 +128,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Keyset cursor of GET /missions/ (the body stays a plain list of missions)
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Per-route latency and SQL query counts; outermost, so it times everything the client waits for
+from api.timing import TimingMiddleware
+app.add_middleware(TimingMiddleware)
+
 app.include_router(missions.router)
 app.include_router(players.router)
 app.include_router(squads.router)
-from api.routers import admin, squads, players, missions, admin_rotations, search
+from api.routers import admin, squads, players, missions, admin_rotations, rotations, search, leaderboards, events, metrics
+app.include_router(rotations.router)
 app.include_router(search.router)
+app.include_router(leaderboards.router)
+app.include_router(events.router)
+app.include_router(metrics.router)
 app.include_router(admin.router)
 app.include_router(admin_rotations.router)
 
@@ -0,0 +1,92 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+A cursor is the sort key of the last row on the previous page, packed into an opaque
+url-safe token. The next page filters on "sort key after the cursor" instead of
+skipping rows, so it is served from the index and deep pages cost the same as the
+first one. Callers that don't pass a cursor can still use skip (OFFSET).
+
+Totals for admin tables come from cached_count(), which runs the COUNT once per
+data generation instead of on every page.
+"""
+import base64
+import json
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_, select
+
+from logic.cache import current_generation, make_key, response_cache
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def after_cursor(columns, values, descending: bool):
+    """Rows strictly after `values` in (columns...) order, as an index-friendly OR chain"""
+    clauses = []
+    for i, col in enumerate(columns):
+        step = col < values[i] if descending else col > values[i]
+        clauses.append(and_(*[columns[j] == values[j] for j in range(i)], step))
+    return or_(*clauses)
+
+
+def paginate(stmt, columns, cursor: Optional[str], skip: int, limit: int, descending: bool = True):
+    """
+    Order stmt by columns and apply the cursor (or skip when there is none).
+    Fetches one extra row so page_result() can tell whether there is a next page.
+    """
+    if cursor:
+        stmt = stmt.filter(after_cursor(columns, decode_cursor(cursor, len(columns)), descending))
+    elif skip:
+        stmt = stmt.offset(skip)
+    order = [c.desc() if descending else c.asc() for c in columns]
+    return stmt.order_by(*order).limit(limit + 1)
+
+
+def page_result(rows, limit: int, key):
+    """(rows of this page, cursor of the next page or None). key(row) -> sort key values"""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
+
+
+def page_list(items: list, cursor: Optional[str], limit: int) -> dict:
+    """
+    Cursor pagination over an ordered in-memory list (e.g. events decoded from a blob).
+    The cursor is a position; the list does not change within a data generation.
+    """
+    start = decode_cursor(cursor, 1)[0] if cursor else 0
+    if not isinstance(start, int) or start < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    end = start + limit
+    return {
+        "items": items[start:end],
+        "total": len(items),
+        "next_cursor": encode_cursor(end) if end < len(items) else None,
+    }
+
+
+async def cached_count(db, name: str, params: dict, stmt) -> int:
+    """COUNT of stmt's rows, cached until the data generation changes"""
+    key = make_key(f"count:{name}", params, current_generation())
+    total = response_cache.get(key)
+    if total is None:
+        total = await db.scalar(select(func.count()).select_from(stmt.subquery()))
+        response_cache.set(key, total)
+    return total
@@ -0,0 +1,164 @@
+"""
+Fast JSON responses for large public payloads.
+
+FastAPI validates a handler's return value against response_model and runs it through
+jsonable_encoder before encoding it with the stdlib json. For handlers that build the
+payload themselves from trusted data, @fast_response skips both and encodes the dict
+with orjson (stdlib json if orjson is not installed). The route keeps response_model,
+so the OpenAPI docs are unchanged.
+
+Like response_model, the model still decides which keys go out: dicts are trimmed to
+the model's fields (by alias) and missing fields get their defaults, without
+validating the values.
+
+VOSTOKSTAT_STRICT_RESPONSES=1 (for tests) validates every payload against the model
+first, and sends the validated form, which is what FastAPI would have sent.
+
+Serialization time and body size are recorded per route in serialization_stats.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import types
+import typing
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # Optional dependency
+    orjson = None
+
+STRICT_RESPONSES = os.getenv("VOSTOKSTAT_STRICT_RESPONSES", "0").lower() in ("1", "true", "yes")
+
+_stats_lock = threading.Lock()
+serialization_stats: dict[str, dict] = {}
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def record_serialization(name: str, seconds: float, size: int):
+    with _stats_lock:
+        st = serialization_stats.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "bytes": 0})
+        ms = seconds * 1000
+        st["count"] += 1
+        st["total_ms"] += ms
+        st["max_ms"] = max(st["max_ms"], ms)
+        st["bytes"] += size
+
+
+def get_serialization_stats() -> dict:
+    with _stats_lock:
+        return {
+            name: {
+                "count": st["count"],
+                "avg_ms": round(st["total_ms"] / st["count"], 3) if st["count"] else 0.0,
+                "max_ms": round(st["max_ms"], 3),
+                "avg_bytes": st["bytes"] // st["count"] if st["count"] else 0,
+            }
+            for name, st in serialization_stats.items()
+        }
+
+
+class ModelShape:
+    """Output keys of a model: key (alias or name) -> (shape of the value, default)"""
+
+    def __init__(self):
+        self.fields: dict[str, tuple] = {}
+
+
+_NO_DEFAULT = object()
+FLOAT = "float"  # Shape of float fields: ints are sent as floats, like the validated form
+_model_shapes: dict[type, ModelShape] = {}
+
+
+def build_shape(annotation):
+    """
+    What trim() needs to know about a type: a ModelShape, ("list", shape), ("dict", shape),
+    FLOAT, or None for values sent as they are.
+    """
+    if annotation is float:
+        return FLOAT
+    origin = typing.get_origin(annotation)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        shape = _model_shapes.get(annotation)
+        if shape is None:
+            shape = _model_shapes[annotation] = ModelShape()  # Registered first, models may nest themselves
+            for field_name, field in annotation.model_fields.items():
+                default = _NO_DEFAULT if field.is_required() else field.get_default(call_default_factory=True)
+                shape.fields[field.alias or field_name] = (build_shape(field.annotation), default)
+        return shape
+    if origin in (list, set, frozenset, tuple):
+        args = [a for a in typing.get_args(annotation) if a is not Ellipsis]
+        item = build_shape(args[0]) if len(args) == 1 else None
+        return ("list", item) if item is not None else None
+    if origin is dict:
+        args = typing.get_args(annotation)
+        value = build_shape(args[1]) if len(args) == 2 else None
+        return ("dict", value) if value is not None else None
+    if origin in (typing.Union, types.UnionType):
+        shapes = [build_shape(a) for a in typing.get_args(annotation) if a is not type(None)]
+        return shapes[0] if len(shapes) == 1 else None
+    return None
+
+
+def trim(value, shape, fill_defaults: bool):
+    """Keep only the keys the response model declares, in its field order"""
+    if shape is None or value is None:
+        return value
+    if shape is FLOAT:
+        return float(value) if type(value) is int else value
+    if isinstance(shape, ModelShape):
+        if isinstance(value, BaseModel):
+            return value.model_dump(mode="json", by_alias=True, exclude_unset=not fill_defaults)
+        if not isinstance(value, dict):
+            return value
+        out = {}
+        for key, (sub, default) in shape.fields.items():
+            if key in value:
+                out[key] = trim(value[key], sub, fill_defaults)
+            elif fill_defaults and default is not _NO_DEFAULT:
+                out[key] = default
+        return out
+    kind, sub = shape
+    if kind == "list" and isinstance(value, (list, tuple)):
+        return [trim(v, sub, fill_defaults) for v in value]
+    if kind == "dict" and isinstance(value, dict):
+        return {k: trim(v, sub, fill_defaults) for k, v in value.items()}
+    return value
+
+
+def fast_response(name: str, model=None, exclude_unset: bool = False):
+    """
+    Send the handler's result with orjson, trimmed to the model's fields. Put it between the router decorator
+    and @cached_route, so cached results skip validation too.
+    """
+    adapter = TypeAdapter(model) if model is not None else None
+    shape = build_shape(model) if model is not None else None
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            result = await func(*args, **kwargs)
+            if isinstance(result, Response):
+                return result
+
+            started = time.perf_counter()
+            if STRICT_RESPONSES and adapter is not None:
+                result = adapter.dump_python(
+                    adapter.validate_python(result), mode="json", by_alias=True, exclude_unset=exclude_unset
+                )
+            else:
+                result = trim(result, shape, fill_defaults=not exclude_unset)
+            body = dumps(result)
+            record_serialization(name, time.perf_counter() - started, len(body))
+            return Response(body, media_type="application/json")
+        return wrapper
+    return decorator
@@ -3,13 +3,27 @@ from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from sqlalchemy.future import select
-from sqlalchemy import delete, update, func, desc, or_
+from sqlalchemy import delete, update, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_db, GlobalSquad, AdminUser, AsyncSessionLocal, Mission, PlayerStat, AppConfig, engine, get_app_config_sync
-import bcrypt
+from sqlalchemy.orm import undefer
+from database import casefold, get_db, get_write_db, GlobalSquad, AdminUser, AsyncSessionLocal, Mission, PlayerStat, AppConfig, engine, get_app_config_sync, PlayerSquadRun, LeaderboardEntry, IngestProfile
 import os
-from logic.download_mission import main as download_main
+from logic.ingest_worker import request_ingest
 from logic.backup import create_backup_zip, run_backup_task
+from logic.cache import current_generation, data_version, response_cache
+from api.caching import flight_stats
+from api.responses import get_serialization_stats
+from api.conditional import conditional_stats
+from api.compression import get_compression_stats
+from api.timing import get_timing_stats, reset_timing_stats
+from logic.query_stats import get_query_stats, reset_query_stats
+from logic.events import broadcaster, commit_change
+from api.pagination import paginate, page_result, cached_count
+from logic.search_index import names_filter, refresh_players, refresh_missions, refresh_squads, rebuild_search_index
+from logic.squad_history import rebuild_players as rebuild_squad_history
+from logic import leaderboards
+from logic.squad_registry import squad_registry
+from api.schemas import AdminMissionList, AdminMissionRow, AdminPlayerList, AdminPlayerRow, AdminSquadStatList, AdminSquadStatRow
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -47,6 +61,7 @@ async def login(request: Request, login_data: LoginRequest):
          raise HTTPException(status_code=401, detail="Invalid credentials")
          
     # Check password
+    import bcrypt  # Loaded on first login, not at API startup
     try:
         if bcrypt.checkpw(login_data.password.encode("utf-8"), user.password_hash.encode("utf-8")):
             request.session.update({"token": user.username})
@@ -74,92 +89,111 @@ class MissionUpdate(BaseModel):
     total_players: Optional[int] = None
     win_side: Optional[str] = None
 
-@router.get("/missions")
+@router.get("/missions", response_model=AdminMissionList)
 async def list_missions(
     skip: int = 0, 
     limit: int = 50, 
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db), 
     admin: str = Depends(get_current_admin)
 ):
     query = select(Mission)
     if search:
-        query = query.filter(Mission.mission_name.ilike(f"%{search}%"))
+        query = query.filter(Mission.mission_name.in_(await names_filter(db, "mission", search)))
     
-    count_query = select(func.count()).select_from(query.subquery())
-    total = await db.scalar(count_query)
+    total = await cached_count(db, "admin.missions", {"search": search}, query)
     
     # Sort by date desc
-    query = query.order_by(desc(Mission.file_date)).offset(skip).limit(limit)
+    query = paginate(query, [Mission.file_date, Mission.id], cursor, skip, limit)
     
     result = await db.execute(query)
-    missions = result.scalars().all()
-    return {"items": missions, "total": total}
+    missions, next_cursor = page_result(result.scalars().all(), limit, lambda m: (m.file_date, m.id))
+    return {"items": missions, "total": total, "next_cursor": next_cursor}
 
-@router.put("/missions/{id}")
-async def update_mission(id: int, data: MissionUpdate, db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_admin)):
+@router.put("/missions/{id}", response_model=AdminMissionRow)
+async def update_mission(id: int, data: MissionUpdate, db: AsyncSession = Depends(get_write_db), admin: str = Depends(get_current_admin)):
     mission = await db.get(Mission, id)
     if not mission:
         raise HTTPException(status_code=404, detail="Mission not found")
     
+    old_name = mission.mission_name
+    old_date = mission.file_date
     if data.mission_name is not None: mission.mission_name = data.mission_name
     if data.map_name is not None: mission.map_name = data.map_name
     if data.file_date is not None: mission.file_date = data.file_date
     if data.total_players is not None: mission.total_players = data.total_players
     if data.win_side is not None: mission.win_side = data.win_side
     
-    await db.commit()
+    await db.flush()
+    await db.run_sync(lambda s: refresh_missions(s, {old_name, mission.mission_name}))
+    if mission.file_date != old_date:
+        res_names = await db.execute(select(PlayerStat.name).where(PlayerStat.mission_id == id).distinct())
+        player_names = {n for n in res_names.scalars().all() if n}
+        await db.run_sync(lambda s: rebuild_squad_history(s, {n.lower() for n in player_names}))
+        await db.run_sync(lambda s: leaderboards.refresh_players(s, player_names))
+    await commit_change(db, "missions", id=id)
     await db.refresh(mission)
     return mission
 
 @router.delete("/missions/all")
-async def delete_all_missions(background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_admin)):
+async def delete_all_missions(db: AsyncSession = Depends(get_write_db), admin: str = Depends(get_current_admin)):
     # Explicitly clear all tables to ensure no orphans remain
     await db.execute(delete(MissionSquadStat))
     await db.execute(delete(PlayerStat))
     await db.execute(delete(Mission))
-    await db.commit()
-    
-    # Trigger full rebuild
-    background_tasks.add_task(download_main, mode="init")
-    return {"message": "All missions deleted. Database cleared. Reloading started in background..."}
+    await db.run_sync(rebuild_search_index)
+    await db.execute(delete(PlayerSquadRun))
+    await db.execute(delete(LeaderboardEntry))
+    # Full rebuild by whichever process holds the ingest lease (API or standalone worker)
+    await db.run_sync(lambda s: request_ingest(s, "init"))
+    await commit_change(db, "missions", all=True)
+    return {"message": "All missions deleted. Database cleared. Reload requested from the ingestion worker..."}
 
 @router.delete("/missions/{id}")
-async def delete_mission(id: int, db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_admin)):
+async def delete_mission(id: int, db: AsyncSession = Depends(get_write_db), admin: str = Depends(get_current_admin)):
     stmt = select(Mission).where(Mission.id == id)
     result = await db.execute(stmt)
     obj = result.scalars().first()
     if not obj:
         raise HTTPException(status_code=404, detail="Mission not found")
     
+    res_names = await db.execute(select(PlayerStat.name).where(PlayerStat.mission_id == id).distinct())
+    player_names = set(res_names.scalars().all())
+    mission_name = obj.mission_name
+
     await db.delete(obj)
-    await db.commit()
+    await db.flush()
+    await db.run_sync(lambda s: (refresh_players(s, player_names), refresh_missions(s, {mission_name})))
+    await db.run_sync(lambda s: rebuild_squad_history(s, {n.lower() for n in player_names if n}))
+    await db.run_sync(lambda s: leaderboards.refresh_players(s, player_names))
+    await commit_change(db, "missions", id=id)
     return {"message": "Mission deleted"}
 
 # --- Players Management ---
 
-@router.get("/players")
+@router.get("/players", response_model=AdminPlayerList)
 async def list_players(
     skip: int = 0, 
     limit: int = 50, 
     search: Optional[str] = None,
     mission_id: Optional[int] = None,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db), 
     admin: str = Depends(get_current_admin)
 ):
     query = select(PlayerStat)
     if search:
-        query = query.filter(PlayerStat.name.ilike(f"%{search}%"))
+        query = query.filter(PlayerStat.name.in_(await names_filter(db, "player", search)))
     if mission_id:
         query = query.filter(PlayerStat.mission_id == mission_id)
     
-    count_query = select(func.count()).select_from(query.subquery())
-    total = await db.scalar(count_query)
+    total = await cached_count(db, "admin.players", {"search": search, "mission_id": mission_id}, query)
 
-    query = query.offset(skip).limit(limit)
+    query = paginate(query, [PlayerStat.id], cursor, skip, limit, descending=False)
     result = await db.execute(query)
-    players = result.scalars().all()
-    return {"items": players, "total": total}
+    players, next_cursor = page_result(result.scalars().all(), limit, lambda p: (p.id,))
+    return {"items": players, "total": total, "next_cursor": next_cursor}
 
 class PlayerUpdate(BaseModel):
     name: Optional[str] = None
@@ -167,18 +201,23 @@ class PlayerUpdate(BaseModel):
     side: Optional[str] = None
     mission_id: Optional[int] = None
 
-@router.put("/players/{id}")
-async def update_player(id: int, data: PlayerUpdate, db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_admin)):
+@router.put("/players/{id}", response_model=AdminPlayerRow)
+async def update_player(id: int, data: PlayerUpdate, db: AsyncSession = Depends(get_write_db), admin: str = Depends(get_current_admin)):
     player = await db.get(PlayerStat, id)
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
     
+    old_name = player.name
     if data.name is not None: player.name = data.name
     if data.squad is not None: player.squad = data.squad
     if data.side is not None: player.side = data.side
     if data.mission_id is not None: player.mission_id = data.mission_id
     
-    await db.commit()
+    await db.flush()
+    await db.run_sync(lambda s: refresh_players(s, {old_name, player.name}))
+    await db.run_sync(lambda s: rebuild_squad_history(s, {n.lower() for n in (old_name, player.name) if n}))
+    await db.run_sync(lambda s: leaderboards.refresh_players(s, {old_name, player.name}))
+    await commit_change(db, "players", id=id)
     await db.refresh(player)
     return player
 
@@ -187,7 +226,7 @@ class MergeRequest(BaseModel):
     target_name: str
 
 @router.post("/players/merge")
-async def merge_players(data: MergeRequest, db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_admin)):
+async def merge_players(data: MergeRequest, db: AsyncSession = Depends(get_write_db), admin: str = Depends(get_current_admin)):
     if data.source_name == data.target_name:
         raise HTTPException(status_code=400, detail="Source and target must be different")
         
@@ -197,7 +236,10 @@ async def merge_players(data: MergeRequest, db: AsyncSession = Depends(get_db),
         .values(name=data.target_name)
     )
     result = await db.execute(stmt)
-    await db.commit()
+    await db.run_sync(lambda s: refresh_players(s, {data.source_name, data.target_name}))
+    await db.run_sync(lambda s: rebuild_squad_history(s, {data.source_name.lower(), data.target_name.lower()}))
+    await db.run_sync(lambda s: leaderboards.refresh_players(s, {data.source_name, data.target_name}))
+    await commit_change(db, "players", name=data.target_name)
     
     if result.rowcount == 0:
         return {"message": "No records found for source player", "merged": 0}
@@ -208,28 +250,28 @@ async def merge_players(data: MergeRequest, db: AsyncSession = Depends(get_db),
 
 from database import MissionSquadStat
 
-@router.get("/mission_squad_stats")
+@router.get("/mission_squad_stats", response_model=AdminSquadStatList)
 async def list_mission_squad_stats(
     skip: int = 0, 
     limit: int = 50, 
     search: Optional[str] = None,
     mission_id: Optional[int] = None,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db), 
     admin: str = Depends(get_current_admin)
 ):
     query = select(MissionSquadStat)
     if search:
-        query = query.filter(MissionSquadStat.squad_tag.ilike(f"%{search}%"))
+        query = query.filter(casefold(MissionSquadStat.squad_tag).contains(search.lower()))
     if mission_id:
         query = query.filter(MissionSquadStat.mission_id == mission_id)
     
-    count_query = select(func.count()).select_from(query.subquery())
-    total = await db.scalar(count_query)
+    total = await cached_count(db, "admin.mission_squad_stats", {"search": search, "mission_id": mission_id}, query)
         
-    query = query.offset(skip).limit(limit)
+    query = paginate(query, [MissionSquadStat.id], cursor, skip, limit, descending=False)
     result = await db.execute(query)
-    stats = result.scalars().all()
-    return {"items": stats, "total": total}
+    stats, next_cursor = page_result(result.scalars().all(), limit, lambda st: (st.id,))
+    return {"items": stats, "total": total, "next_cursor": next_cursor}
 
 class MissionSquadStatUpdate(BaseModel):
     squad_tag: Optional[str] = None
@@ -238,8 +280,8 @@ class MissionSquadStatUpdate(BaseModel):
     death: Optional[int] = None
     mission_id: Optional[int] = None
 
-@router.put("/mission_squad_stats/{id}")
-async def update_mission_squad_stat(id: int, data: MissionSquadStatUpdate, db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_admin)):
+@router.put("/mission_squad_stats/{id}", response_model=AdminSquadStatRow)
+async def update_mission_squad_stat(id: int, data: MissionSquadStatUpdate, db: AsyncSession = Depends(get_write_db), admin: str = Depends(get_current_admin)):
     stat = await db.get(MissionSquadStat, id)
     if not stat:
         raise HTTPException(status_code=404, detail="Stat not found")
@@ -250,7 +292,7 @@ async def update_mission_squad_stat(id: int, data: MissionSquadStatUpdate, db: A
     if data.death is not None: stat.death = data.death
     if data.mission_id is not None: stat.mission_id = data.mission_id
 
-    await db.commit()
+    await commit_change(db, "mission_squad_stats", id=id)
     await db.refresh(stat)
     return stat
 
@@ -261,20 +303,28 @@ class SquadCreate(BaseModel):
     tags: List[str] # List of tags/aliases
 
 @router.post("/squads")
-async def add_squad(squad: SquadCreate, db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_admin)):
+async def add_squad(squad: SquadCreate, db: AsyncSession = Depends(get_write_db), admin: str = Depends(get_current_admin)):
     stmt = select(GlobalSquad).where(GlobalSquad.name == squad.name)
     result = await db.execute(stmt)
     existing = result.scalars().first()
     
     if existing:
         existing.tags = squad.tags
-        await db.commit()
+        await db.flush()
+        await db.run_sync(refresh_squads)
+        await db.run_sync(leaderboards.rebuild_rotations)  # Rotation whitelists expand to squad tags
+        await commit_change(db, "squads", name=squad.name)
+        squad_registry.invalidate()
         await db.refresh(existing)
         return {"message": "Squad updated", "squad": existing.name, "tags": existing.tags}
     
     new_squad = GlobalSquad(name=squad.name, tags=squad.tags)
     db.add(new_squad)
-    await db.commit()
+    await db.flush()
+    await db.run_sync(refresh_squads)
+    await db.run_sync(leaderboards.rebuild_rotations)
+    await commit_change(db, "squads", name=squad.name)
+    squad_registry.invalidate()
     await db.refresh(new_squad)
     return {"message": "Squad added", "squad": new_squad.name, "tags": new_squad.tags}
 
@@ -283,19 +333,19 @@ async def get_squads(
     skip: int = 0, 
     limit: int = 50, 
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db), 
     admin: str = Depends(get_current_admin)
 ):
     query = select(GlobalSquad)
     if search:
-        query = query.filter(GlobalSquad.name.ilike(f"%{search}%"))
+        query = query.filter(casefold(GlobalSquad.name).contains(search.lower()))
         
-    count_query = select(func.count()).select_from(query.subquery())
-    total = await db.scalar(count_query)
+    total = await cached_count(db, "admin.squads", {"search": search}, query)
 
-    query = query.order_by(GlobalSquad.name).offset(skip).limit(limit)
+    query = paginate(query, [GlobalSquad.name, GlobalSquad.id], cursor, skip, limit, descending=False)
     result = await db.execute(query)
-    squads = result.scalars().all()
+    squads, next_cursor = page_result(result.scalars().all(), limit, lambda sq: (sq.name, sq.id))
     
     output = []
     for s in squads:
@@ -304,10 +354,10 @@ async def get_squads(
             "name": s.name,
             "tags": s.tags if s.tags else []
         })
-    return {"items": output, "total": total}
+    return {"items": output, "total": total, "next_cursor": next_cursor}
 
 @router.delete("/squads/{name}")
-async def delete_squad(name: str, db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_admin)):
+async def delete_squad(name: str, db: AsyncSession = Depends(get_write_db), admin: str = Depends(get_current_admin)):
     stmt = select(GlobalSquad).where(GlobalSquad.name == name)
     result = await db.execute(stmt)
     existing = result.scalars().first()
@@ -316,7 +366,11 @@ async def delete_squad(name: str, db: AsyncSession = Depends(get_db), admin: str
         raise HTTPException(status_code=404, detail="Squad not found")
         
     await db.delete(existing)
-    await db.commit()
+    await db.flush()
+    await db.run_sync(refresh_squads)
+    await db.run_sync(leaderboards.rebuild_rotations)
+    await commit_change(db, "squads", name=name)
+    squad_registry.invalidate()
     return {"message": "Squad deleted"}
 
 # --- App Config ---
@@ -331,7 +385,7 @@ async def list_config(db: AsyncSession = Depends(get_db), admin: str = Depends(g
     return result.scalars().all()
 
 @router.post("/config")
-async def update_config(item: ConfigItem, db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_admin)):
+async def update_config(item: ConfigItem, db: AsyncSession = Depends(get_write_db), admin: str = Depends(get_current_admin)):
     stmt = select(AppConfig).where(AppConfig.key == item.key)
     result = await db.execute(stmt)
     existing = result.scalars().first()
@@ -341,17 +395,27 @@ async def update_config(item: ConfigItem, db: AsyncSession = Depends(get_db), ad
     else:
         db.add(AppConfig(key=item.key, value=item.value))
     
-    await db.commit()
+    if item.key in leaderboards.THRESHOLD_DEFAULTS:
+        await db.flush()
+        await db.run_sync(leaderboards.rerank_all)
+        await commit_change(db, "leaderboards", key=item.key)
+    else:
+        await db.commit()
     return {"message": "Config updated"}
 
 @router.delete("/config/{key}")
-async def delete_config(key: str, db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_admin)):
+async def delete_config(key: str, db: AsyncSession = Depends(get_write_db), admin: str = Depends(get_current_admin)):
     stmt = select(AppConfig).where(AppConfig.key == key)
     result = await db.execute(stmt)
     existing = result.scalars().first()
     if existing:
         await db.delete(existing)
-        await db.commit()
+        if key in leaderboards.THRESHOLD_DEFAULTS:
+            await db.flush()
+            await db.run_sync(leaderboards.rerank_all)
+            await commit_change(db, "leaderboards", key=key)
+        else:
+            await db.commit()
     return {"message": "Config deleted"}
 
 # --- Admin Users (Root only) ---
@@ -371,7 +435,8 @@ async def list_users(db: AsyncSession = Depends(get_db), admin: str = Depends(ge
     return [{"id": u.id, "username": u.username} for u in users]
 
 @router.post("/users")
-async def create_user(user: AdminUserCreate, db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_root_admin)):
+async def create_user(user: AdminUserCreate, db: AsyncSession = Depends(get_write_db), admin: str = Depends(get_current_root_admin)):
+    import bcrypt
     hashed = bcrypt.hashpw(user.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
     new_user = AdminUser(username=user.username, password_hash=hashed)
     db.add(new_user)
@@ -382,7 +447,7 @@ async def create_user(user: AdminUserCreate, db: AsyncSession = Depends(get_db),
     return {"message": "User created"}
 
 @router.delete("/users/{id}")
-async def delete_user(id: int, db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_root_admin)):
+async def delete_user(id: int, db: AsyncSession = Depends(get_write_db), admin: str = Depends(get_current_root_admin)):
     stmt = select(AdminUser).where(AdminUser.id == id)
     result = await db.execute(stmt)
     existing = result.scalars().first()
@@ -398,7 +463,7 @@ async def delete_user(id: int, db: AsyncSession = Depends(get_db), admin: str =
     return {"message": "User deleted"}
 
 @router.put("/users/{id}")
-async def update_user(id: int, user: AdminUserUpdate, db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_root_admin)):
+async def update_user(id: int, user: AdminUserUpdate, db: AsyncSession = Depends(get_write_db), admin: str = Depends(get_current_root_admin)):
     stmt = select(AdminUser).where(AdminUser.id == id)
     result = await db.execute(stmt)
     existing = result.scalars().first()
@@ -407,6 +472,7 @@ async def update_user(id: int, user: AdminUserUpdate, db: AsyncSession = Depends
          raise HTTPException(status_code=404, detail="User not found")
          
     if user.password:
+        import bcrypt
         hashed = bcrypt.hashpw(user.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
         existing.password_hash = hashed
         
@@ -450,3 +516,58 @@ async def download_backup(filename: str, admin: str = Depends(get_current_admin)
         raise HTTPException(status_code=404, detail="Backup not found")
     
     return FileResponse(file_path, filename=filename)
+
+
+# --- Response Cache ---
+
+@router.get("/cache")
+async def get_cache_stats(admin: str = Depends(get_current_admin)):
+    return {
+        "generation": current_generation(), "data_version": data_version()[0], **response_cache.stats(), "inflight": flight_stats,
+        "serialization": get_serialization_stats(), "conditional": conditional_stats,
+        "compression": get_compression_stats(), "events": broadcaster.stats(),
+    }
+
+@router.post("/cache/clear")
+async def clear_cache(db: AsyncSession = Depends(get_write_db), admin: str = Depends(get_current_admin)):
+    await commit_change(db, "cache")  # Every API process drops its cached responses
+    response_cache.clear()
+    return {"message": "Cache cleared"}
+
+# --- Timing ---
+
+@router.get("/timing")
+async def get_timing(top: int = Query(20, ge=1, le=200), admin: str = Depends(get_current_admin)):
+    """Route latencies and query counts since start (or the last reset), slowest statements"""
+    return {"routes": get_timing_stats(), "queries": get_query_stats(top)}
+
+@router.post("/timing/reset")
+async def reset_timing(admin: str = Depends(get_current_admin)):
+    reset_timing_stats()
+    reset_query_stats()
+    return {"message": "Timing stats reset"}
+
+# --- Ingest profiles (INGEST_PROFILING, see logic/ingest_profile.py) ---
+
+def profile_row(p: IngestProfile) -> dict:
+    return {
+        "id": p.id, "mission_id": p.mission_id, "file_name": p.file_name, "result": p.result,
+        "created_at": p.created_at, "total_seconds": p.total_seconds, "peak_memory": p.peak_memory,
+        "file_bytes": p.file_bytes, "stages": p.stages, "counts": p.counts,
+    }
+
+@router.get("/ingest-profiles")
+async def list_ingest_profiles(limit: int = Query(50, ge=1, le=200), db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_admin)):
+    """Latest profiled ingests, newest first, without the function lists"""
+    result = await db.execute(select(IngestProfile).order_by(IngestProfile.id.desc()).limit(limit))
+    return [profile_row(p) for p in result.scalars().all()]
+
+@router.get("/ingest-profiles/{id}")
+async def get_ingest_profile(id: int, db: AsyncSession = Depends(get_db), admin: str = Depends(get_current_admin)):
+    result = await db.execute(
+        select(IngestProfile).options(undefer(IngestProfile.top_functions)).where(IngestProfile.id == id)
+    )
+    profile = result.scalars().first()
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {**profile_row(profile), "top_functions": profile.top_functions}
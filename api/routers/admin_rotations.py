@@ -3,9 +3,12 @@ from typing import List
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_db, Rotation, RotationSquad, GlobalSquad
+from database import get_db, get_write_db, Rotation, RotationSquad, GlobalSquad
 from api.schemas import Rotation as RotationSchema, RotationCreate, RotationUpdate
 from api.routers.admin import get_current_admin # Security
+from logic.events import commit_change
+from logic.rotations import rotation_resolver
+from logic import leaderboards
 
 router = APIRouter(prefix="/admin/rotations", tags=["admin_rotations"])
 
@@ -31,7 +34,7 @@ async def get_rotations(db: AsyncSession = Depends(get_db), admin=Depends(get_cu
     return output
 
 @router.post("/", response_model=RotationSchema)
-async def create_rotation(rot: RotationCreate, db: AsyncSession = Depends(get_db), admin=Depends(get_current_admin)):
+async def create_rotation(rot: RotationCreate, db: AsyncSession = Depends(get_write_db), admin=Depends(get_current_admin)):
     # Check name unique
     stmt = select(Rotation).filter(Rotation.name == rot.name)
     res = await db.execute(stmt)
@@ -54,6 +57,9 @@ async def create_rotation(rot: RotationCreate, db: AsyncSession = Depends(get_db
             rs = RotationSquad(rotation_id=db_rot.id, squad_id=sid)
             db.add(rs)
         await db.commit()
+    await db.run_sync(lambda s: leaderboards.rebuild_scope(s, db_rot.id))
+    await commit_change(db, "rotations", id=db_rot.id)
+    rotation_resolver.invalidate()
         
     return RotationSchema(
         id=db_rot.id,
@@ -66,7 +72,7 @@ async def create_rotation(rot: RotationCreate, db: AsyncSession = Depends(get_db
     )
 
 @router.put("/{rot_id}", response_model=RotationSchema)
-async def update_rotation(rot_id: int, rot: RotationUpdate, db: AsyncSession = Depends(get_db), admin=Depends(get_current_admin)):
+async def update_rotation(rot_id: int, rot: RotationUpdate, db: AsyncSession = Depends(get_write_db), admin=Depends(get_current_admin)):
     stmt = select(Rotation).filter(Rotation.id == rot_id).options(selectinload(Rotation.squads))
     res = await db.execute(stmt)
     db_rot = res.scalars().first()
@@ -92,7 +98,10 @@ async def update_rotation(rot_id: int, rot: RotationUpdate, db: AsyncSession = D
             rs = RotationSquad(rotation_id=rot_id, squad_id=sid)
             db.add(rs)
             
-    await db.commit()
+    await db.flush()
+    await db.run_sync(lambda s: leaderboards.rebuild_scope(s, rot_id))
+    await commit_change(db, "rotations", id=rot_id)
+    rotation_resolver.invalidate()
     await db.refresh(db_rot) # Note: squads rel might need reloading but for schema we can just use input
     
     return RotationSchema(
@@ -106,7 +115,7 @@ async def update_rotation(rot_id: int, rot: RotationUpdate, db: AsyncSession = D
     )
 
 @router.delete("/{rot_id}")
-async def delete_rotation(rot_id: int, db: AsyncSession = Depends(get_db), admin=Depends(get_current_admin)):
+async def delete_rotation(rot_id: int, db: AsyncSession = Depends(get_write_db), admin=Depends(get_current_admin)):
     stmt = select(Rotation).filter(Rotation.id == rot_id)
     res = await db.execute(stmt)
     db_rot = res.scalars().first()
@@ -115,5 +124,8 @@ async def delete_rotation(rot_id: int, db: AsyncSession = Depends(get_db), admin
         raise HTTPException(status_code=404, detail="Rotation not found")
         
     await db.delete(db_rot)
-    await db.commit()
+    await db.flush()
+    await db.run_sync(lambda s: leaderboards.rebuild_scope(s, rot_id))  # Drops the rotation's rows
+    await commit_change(db, "rotations", id=rot_id)
+    rotation_resolver.invalidate()
     return {"status": "deleted"}
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from logic.events import broadcaster
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+@router.get("/stream")
+async def event_stream(request: Request):
+    """
+    Server-Sent Events: mission_ingested (mission summary as in /missions/) and
+    rollups_refreshed (new data generation). Reconnects resume from Last-Event-ID.
+    """
+    last_id = request.headers.get("last-event-id")
+    last_id = int(last_id) if last_id and last_id.isdigit() else None
+    return StreamingResponse(
+        broadcaster.listen(last_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # nginx must not buffer the stream
+    )
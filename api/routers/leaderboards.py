@@ -0,0 +1,89 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_read_db, LeaderboardEntry
+from api.schemas import LeaderboardPage, LeaderboardPlayerRank
+from api.caching import cached_route
+from api.responses import fast_response
+from api.pagination import paginate, page_result, cached_count
+from logic.leaderboards import ALL_TIME, METRICS
+
+# Rankings precomputed by logic/leaderboards.py; every request here is an index lookup
+router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
+
+LEADERBOARD_MAX_LIMIT = 200
+
+def metric_columns(metric: str):
+    columns = METRICS.get(metric)
+    if columns is None:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}. Use one of: {', '.join(METRICS)}")
+    return columns
+
+def entry_row(e: LeaderboardEntry, rank_col) -> dict:
+    return {
+        "rank": getattr(e, rank_col.key),
+        "name": e.name,
+        "missions": e.missions,
+        "frags": e.frags,
+        "frags_veh": e.frags_veh,
+        "frags_inf": e.frags_inf,
+        "deaths": e.deaths,
+        "destroyed_vehicles": e.destroyed_vehicles,
+        "distance": e.distance,
+        "kd": e.kd,
+    }
+
+async def ranked_count(db: AsyncSession, metric: str, scope: int, rank_col) -> int:
+    stmt = select(LeaderboardEntry.id).where(LeaderboardEntry.scope == scope, rank_col.is_not(None))
+    return await cached_count(db, "leaderboard", {"metric": metric, "scope": scope}, stmt)
+
+@router.get("/{metric}", response_model=LeaderboardPage)
+@fast_response("leaderboard.page", LeaderboardPage)
+@cached_route("leaderboard.page")
+async def get_leaderboard(metric: str, rotation_id: Optional[int] = None, cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=LEADERBOARD_MAX_LIMIT), db: AsyncSession = Depends(get_read_db)):
+    """
+    One ranking (kd, frags, frags_veh, destroyed_vehicles, missions, distance), best first.
+    Players with equal values share a rank and are listed by name.
+    Pass next_cursor of the previous page as ?cursor= for the next one.
+    """
+    _, rank_col = metric_columns(metric)
+    scope = rotation_id or ALL_TIME
+
+    stmt = select(LeaderboardEntry).where(LeaderboardEntry.scope == scope, rank_col.is_not(None))
+    # Ranks repeat on ties, the name makes the cursor position unique
+    result = await db.execute(paginate(stmt, [rank_col, LeaderboardEntry.name], cursor, 0, limit, descending=False))
+    entries, next_cursor = page_result(result.scalars().all(), limit, lambda e: (getattr(e, rank_col.key), e.name))
+
+    return {
+        "metric": metric,
+        "rotation_id": rotation_id,
+        "items": [entry_row(e, rank_col) for e in entries],
+        "total": await ranked_count(db, metric, scope, rank_col),
+        "next_cursor": next_cursor,
+    }
+
+@router.get("/{metric}/players/{player_name}", response_model=LeaderboardPlayerRank)
+@fast_response("leaderboard.player", LeaderboardPlayerRank)
+@cached_route("leaderboard.player")
+async def get_player_rank(metric: str, player_name: str, rotation_id: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
+    """Where one player stands ("#57 of 812"); rank is null below the qualification thresholds"""
+    _, rank_col = metric_columns(metric)
+    scope = rotation_id or ALL_TIME
+
+    result = await db.execute(
+        select(LeaderboardEntry)
+        .where(LeaderboardEntry.scope == scope, LeaderboardEntry.player_key == player_name.strip().lower())
+    )
+    entries = result.scalars().all()
+    if not entries:
+        raise HTTPException(status_code=404, detail="Player not found")
+    # Several spellings of the same name: the best ranked one, else the most active
+    entry = min(entries, key=lambda e: (getattr(e, rank_col.key) is None, getattr(e, rank_col.key) or 0, -e.missions))
+
+    return {
+        "metric": metric,
+        "rotation_id": rotation_id,
+        "total": await ranked_count(db, metric, scope, rank_col),
+        "entry": entry_row(entry, rank_col),
+    }
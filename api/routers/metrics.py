@@ -0,0 +1,98 @@
+import os
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response
+from sqlalchemy import func
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_read_db, IngestRequest
+from api.caching import flight_stats
+from api.compression import compressed_cache, compression_stats
+from api.conditional import conditional_stats
+from api.timing import LATENCY_BUCKETS_MS, _lock as timing_lock, route_timings
+from logic.cache import response_cache
+from logic.events import broadcaster
+from logic.metrics import CONTENT_TYPE, add_collector, family, histogram_samples, render
+from logic.query_stats import engine_stats
+
+# Prometheus scrape target (text format, see logic/metrics.py). Open unless
+# VOSTOKSTAT_METRICS_TOKEN is set, then scrapers send it as a bearer token.
+router = APIRouter(tags=["metrics"])
+
+METRICS_TOKEN = os.getenv("VOSTOKSTAT_METRICS_TOKEN", "")
+
+@add_collector
+def route_collector() -> list:
+    bounds = [ms / 1000 for ms in LATENCY_BUCKETS_MS]
+    latency, queries = [], []
+    with timing_lock:
+        for key, timing in route_timings.items():
+            method, _, route = key.partition(" ")
+            labels = {"method": method, "route": route}
+            latency.extend(histogram_samples(labels, bounds, timing.buckets, timing.total, timing.count))
+            queries.append((labels, timing.queries))
+    return (
+        family("vostokstat_http_request_duration_seconds", "histogram", "Request latency per route", latency)
+        + family("vostokstat_http_request_queries_total", "counter", "SQL statements run by requests per route", queries)
+    )
+
+@add_collector
+def query_collector() -> list:
+    samples = [({"engine": label}, count) for label, (count, _) in engine_stats.items()]
+    seconds = [({"engine": label}, round(total, 6)) for label, (_, total) in engine_stats.items()]
+    return (
+        family("vostokstat_db_queries_total", "counter", "SQL statements executed", samples)
+        + family("vostokstat_db_query_seconds_total", "counter", "Time spent in SQL statements", seconds)
+    )
+
+@add_collector
+def cache_collector() -> list:
+    response, stored = response_cache.stats(), compressed_cache.stats()
+    caches = {
+        "response": (response["hits"], response["misses"]),
+        "compressed": (stored["hits"], stored["misses"]),
+        # 304 answered from the ETag vs full responses tagged
+        "conditional": (conditional_stats["not_modified"], conditional_stats["tagged"]),
+        # Callers that joined an identical in-flight computation vs computed themselves
+        "coalescing": (flight_stats["coalesced"], flight_stats["computed"]),
+    }
+    hits = [({"cache": name}, h) for name, (h, _) in caches.items()]
+    misses = [({"cache": name}, m) for name, (_, m) in caches.items()]
+    ratios = [({"cache": name}, round(h / (h + m), 4) if h + m else 0.0) for name, (h, m) in caches.items()]
+    return (
+        family("vostokstat_cache_hits_total", "counter", "Cache hits", hits)
+        + family("vostokstat_cache_misses_total", "counter", "Cache misses", misses)
+        + family("vostokstat_cache_hit_ratio", "gauge", "Hits / (hits + misses) since start", ratios)
+        + family("vostokstat_cache_entries", "gauge", "Entries held in memory", [
+            ({"cache": "response"}, response["entries"]), ({"cache": "compressed"}, stored["entries"]),
+        ])
+        + family("vostokstat_compression_bytes_total", "counter", "Response bytes before and after compression", [
+            ({"direction": "in"}, compression_stats["bytes_in"]), ({"direction": "out"}, compression_stats["bytes_out"]),
+        ])
+    )
+
+@add_collector
+def queue_collector() -> list:
+    return (
+        family("vostokstat_inflight_waiting", "gauge", "Requests waiting on a coalesced computation", [({}, flight_stats["waiting"])])
+        + family("vostokstat_sse_clients", "gauge", "Connected /events/stream clients", [({}, broadcaster.clients)])
+        + family("vostokstat_sse_events_total", "counter", "Events delivered to SSE clients", [({}, broadcaster.published)])
+    )
+
+def check_token(request: Request):
+    if not METRICS_TOKEN:
+        return
+    auth = request.headers.get("authorization", "")
+    if not secrets.compare_digest(auth.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(db: AsyncSession = Depends(get_read_db), _: None = Depends(check_token)):
+    # Shared queue, so it lives in the DB rather than in this process
+    pending = await db.scalar(select(func.count(IngestRequest.id)).where(IngestRequest.done_at.is_(None)))
+    text = render() + "\n".join(family(
+        "vostokstat_ingest_requests_pending", "gauge", "Ingestion requests the worker has not completed yet", [({}, pending or 0)]
+    )) + "\n"
+    return Response(content=text, media_type=CONTENT_TYPE)
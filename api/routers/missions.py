@@ -1,33 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
 from typing import List, Optional
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, undefer
 from sqlalchemy import and_
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_db, Mission, GlobalSquad, MissionSquadStat, PlayerStat, Rotation, RotationSquad
+from database import get_read_db, Mission, PlayerStat
 from api.schemas import MissionSummary, MissionDetail
+from logic.squad_registry import squad_registry
+from logic.rotations import get_rotation_context
+from logic.events import mission_summary
+from api.pagination import paginate, page_result, page_list
+from api.caching import cached_route
+from api.responses import fast_response
 
 # We need to adapt schemas or Models to schemas. 
 # Pydantic models expect dictionary or object with attributes. ORM objects work fine with from_attributes (orm_mode).
 
 router = APIRouter(prefix="/missions", tags=["missions"])
 
-async def get_rotation_context(db: AsyncSession, rotation_id: Optional[int]):
-    if not rotation_id:
-        return None, None
-        
-    stmt = select(Rotation).filter(Rotation.id == rotation_id)
-    res = await db.execute(stmt)
-    rot = res.scalars().first()
-    
-    if not rot:
-        return None, None
-            
-    return rot.start_date.replace('-', '_'), rot.end_date.replace('-', '_')
-
 @router.get("/", response_model=List[MissionSummary])
-async def get_missions(limit: int = 20, skip: int = 0, rotation_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
-    start_date, end_date = await get_rotation_context(db, rotation_id)
+async def get_missions(response: Response, limit: int = 20, skip: int = 0, cursor: Optional[str] = None, rotation_id: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
+    # Keyset pagination over (file_date, id): pass the X-Next-Cursor header of the previous page as ?cursor=
+    start_date, end_date, _ = await get_rotation_context(db, rotation_id)
     
     stmt = (
         select(Mission)
@@ -37,49 +32,49 @@ async def get_missions(limit: int = 20, skip: int = 0, rotation_id: Optional[int
     if start_date and end_date:
         stmt = stmt.filter(and_(Mission.file_date >= start_date, Mission.file_date <= end_date + " 23:59:59"))
     
-    result = await db.execute(
-        stmt.order_by(Mission.id.desc())
-        .offset(skip)
-        .limit(limit)
-    )
-    missions = result.scalars().all()
+    result = await db.execute(paginate(stmt, [Mission.file_date, Mission.id], cursor, skip, limit))
+    missions, next_cursor = page_result(result.scalars().all(), limit, lambda m: (m.file_date, m.id))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
-    # Map to schema manually or rely on Pydantic's from_attributes if configured
-    # Assuming schemas.MissionSummary has ConfigDict(from_attributes=True) or we map manually
-    # Let's verify standard response matches schema. 
-    # MissionSummary expects: players_count as dict. 
-    # Our Model has individual fields. We need a transformation.
-    
-    response = []
-    for m in missions:
-        response.append({
-            "id": m.id,
-            "file": m.file_name,
-            "file_date": m.file_date,
-            "game_type": m.game_type,
-            "duration_frames": m.duration_frames,
-            "duration_time": m.duration_time,
-            "missionName": m.mission_name,
-            "worldName": m.world_name,
-            "win_side": m.win_side,
-            "map": m.map_name,
-            "players_count": {
-                "total": m.total_players,
-                "WEST": m.west_count,
-                "EAST": m.east_count,
-                "GUER": m.guer_count
-            }
-        })
-    return response
+    # Same shape as the mission_ingested event, so the frontend can prepend pushed missions
+    return [mission_summary(m) for m in missions]
+
+# Event lists stored per player, selectable with ?include=
+EVENT_FIELDS = ("victims_players", "destroyed_vehicles", "death_events")
+EVENT_KINDS = {"kills": "victims_players", "vehicles": "destroyed_vehicles", "deaths": "death_events"}
+FEED_MAX_LIMIT = 500
+
+def parse_csv(value: Optional[str]) -> List[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
 
-@router.get("/{mission_id}", response_model=MissionDetail)
-async def get_mission(mission_id: int, db: AsyncSession = Depends(get_db)):
-    # Fetch mission with relationships
+@router.get("/{mission_id}", response_model=MissionDetail, response_model_exclude_unset=True)
+@fast_response("missions.detail", MissionDetail, exclude_unset=True)
+async def get_mission(mission_id: int, include: Optional[str] = None, fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    """
+    Mission summary: players without their event lists, squads with members.
+    ?include=events (or victims_players,destroyed_vehicles,death_events) adds the event lists,
+    ?fields=id,missionName,players limits the top-level keys. Event feeds are paginated
+    under /missions/{id}/kills, /vehicles and /players/{player_id}/events.
+    """
+    included = set()
+    for name in parse_csv(include):
+        if name == "events":
+            included.update(EVENT_FIELDS)
+        elif name in EVENT_FIELDS:
+            included.add(name)
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown include: {name}")
+    
+    # Fetch mission with relationships, event blobs only when asked for
+    player_loader = selectinload(Mission.player_stats)
+    for name in included:
+        player_loader = player_loader.undefer(getattr(PlayerStat, name))
     stmt = (
         select(Mission)
         .options(
-            selectinload(Mission.player_stats),
-            selectinload(Mission.squad_stats)
+            player_loader,
+            selectinload(Mission.squad_stats).undefer_group("members")
         )
         .filter(Mission.id == mission_id)
     )
@@ -89,21 +84,12 @@ async def get_mission(mission_id: int, db: AsyncSession = Depends(get_db)):
     if not mission:
         raise HTTPException(status_code=404, detail="Mission not found")
     
-    # Filter squads
-    # 1. Fetch valid global squads
-    sq_result = await db.execute(select(GlobalSquad))
-    global_squads = sq_result.scalars().all()
-    
-    valid_tags = set()
-    for gs in global_squads:
-        if gs.tags:
-            for t in gs.tags:
-                valid_tags.add(t.lower())
+    # Filter squads: only known (registered) squads are shown
+    valid_tags = (await squad_registry.get(db)).tag_to_canonical
     
-    # 2. Filter session.squad_stats
     final_squads = []
     for sq_stat in mission.squad_stats:
-        if sq_stat.squad_tag and sq_stat.squad_tag.lower() in valid_tags:
+        if sq_stat.squad_tag and sq_stat.squad_tag.strip().lower() in valid_tags:
             # Append full stats
             final_squads.append({
                 "squad_tag": sq_stat.squad_tag,
@@ -114,41 +100,9 @@ async def get_mission(mission_id: int, db: AsyncSession = Depends(get_db)):
                 "squad_players": sq_stat.squad_players # JSON
             })
             
-    # Prepare Players with Death Events injection
-    # In SQLite implementation, we store victims_players in JSON correctly.
-    # Logic in previous version was:
-    # "Process death events (reverse mapping of kills)"
-    # because the OCAP parsing logic only stored "victims_players" (kills made by me).
-    # It didn't store "death_events" (times I was killed).
-    # But wait, my new parser logic:
-    # `killer_stats["victims_players"].append(...)` -> this saves the KILL event in the KILLER's record.
-    # The VICTIM's record just increments `death` counter.
-    # So `death_events` IS NOT stored in DB. I must re-calculate it here on read, same as before.
-    
+    # death_events are stored per player at ingest, so this is a straight read
     players_response = []
     
-    # Build death map: VictimName -> [Event, Event...]
-    death_map = {}
-    
-    # Iterate all players to collect kills
-    for p in mission.player_stats:
-        killer_name = p.name
-        # p.victims_players is a JSON list of dicts
-        kills = p.victims_players if p.victims_players else []
-        for k in kills:
-            victim_name = k.get("name")
-            if not victim_name: continue
-            
-            if victim_name not in death_map:
-                death_map[victim_name] = []
-            
-            # Ensure killer_name is present
-            if "killer_name" not in k:
-                k["killer_name"] = killer_name
-            
-            death_map[victim_name].append(k)
-            
-    # Now build response objects
     for p in mission.player_stats:
         p_dict = {
             "id": p.player_uid,
@@ -160,14 +114,13 @@ async def get_mission(mission_id: int, db: AsyncSession = Depends(get_db)):
             "frags_inf": p.frags_inf,
             "tk": p.tk,
             "death": p.death,
-            "distance": p.distance,
-            "victims_players": p.victims_players if p.victims_players else [],
-            "destroyed_vehicles": p.destroyed_vehicles if p.destroyed_vehicles else [],
-            "death_events": death_map.get(p.name, [])
+            "distance": p.distance
         }
+        for name in included:
+            p_dict[name] = getattr(p, name) or []
         players_response.append(p_dict)
 
-    return {
+    data = {
         "id": mission.id,
         "file": mission.file_name,
         "file_date": mission.file_date,
@@ -187,3 +140,70 @@ async def get_mission(mission_id: int, db: AsyncSession = Depends(get_db)):
         "players": players_response,
         "squads": final_squads
     }
+    
+    selected = parse_csv(fields)
+    if selected:
+        unknown = [f for f in selected if f not in data]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        # Validated like the full response, then trimmed to the requested keys
+        detail = MissionDetail.model_validate(data)
+        return JSONResponse(detail.model_dump(mode="json", by_alias=True, exclude_unset=True, include=set(selected)))
+    return data
+
+async def load_event_rows(db: AsyncSession, mission_id: int, field: str, player_uid: Optional[int] = None):
+    """Players of a mission with one event column loaded"""
+    stmt = (
+        select(PlayerStat)
+        .options(undefer(getattr(PlayerStat, field)))
+        .filter(PlayerStat.mission_id == mission_id)
+        .order_by(PlayerStat.id)
+    )
+    if player_uid is not None:
+        stmt = stmt.filter(PlayerStat.player_uid == player_uid)
+    result = await db.execute(stmt)
+    players = result.scalars().all()
+    if not players and not await db.get(Mission, mission_id):
+        raise HTTPException(status_code=404, detail="Mission not found")
+    return players
+
+def event_feed(players, field: str) -> List[dict]:
+    """Events of all players, in game order, with who did it"""
+    feed = []
+    for p in players:
+        for e in getattr(p, field) or []:
+            feed.append({**e, "player_id": p.player_uid, "player_name": p.name, "player_squad": p.squad, "player_side": p.side})
+    feed.sort(key=lambda e: (e.get("frame") or 0, e.get("time") or 0))
+    return feed
+
+@router.get("/{mission_id}/kills")
+@fast_response("missions.kills")
+@cached_route("missions.kills")
+async def get_mission_kills(mission_id: int, cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=FEED_MAX_LIMIT), db: AsyncSession = Depends(get_read_db)):
+    """Kill feed of the mission (infantry kills of every player), oldest first"""
+    players = await load_event_rows(db, mission_id, "victims_players")
+    return page_list(event_feed(players, "victims_players"), cursor, limit)
+
+@router.get("/{mission_id}/vehicles")
+@fast_response("missions.vehicles")
+@cached_route("missions.vehicles")
+async def get_mission_vehicle_kills(mission_id: int, cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=FEED_MAX_LIMIT), db: AsyncSession = Depends(get_read_db)):
+    """Destroyed vehicles of the mission, oldest first"""
+    players = await load_event_rows(db, mission_id, "destroyed_vehicles")
+    return page_list(event_feed(players, "destroyed_vehicles"), cursor, limit)
+
+@router.get("/{mission_id}/players/{player_id}/events")
+@fast_response("missions.player_events")
+@cached_route("missions.player_events")
+async def get_mission_player_events(mission_id: int, player_id: int, kind: str = "kills", cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=FEED_MAX_LIMIT), db: AsyncSession = Depends(get_read_db)):
+    """One player's kills, vehicles or deaths in the mission. player_id is the id from the mission detail."""
+    field = EVENT_KINDS.get(kind)
+    if not field:
+        raise HTTPException(status_code=400, detail=f"kind must be one of: {', '.join(EVENT_KINDS)}")
+    players = await load_event_rows(db, mission_id, field, player_uid=player_id)
+    if not players:
+        raise HTTPException(status_code=404, detail="Player not found in mission")
+    events = []
+    for p in players:
+        events.extend(getattr(p, field) or [])
+    return page_list(events, cursor, limit)
@@ -1,181 +1,152 @@
 from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 from sqlalchemy.future import select
-from sqlalchemy import func, case, desc, and_
+from sqlalchemy import desc, and_
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_db, PlayerStat, Mission, GlobalSquad, MissionSquadStat, Rotation, RotationSquad
-from api.schemas import PlayerAggregatedStats
+from database import casefold, get_read_db, LeaderboardEntry, PlayerStat, Mission, MissionSquadStat, SearchEntry
+from api.schemas import PlayerAggregatedStats, BatchRequest, BATCH_MAX_NAMES
+from api.caching import cached_route
+from api.responses import fast_response
+from logic.leaderboards import ALL_TIME
+from logic.rotations import rotation_resolver
+from logic import search_index
+from logic.squad_history import RunBuilder, build_timeline, load_runs
 
 router = APIRouter(prefix="/players", tags=["players"])
 
 @router.get("/search/{name}")
-async def search_player(name: str, db: AsyncSession = Depends(get_db)):
-    stmt = (
-        select(PlayerStat.name)
-        .filter(PlayerStat.name.ilike(f"%{name}%"))
-        .distinct()
-        .limit(10)
-    )
-    result = await db.execute(stmt)
-    return result.scalars().all()
+async def search_player(name: str, db: AsyncSession = Depends(get_read_db)):
+    entries = await search_index.search(db, "player", name, limit=10)
+    return [e.name for e in entries]
 
-@router.get("/{player_name_or_id}", response_model=PlayerAggregatedStats)
-async def get_player_stats(player_name_or_id: str, rotation_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
-    name_lower = player_name_or_id.lower()
-    
-    # Rotation Context
-    start_date, end_date, whitelist_names = await get_rotation_context(db, rotation_id)
-    
-    whitelist_tags = set()
-    if whitelist_names:
-        # Resolve to tags
-        stmt_sq = select(GlobalSquad)
-        res_sq = await db.execute(stmt_sq)
-        all_squads = res_sq.scalars().all()
-        
-        for sq in all_squads:
-            if sq.name in whitelist_names:
-                whitelist_tags.add(sq.name.lower())
-                if sq.tags:
-                    for t in sq.tags:
-                        whitelist_tags.add(t.strip().lower())
-    
-    # 1. Check if exists and get total stats
-    # Group by nothing (aggregate all matches)
-    stmt_total = (
-        select(
-            func.count(PlayerStat.mission_id).label("total_missions"),
-            func.sum(PlayerStat.frags).label("total_frags"),
-            func.sum(PlayerStat.frags_veh).label("total_frags_veh"),
-            func.sum(PlayerStat.frags_inf).label("total_frags_inf"),
-            func.sum(PlayerStat.death).label("total_deaths"),
-            func.sum(PlayerStat.destroyed_veh).label("total_destroyed_vehicles")
-        )
-        .join(Mission, PlayerStat.mission_id == Mission.id)
-        .filter(func.lower(PlayerStat.name) == name_lower)
-        .filter(Mission.duration_time >= 100)
-    )
-    
-    # Apply Filters
-    if start_date and end_date:
-        stmt_total = stmt_total.filter(and_(Mission.file_date >= start_date, Mission.file_date <= end_date + " 23:59:59"))
-    
-    if whitelist_names:
-        stmt_total = stmt_total.filter(func.lower(PlayerStat.squad).in_(whitelist_tags))
-    
-    result = await db.execute(stmt_total)
-    total_stats = result.one_or_none()
-    
-    # If count is 0/None, player not found (or no stats in this rotation)
-    if not total_stats or not total_stats.total_missions:
-        if rotation_id:
-             # If filtering by rotation, return empty object instead of 404 to allow profile page to load
-             return {
-                "name": player_name_or_id,
-                "total_missions": 0,
-                "total_frags": 0,
-                "total_frags_veh": 0,
-                "total_frags_inf": 0,
-                "total_deaths": 0,
-                "total_destroyed_vehicles": 0,
-                "kd_ratio": 0.0,
-                "squads": [],
-                "missions": []
-            }
-        raise HTTPException(status_code=404, detail="Player not found")
-         
-    # 2. Get stats per squad
-    stmt_squads = (
-        select(
-            PlayerStat.squad,
-            func.count(PlayerStat.mission_id).label("total_missions"),
-            func.sum(PlayerStat.frags).label("total_frags"),
-            func.sum(PlayerStat.frags_veh).label("total_frags_veh"),
-            func.sum(PlayerStat.frags_inf).label("total_frags_inf"),
-            func.sum(PlayerStat.death).label("total_deaths"),
-            func.sum(PlayerStat.destroyed_veh).label("total_destroyed_vehicles")
-        )
-        .join(Mission, PlayerStat.mission_id == Mission.id)
-        .filter(func.lower(PlayerStat.name) == name_lower)
-        .filter(Mission.duration_time >= 100)
-        .group_by(PlayerStat.squad)
-        .order_by(desc("total_missions"))
-    )
-
-    if start_date and end_date:
-        stmt_squads = stmt_squads.filter(and_(Mission.file_date >= start_date, Mission.file_date <= end_date + " 23:59:59"))
+def empty_player_profile(name: str) -> dict:
+    return {
+        "name": name,
+        "side": None,
+        "last_squad": None,
+        "total_missions": 0,
+        "total_frags": 0,
+        "total_frags_veh": 0,
+        "total_frags_inf": 0,
+        "total_deaths": 0,
+        "total_destroyed_vehicles": 0,
+        "kd_ratio": 0.0,
+        "squads": [],
+        "missions": [],
+        "timeline": []
+    }
 
-    if whitelist_names:
-        stmt_squads = stmt_squads.filter(func.lower(PlayerStat.squad).in_(whitelist_tags))
-    
-    squad_results = await db.execute(stmt_squads)
-    squads_rows = squad_results.all()
+async def build_player_profiles(db: AsyncSession, names: List[str], rotation_id: Optional[int]) -> Dict[str, Optional[dict]]:
+    """
+    Profiles for several players at once: name -> profile, or None when the player has no rows.
+    One query over all their rows (oldest first), then one loop per player.
+    """
+    keys = {n: n.lower() for n in names}
     
-    # Process Results
-    t_frags = total_stats.total_frags or 0
-    t_deaths = total_stats.total_deaths or 0
-    kd_ratio = round(t_frags / t_deaths, 2) if t_deaths > 0 else float(t_frags)
+    # Rotation Context
+    rot = await rotation_resolver.get(db, rotation_id)
+    start_date, end_date, whitelist_names = rot.bounds() if rot else (None, None, None)
+    whitelist_tags = rot.whitelist_tags if rot else frozenset()
     
-    squads_list = []
-    for r in squads_rows:
-        s_frags = r.total_frags or 0
-        s_deaths = r.total_deaths or 0
-        s_kd = round(s_frags / s_deaths, 2) if s_deaths > 0 else float(s_frags)
-        
-        squads_list.append({
-            "squad": r.squad if r.squad else "No Squad",
-            "total_missions": r.total_missions,
-            "total_frags": s_frags,
-            "total_frags_veh": r.total_frags_veh or 0,
-            "total_frags_inf": r.total_frags_inf or 0,
-            "total_deaths": s_deaths,
-            "total_destroyed_vehicles": r.total_destroyed_vehicles or 0,
-            "kd_ratio": s_kd
-        })
-        
-    # 3. Get list of missions played
-    stmt_missions = (
+    # 1. Rows of all requested players.
+    # Spellings of the names come from the search index, so player_stats is read through its name index.
+    # The requested spellings themselves are always included, a stale index must not hide a player.
+    spellings = set((await db.execute(
+        select(SearchEntry.name)
+        .filter(SearchEntry.kind == "player", SearchEntry.key.in_({search_index.fold(k) for k in keys.values()}))
+    )).scalars().all())
+    spellings.update(names)
+    stmt = (
         select(
             Mission.id,
             Mission.mission_name,
             Mission.map_name,
             Mission.file_date,
             Mission.duration_time,
+            PlayerStat.name,
             PlayerStat.frags,
+            PlayerStat.frags_veh,
+            PlayerStat.frags_inf,
             PlayerStat.death,
-            PlayerStat.squad,      # Added squad fetching
-            PlayerStat.side        # Added side fetching
+            PlayerStat.destroyed_veh,
+            PlayerStat.squad,
+            PlayerStat.side
         )
         .join(PlayerStat, PlayerStat.mission_id == Mission.id)
-        .filter(func.lower(PlayerStat.name) == name_lower)
         .filter(Mission.duration_time >= 100)
     )
-
+    
+    # Apply Filters
     if start_date and end_date:
-        stmt_missions = stmt_missions.filter(and_(Mission.file_date >= start_date, Mission.file_date <= end_date + " 23:59:59"))
-
+        stmt = stmt.filter(and_(Mission.file_date >= start_date, Mission.file_date <= end_date + " 23:59:59"))
+    
     if whitelist_names:
-        stmt_missions = stmt_missions.filter(func.lower(PlayerStat.squad).in_(whitelist_tags))
+        stmt = stmt.filter(casefold(PlayerStat.squad).in_(whitelist_tags))
+    
+    rows_by_key = {}
+    async def collect(name_filter):
+        result = await db.execute(stmt.filter(name_filter).order_by(Mission.file_date, Mission.id))
+        for r in result.all():
+            rows_by_key.setdefault(r.name.lower(), []).append(r)
 
-    stmt_missions = stmt_missions.order_by(desc(Mission.file_date)) # Most recent first
+    await collect(PlayerStat.name.in_(spellings))
     
-    res_missions = await db.execute(stmt_missions)
-    missions_rows = res_missions.all()
+    # Index entry missing (not built yet, or out of date) and spelled differently:
+    # look the spellings up in player_stats itself, a scan only for names not found above
+    missing = {k for k in keys.values() if k not in rows_by_key}
+    if missing:
+        found = (await db.execute(
+            select(PlayerStat.name).where(casefold(PlayerStat.name).in_(missing)).distinct()
+        )).scalars().all()
+        if found:
+            await collect(PlayerStat.name.in_(found))
     
-    missions_list = []
-    side_counts = {}
+    # The all-time timeline is maintained at ingest, rotations use the runs from the loop
+    stored_runs = {}
+    if not rotation_id:
+        stored_runs = await load_runs(db, [k for k in set(keys.values()) if k in rows_by_key])
+    
+    profiles = {}
+    for name, key in keys.items():
+        rows = rows_by_key.get(key)
+        profiles[name] = player_profile(name, rows, stored_runs.get(key)) if rows else None
+    return profiles
 
-    for m in missions_rows:
+def player_profile(name: str, rows, stored_runs) -> dict:
+    """Totals, per-squad sums, sides, mission list and squad runs in one loop over the rows"""
+    def new_sums():
+        return {
+            "total_missions": 0,
+            "total_frags": 0,
+            "total_frags_veh": 0,
+            "total_frags_inf": 0,
+            "total_deaths": 0,
+            "total_destroyed_vehicles": 0
+        }
+    
+    totals = new_sums()
+    squad_sums = {}
+    side_counts = {}
+    missions_list = []
+    runs = RunBuilder()
+    
+    for m in rows:
         fr = m.frags or 0
         d = m.death or 0
-        kd = round(fr / d, 2) if d > 0 else float(fr)
+        
+        for acc in (totals, squad_sums.setdefault(m.squad, new_sums())):
+            acc["total_missions"] += 1
+            acc["total_frags"] += fr
+            acc["total_frags_veh"] += m.frags_veh or 0
+            acc["total_frags_inf"] += m.frags_inf or 0
+            acc["total_deaths"] += d
+            acc["total_destroyed_vehicles"] += m.destroyed_veh or 0
         
         # Count Side
         if m.side:
             s_up = str(m.side).upper()
             side_counts[s_up] = side_counts.get(s_up, 0) + 1
-
+        
         missions_list.append({
             "mission_id": m.id,
             "mission_name": m.mission_name,
@@ -184,202 +155,96 @@ async def get_player_stats(player_name_or_id: str, rotation_id: Optional[int] =
             "duration_time": m.duration_time,
             "frags": fr,
             "deaths": d,
-            "kd": kd,
+            "kd": round(fr / d, 2) if d > 0 else float(fr),
             "squad": m.squad,
             "side": m.side
         })
-
-    last_squad_tag = missions_rows[0].squad if missions_rows else None
+        runs.add(m.squad, m.file_date)
+    
+    missions_list.reverse() # Most recent first
+    last_squad_tag = rows[-1].squad
+    
+    t_frags = totals["total_frags"]
+    t_deaths = totals["total_deaths"]
+    kd_ratio = round(t_frags / t_deaths, 2) if t_deaths > 0 else float(t_frags)
+    
+    # Most played squads first, ties by tag (no squad first)
+    squads_list = []
+    ordered = sorted(squad_sums.items(), key=lambda item: (-item[1]["total_missions"], item[0] is not None, item[0] or ""))
+    for squad, sums in ordered:
+        s_frags = sums["total_frags"]
+        s_deaths = sums["total_deaths"]
+        squads_list.append({
+            "squad": squad if squad else "No Squad",
+            **sums,
+            "kd_ratio": round(s_frags / s_deaths, 2) if s_deaths > 0 else float(s_frags)
+        })
     
     main_side = None
     if side_counts:
         main_side = max(side_counts, key=side_counts.get)
-
-
-
-    # 4. Generate Timeline (Backend Calculation)
-    sorted_missions = sorted(missions_list, key=lambda x: x["date"]) # Oldest first
-    timeline = []
     
-    if sorted_missions:
-        raw_runs = []
-        current_squad = sorted_missions[0]["squad"] or "No Squad"
-        run_start = sorted_missions[0]["date"]
-        run_last = sorted_missions[0]["date"]
-        count = 0
-        
-        for m in sorted_missions:
-            m_squad = m["squad"] or "No Squad"
-            m_date = m["date"]
-            
-            if m_squad != current_squad:
-                raw_runs.append({
-                    "squad": current_squad,
-                    "start_str": run_start,
-                    "end_str": run_last,
-                    "count": count
-                })
-                current_squad = m_squad
-                run_start = m_date
-                run_last = m_date
-                count = 0
-            else:
-                run_last = m_date
-            count += 1
-            
-        # Last run
-        raw_runs.append({
-            "squad": current_squad,
-            "start_str": run_start,
-            "end_str": run_last,
-            "count": count
-        })
-        
-        # Bridge gaps + Calculate Days
-        def parse_dt(d_str):
-            if isinstance(d_str, datetime):
-                return d_str
-            s = str(d_str).strip()
-            formats = [
-                "%Y-%m-%d %H:%M:%S",
-                "%Y-%m-%d %H:%M",
-                "%Y-%m-%d",
-                "%Y-%m-%dT%H:%M:%S",
-                "%Y-%m-%d_%H-%M-%S", # Standard OCAP
-                "%Y_%m_%d",          # Fallback
-            ]
-            for fmt in formats:
-                try:
-                    return datetime.strptime(s, fmt)
-                except ValueError:
-                    continue
-            # Fallback if parsing fails - prevent 0 delta by returning consistent 'epoch' or similar? 
-            # Or log error. returning now() causes 1-day segments. 
-            print(f"Date parse error for: {d_str}")
-            return datetime.now()
-
-        for i in range(len(raw_runs)):
-            run = raw_runs[i]
-            s_date = parse_dt(run["start_str"])
-            
-            if i < len(raw_runs) - 1:
-                e_date = parse_dt(raw_runs[i+1]["start_str"]) # End is next Start
-            else:
-                # Last segment: extends to NOW (User request: "current date")
-                e_date = datetime.now()
-
-            delta = e_date - s_date
-            days = delta.days
-            if days < 1: days = 1
-            
-            timeline.append({
-                "squad": run["squad"],
-                "start_date": s_date.strftime("%Y-%m-%d %H:%M:%S"),
-                "end_date": e_date.strftime("%Y-%m-%d %H:%M:%S"),
-                "days": days,
-                "mission_count": run["count"]
-            })
-
     return {
-        "name": player_name_or_id, 
-        "total_missions": total_stats.total_missions,
-        "total_frags": t_frags,
-        "total_frags_veh": total_stats.total_frags_veh or 0,
-        "total_frags_inf": total_stats.total_frags_inf or 0,
-        "total_deaths": t_deaths,
-        "total_destroyed_vehicles": total_stats.total_destroyed_vehicles or 0,
+        "name": name, 
+        "side": None,
+        **totals,
         "kd_ratio": kd_ratio,
         "last_squad": last_squad_tag,
         "squads": squads_list,
         "missions": missions_list,
-        "timeline": timeline
+        "timeline": build_timeline(stored_runs or runs.runs)
     }
 
+@router.post("/batch", response_model=Dict[str, Optional[PlayerAggregatedStats]])
+@fast_response("players.batch", Dict[str, Optional[PlayerAggregatedStats]])
+@cached_route("players.batch")
+async def get_players_batch(req: BatchRequest, db: AsyncSession = Depends(get_read_db)):
+    """Several profiles in one request: name -> same body as /players/{name}, null when not found"""
+    names = list(dict.fromkeys(req.names))
+    if len(names) > BATCH_MAX_NAMES:
+        raise HTTPException(status_code=400, detail=f"Too many names (max {BATCH_MAX_NAMES})")
+    profiles = await build_player_profiles(db, names, req.rotation_id)
+    if req.rotation_id:
+        # Same as the single endpoint: empty profile instead of not found within a rotation
+        profiles = {n: p or empty_player_profile(n) for n, p in profiles.items()}
+    return profiles
 
-from datetime import datetime
-from sqlalchemy.orm import selectinload
-from database import get_db, PlayerStat, Mission, GlobalSquad, MissionSquadStat, Rotation, RotationSquad
-# ... imports
-
-async def get_rotation_context(db: AsyncSession, rotation_id: Optional[int]):
-    if not rotation_id:
-        return None, None, None
-        
-    stmt = select(Rotation).filter(Rotation.id == rotation_id).options(selectinload(Rotation.squads).selectinload(RotationSquad.squad))
-    res = await db.execute(stmt)
-    rot = res.scalars().first()
+@router.get("/{player_name_or_id}", response_model=PlayerAggregatedStats)
+@fast_response("players.profile", PlayerAggregatedStats)
+@cached_route("players.profile")
+async def get_player_stats(player_name_or_id: str, rotation_id: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
+    profiles = await build_player_profiles(db, [player_name_or_id], rotation_id)
+    profile = profiles[player_name_or_id]
     
-    if not rot:
-        return None, None, None
-        
-    # Whitelist of canonical names
-    whitelist_names = set()
-    for rs in rot.squads:
-        if rs.squad:
-            whitelist_names.add(rs.squad.name)
-            
-    return rot.start_date.replace('-', '_'), rot.end_date.replace('-', '_'), whitelist_names
+    # No rows: player not found (or no stats in this rotation)
+    if profile is None:
+        if rotation_id:
+            # If filtering by rotation, return empty object instead of 404 to allow profile page to load
+            return empty_player_profile(player_name_or_id)
+        raise HTTPException(status_code=404, detail="Player not found")
+    return profile
 
-@router.get("/top/", response_model=List[PlayerAggregatedStats])
-async def get_top_players(category: str = "general", limit: int = 10, rotation_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
-    # 0. Rotation Context
-    start_date, end_date, whitelist_names = await get_rotation_context(db, rotation_id)
-    
-    whitelist_tags = set()
-    if whitelist_names:
-        # Resolve to tags
-        stmt_sq = select(GlobalSquad)
-        res_sq = await db.execute(stmt_sq)
-        all_squads = res_sq.scalars().all()
-        
-        for sq in all_squads:
-            if sq.name in whitelist_names:
-                whitelist_tags.add(sq.name.lower())
-                if sq.tags:
-                    for t in sq.tags:
-                        whitelist_tags.add(t.strip().lower())
+# /players/top/?category=vehicle|infantry: ranked players with at least this many such frags
+TOP_CATEGORY_MIN_FRAGS = 5
 
-    # 1. Base Query
-    kd_expr = case(
-        (func.sum(PlayerStat.death) > 0, func.sum(PlayerStat.frags) / func.sum(PlayerStat.death)),
-        else_=func.sum(PlayerStat.frags)
-    ).label("kd_ratio")
-    
-    query = (
-        select(
-            PlayerStat.name,
-            func.count(PlayerStat.mission_id).label("total_missions"),
-            func.sum(PlayerStat.frags).label("total_frags"),
-            func.sum(PlayerStat.frags_veh).label("total_frags_veh"),
-            func.sum(PlayerStat.frags_inf).label("total_frags_inf"),
-            func.sum(PlayerStat.death).label("total_deaths"),
-            func.sum(PlayerStat.destroyed_veh).label("total_destroyed_vehicles"),
-            kd_expr
-        )
-        .join(Mission, PlayerStat.mission_id == Mission.id)
-        .filter(Mission.duration_time >= 100)
-    )
-    
-    # Apply Filters
-    if start_date and end_date:
-         query = query.filter(and_(Mission.file_date >= start_date, Mission.file_date <= end_date + " 23:59:59"))
-         
-    if whitelist_names:
-        query = query.filter(func.lower(PlayerStat.squad).in_(whitelist_tags))
+@router.get("/top/", response_model=List[PlayerAggregatedStats])
+@fast_response("players.top", List[PlayerAggregatedStats])
+@cached_route("players.top")
+async def get_top_players(category: str = "general", limit: int = 10, rotation_id: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
+    # 0. Rotation Context (unknown rotation ids fall back to all time)
+    rot = await rotation_resolver.get(db, rotation_id)
+    scope = rotation_id if rot else ALL_TIME
 
-    # Finish Query
-    query = query.group_by(PlayerStat.name).having(func.count(PlayerStat.mission_id) >= 3)
-    
+    # 1. Best KD from the precomputed leaderboard: ranked = meets the AppConfig thresholds
+    query = select(LeaderboardEntry).where(LeaderboardEntry.scope == scope, LeaderboardEntry.rank_kd.is_not(None))
     if category == "vehicle":
-        query = query.having(func.sum(PlayerStat.frags_veh) >= 5)
+        query = query.where(LeaderboardEntry.frags_veh >= TOP_CATEGORY_MIN_FRAGS)
     elif category == "infantry":
-        query = query.having(func.sum(PlayerStat.frags_inf) >= 5)
-        
-    # Sort by KD descending
-    query = query.order_by(desc("kd_ratio")).limit(limit)
+        query = query.where(LeaderboardEntry.frags_inf >= TOP_CATEGORY_MIN_FRAGS)
+    query = query.order_by(LeaderboardEntry.rank_kd, LeaderboardEntry.name).limit(limit)
     
     result = await db.execute(query)
-    rows = result.all()
+    rows = result.scalars().all()
     
     if not rows:
         return []
@@ -406,7 +271,7 @@ async def get_top_players(category: str = "general", limit: int = 10, rotation_i
         .join(Mission, PlayerStat.mission_id == Mission.id)
         .join(MissionSquadStat, 
               (PlayerStat.mission_id == MissionSquadStat.mission_id) & 
-              (func.lower(PlayerStat.squad) == func.lower(MissionSquadStat.squad_tag)), isouter=True
+              (casefold(PlayerStat.squad) == casefold(MissionSquadStat.squad_tag)), isouter=True
         )
         .filter(PlayerStat.name.in_(player_names))
         .order_by(desc(Mission.file_date))
@@ -452,14 +317,16 @@ async def get_top_players(category: str = "general", limit: int = 10, rotation_i
             "name": r.name,
             "side": side,
             "last_squad": last_squad,
-            "total_missions": r.total_missions,
-            "total_frags": r.total_frags or 0,
-            "total_frags_veh": r.total_frags_veh or 0,
-            "total_frags_inf": r.total_frags_inf or 0,
-            "total_deaths": r.total_deaths or 0,
-            "total_destroyed_vehicles": r.total_destroyed_vehicles or 0,
-            "kd_ratio": round(r.kd_ratio, 2) if r.kd_ratio else 0.0,
-            "squads": []
+            "total_missions": r.missions,
+            "total_frags": r.frags,
+            "total_frags_veh": r.frags_veh,
+            "total_frags_inf": r.frags_inf,
+            "total_deaths": r.deaths,
+            "total_destroyed_vehicles": r.destroyed_vehicles,
+            "kd_ratio": r.kd,
+            "squads": [],
+            "missions": [],
+            "timeline": []
         })
         
     return output
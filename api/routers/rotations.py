@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_read_db
+from api.schemas import Rotation as RotationSchema
+from logic.rotations import rotation_resolver
+
+# Public rotation info; editing lives in admin_rotations.py
+router = APIRouter(prefix="/rotations", tags=["rotations"])
+
+@router.get("/active", response_model=Optional[RotationSchema])
+async def get_active_rotation(db: AsyncSession = Depends(get_read_db)):
+    # Served from the rotation cache, no query unless the cache is stale
+    rot = await rotation_resolver.active(db)
+    if not rot:
+        return None
+    return RotationSchema(
+        id=rot.id,
+        name=rot.name,
+        start_date=rot.start_date.replace('_', '-'),
+        end_date=rot.end_date.replace('_', '-'),
+        is_active=True,
+        squad_count=len(rot.squad_ids),
+        squad_ids=list(rot.squad_ids)
+    )
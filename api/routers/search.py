@@ -1,64 +1,48 @@
 from fastapi import APIRouter, Depends
 from typing import List, Dict, Any
-from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_db, PlayerStat, GlobalSquad
+from database import get_read_db
+from logic import search_index
+from logic.autocomplete import AUTOCOMPLETE_ENABLED, autocomplete
 
 router = APIRouter(prefix="/search", tags=["search"])
 
 @router.get("/", response_model=List[Dict[str, Any]])
-async def unified_search(q: str, db: AsyncSession = Depends(get_db)):
-    if not q:
+async def unified_search(q: str, db: AsyncSession = Depends(get_read_db)):
+    if not q or not search_index.fold(q):
         return []
         
-    query_lower = q.lower()
     results = []
     
-    # 1. Search Squads (Priority)
-    # Fetch all global squads to check tags (optimized for small number of squads)
-    # If number of squads grows large, we need a better SQL strategy (e.g. FTS or JSON operators)
-    stmt_squads = select(GlobalSquad)
-    res_squads = await db.execute(stmt_squads)
-    all_squads = res_squads.scalars().all()
+    # 1. Search Squads (Priority): names and tags from the search index, best match first
+    if AUTOCOMPLETE_ENABLED:
+        # In-memory prefix lookup, no queries unless the data changed since it was built
+        await autocomplete.ensure(db)
+        squad_matches = autocomplete.lookup("squad", q, limit=30)
+        player_names = [name for name, _ in autocomplete.lookup("player", q, limit=10)]
+    else:
+        squad_matches = [(e.name, e.label) for e in await search_index.search(db, "squad", q, limit=30)]
+        player_names = [e.name for e in await search_index.search(db, "player", q, limit=10)]
     
-    for s in all_squads:
-        # Check Name
-        if query_lower in s.name.lower():
-            results.append({
-                "type": "squad",
-                "name": s.name,
-                "label": f"Отряд: {s.name}"
-            })
-            continue # Don't add twice if tag also matches
-            
-        # Check Tags
-        if s.tags:
-            for t in s.tags:
-                if query_lower in str(t).lower():
-                    results.append({
-                        "type": "squad",
-                        "name": s.name,
-                        "label": f"Отряд: {s.name} (aka {t})"
-                    })
-                    break # One match per squad is enough
+    squad_tags = {}
+    for name, tag in squad_matches:
+        if name not in squad_tags or tag is None:
+            squad_tags[name] = tag # Name match wins over tag match
     
-    # 2. Search Players
-    stmt_players = (
-        select(PlayerStat.name)
-        .filter(PlayerStat.name.ilike(f"%{q}%"))
-        .distinct()
-        .limit(10)
-    )
-    res_player = await db.execute(stmt_players)
-    players = res_player.scalars().all()
+    for name, tag in squad_tags.items():
+        results.append({
+            "type": "squad",
+            "name": name,
+            "label": f"Отряд: {name} (aka {tag})" if tag else f"Отряд: {name}"
+        })
     
-    for p in players:
+    # 2. Search Players: prefix matches first, then the most active players
+    for name in player_names:
         results.append({
             "type": "player",
-            "name": p,
-            "label": p
+            "name": name,
+            "label": name
         })
         
-    # Sort: Squads first, then alphabetical?
-    # Or strict limit?
+    # Squads first, then players
     return results[:15]
@@ -1,77 +1,28 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List, Dict, Set, Optional
 from sqlalchemy.future import select
-from sqlalchemy import func, case, desc, and_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import func, case, and_
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_db, MissionSquadStat, GlobalSquad, PlayerStat, Mission, Rotation, RotationSquad
-from api.schemas import SquadAggregatedStats, SquadDetailedStats, TotalSquadsResponse
+from database import get_read_db, MissionSquadStat, PlayerStat, Mission
+from api.schemas import SquadAggregatedStats, SquadDetailedStats, TotalSquadsResponse, BatchRequest, BATCH_MAX_NAMES
+from api.caching import cached_route
+from api.responses import fast_response
+from logic.squad_registry import squad_registry
+from logic.rotations import get_rotation_context
 import logging
 
 router = APIRouter(prefix="/squads", tags=["squads"])
 
-async def get_rotation_context(db: AsyncSession, rotation_id: Optional[int]):
-    if not rotation_id:
-        return None, None, None
-        
-    stmt = select(Rotation).filter(Rotation.id == rotation_id).options(selectinload(Rotation.squads).selectinload(RotationSquad.squad))
-    res = await db.execute(stmt)
-    rot = res.scalars().first()
-    
-    if not rot:
-        return None, None, None
-        
-    # Whitelist of canonical names
-    whitelist_names = set()
-    for rs in rot.squads:
-        if rs.squad:
-            whitelist_names.add(rs.squad.name)
-            
-    return rot.start_date.replace('-', '_'), rot.end_date.replace('-', '_'), whitelist_names
-
-async def get_squad_mappings(db: AsyncSession):
-    """
-    Returns:
-      tag_to_canonical: dict[lower_tag -> canonical_name]
-      canonical_meta: dict[canonical_name -> {side: str, name: str}]
-      canonical_to_tags: dict[canonical_name -> list[str]] # including canonical itself lowerec
-    """
-    stmt = select(GlobalSquad)
-    res = await db.execute(stmt)
-    all_squads = res.scalars().all()
-    
-    tag_to_canonical = {}
-    canonical_meta = {}
-    canonical_to_tags = {}
-
-    for sq in all_squads:
-        if not sq.name:
-            continue
-        c_name = sq.name.strip() # Strip canonical name
-        canonical_meta[c_name] = {"side": sq.side, "name": c_name}
-        
-        tags = set()
-        tags.add(c_name.lower())
-        
-        if sq.tags:
-            for t in sq.tags:
-                tags.add(t.strip().lower()) # Strip and lower tags
-        
-        canonical_to_tags[c_name] = list(tags)
-        
-        for t in tags:
-            tag_to_canonical[t] = c_name
-            
-    return tag_to_canonical, canonical_meta, canonical_to_tags
-
-
 @router.get("/total_stats", response_model=TotalSquadsResponse)
-async def get_total_squad_stats(rotation_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+@fast_response("squads.total_stats", TotalSquadsResponse)
+@cached_route("squads.total_stats", max_concurrency=2)
+async def get_total_squad_stats(rotation_id: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
     # 0. Rotation Context
     start_date, end_date, whitelist_names = await get_rotation_context(db, rotation_id)
 
     # 1. Get Mappings
-    tag_to_canonical, canonical_meta, _ = await get_squad_mappings(db)
+    maps = await squad_registry.get(db)
+    tag_to_canonical, canonical_meta = maps.tag_to_canonical, maps.canonical_meta
     
     # 2. Fetch ALL MissionSquadStat joined with Mission
     stmt = (
@@ -80,7 +31,7 @@ async def get_total_squad_stats(rotation_id: Optional[int] = None, db: AsyncSess
             func.count(MissionSquadStat.mission_id).label("total_missions"),
             func.sum(MissionSquadStat.frags).label("total_frags"),
             func.sum(MissionSquadStat.death).label("total_deaths"),
-            MissionSquadStat.side
+            func.max(MissionSquadStat.side).label("side") # Aggregate so the query is valid on PostgreSQL too
         )
         .join(Mission, MissionSquadStat.mission_id == Mission.id)
         .where(Mission.duration_time >= 100)
@@ -231,12 +182,15 @@ async def get_total_squad_stats(rotation_id: Optional[int] = None, db: AsyncSess
     return {"west": west, "east": east, "other": other, "history": list(history_map.values())}
 
 @router.get("/top", response_model=List[SquadAggregatedStats])
-async def get_top_squads(rotation_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+@fast_response("squads.top", List[SquadAggregatedStats])
+@cached_route("squads.top")
+async def get_top_squads(rotation_id: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
     # Rotation Context
     start_date, end_date, whitelist_names = await get_rotation_context(db, rotation_id)
 
     # 1. Get whitelist (Only configured squads)
-    tag_to_canonical, canonical_meta, _ = await get_squad_mappings(db)
+    maps = await squad_registry.get(db)
+    tag_to_canonical = maps.tag_to_canonical
     
     if not tag_to_canonical:
         return []
@@ -300,12 +254,9 @@ async def get_top_squads(rotation_id: Optional[int] = None, db: AsyncSession = D
     output.sort(key=lambda x: x["kd_ratio"], reverse=True)
     return output[:50]
 
-@router.get("/{squad_name}", response_model=SquadDetailedStats)
-async def get_squad_stats(squad_name: str, rotation_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
-    # Rotation Context
-    start_date, end_date, whitelist_names = await get_rotation_context(db, rotation_id)
-
-    tag_to_canonical, canonical_meta, canonical_to_tags = await get_squad_mappings(db)
+def resolve_squad(squad_name: str, maps):
+    """(canonical name, exact squad_tag values it may be stored under)"""
+    tag_to_canonical, canonical_meta, canonical_to_tags = maps.tag_to_canonical, maps.canonical_meta, maps.canonical_to_tags
     
     squad_lower = squad_name.strip().lower()
     
@@ -330,19 +281,6 @@ async def get_squad_stats(squad_name: str, rotation_id: Optional[int] = None, db
          target_canonical = squad_name # Keep original casing as best guess
          target_tags = [squad_lower]
 
-    # Whitelist Check: If rotation exists and this squad is not in it, return 404 or empty?
-    # Returning empty allows viewing profile but with 0 stats, which is informative.
-    if whitelist_names is not None and target_canonical not in whitelist_names:
-         return {
-            "squad_name": target_canonical,
-            "total_missions": 0,
-            "total_frags": 0,
-            "total_deaths": 0,
-            "kd_ratio": 0.0,
-            "players": [],
-            "missions": []
-        }
-
     # --- 2. Build Search Terms for DB ---
     # Since SQLite lower() breaks on Cyrillic, we must exact match the possible stored values.
     # Stored values are either:
@@ -358,12 +296,50 @@ async def get_squad_stats(squad_name: str, rotation_id: Optional[int] = None, db
     # Add UPPER versions of all aliases
     for t in target_tags:
         search_terms.add(t.upper())
-        # Also add capitalized or original if we had them, but we only have lower in target_tags
         # UPPER is the safe fallback for unmapped OCAP tags.
+    
+    return target_canonical, search_terms
 
-    # --- 3. Aggregate Players ---
+def empty_squad_profile(squad_name: str) -> dict:
+    return {
+        "squad_name": squad_name,
+        "total_missions": 0,
+        "total_frags": 0,
+        "total_deaths": 0,
+        "kd_ratio": 0.0,
+        "players": [],
+        "missions": []
+    }
+
+async def build_squad_profiles(db: AsyncSession, names: List[str], rotation_id: Optional[int]) -> Dict[str, Optional[dict]]:
+    """
+    Profiles for several squads at once: name -> profile, or None when the squad has no rows.
+    One grouped player query and one mission query for all of them.
+    """
+    # Rotation Context
+    start_date, end_date, whitelist_names = await get_rotation_context(db, rotation_id)
+    maps = await squad_registry.get(db)
+    
+    profiles = {}
+    targets = {}  # requested name -> (canonical, search terms)
+    term_owners = {}  # stored squad_tag -> requested names it counts for
+    for name in names:
+        target_canonical, search_terms = resolve_squad(name, maps)
+        # Whitelist Check: outside the rotation the profile is empty (0 stats) rather than 404
+        if whitelist_names is not None and target_canonical not in whitelist_names:
+            profiles[name] = empty_squad_profile(target_canonical)
+            continue
+        targets[name] = (target_canonical, search_terms)
+        for term in search_terms:
+            term_owners.setdefault(term, []).append(name)
+    
+    if not targets:
+        return profiles
+    
+    # --- 3. Aggregate Players (per stored tag, summed per squad below) ---
     stmt_players = (
         select(
+            PlayerStat.squad,
             PlayerStat.name,
             func.count(PlayerStat.mission_id).label("total_missions"),
             func.sum(PlayerStat.frags).label("total_frags"),
@@ -373,21 +349,39 @@ async def get_squad_stats(squad_name: str, rotation_id: Optional[int] = None, db
             func.sum(PlayerStat.destroyed_veh).label("total_destroyed_vehicles")
         )
         .join(Mission, PlayerStat.mission_id == Mission.id)
-        .filter(PlayerStat.squad.in_(search_terms)) # Exact match filter
+        .filter(PlayerStat.squad.in_(term_owners.keys())) # Exact match filter
         .filter(Mission.duration_time >= 100)
     )
 
     if start_date and end_date:
         stmt_players = stmt_players.filter(and_(Mission.file_date >= start_date, Mission.file_date <= end_date + " 23:59:59"))
 
-    stmt_players = stmt_players.group_by(PlayerStat.name).order_by(desc("total_missions"))
+    stmt_players = stmt_players.group_by(PlayerStat.squad, PlayerStat.name)
     
     res_players = await db.execute(stmt_players)
-    players_rows = res_players.all()
+    players_by_target = {name: {} for name in targets}
+    for r in res_players.all():
+        for owner in term_owners[r.squad]:
+            agg = players_by_target[owner].setdefault(r.name, {
+                "name": r.name,
+                "total_missions": 0,
+                "total_frags": 0,
+                "total_frags_veh": 0,
+                "total_frags_inf": 0,
+                "total_deaths": 0,
+                "total_destroyed_vehicles": 0
+            })
+            agg["total_missions"] += r.total_missions
+            agg["total_frags"] += r.total_frags or 0
+            agg["total_frags_veh"] += r.total_frags_veh or 0
+            agg["total_frags_inf"] += r.total_frags_inf or 0
+            agg["total_deaths"] += r.total_deaths or 0
+            agg["total_destroyed_vehicles"] += r.total_destroyed_vehicles or 0
     
     # --- 4. Squad Meta (Missions) ---
     stmt_meta_missions = (
          select(
+            MissionSquadStat.squad_tag,
             Mission.id,
             Mission.mission_name,
             Mission.map_name,
@@ -397,87 +391,94 @@ async def get_squad_stats(squad_name: str, rotation_id: Optional[int] = None, db
             MissionSquadStat.death
         )
         .join(Mission, MissionSquadStat.mission_id == Mission.id)
-        .filter(MissionSquadStat.squad_tag.in_(search_terms)) # Exact match filter
+        .filter(MissionSquadStat.squad_tag.in_(term_owners.keys())) # Exact match filter
         .filter(Mission.duration_time >= 100)
     )
 
     if start_date and end_date:
         stmt_meta_missions = stmt_meta_missions.filter(and_(Mission.file_date >= start_date, Mission.file_date <= end_date + " 23:59:59"))
 
-    stmt_meta_missions = stmt_meta_missions.order_by(desc(Mission.file_date))
-    
     res_missions = await db.execute(stmt_meta_missions)
-    missions_rows = res_missions.all()
-
-    if not missions_rows and not players_rows:
-        raise HTTPException(status_code=404, detail="Squad not found")
-
-    # Reuse list for aggregations
-    grand_frags = 0
-    grand_deaths = 0
     
-    # Process Players
-    players_list = []
-    for p in players_rows:
-        deaths = p.total_deaths or 0
-        kd = round(p.total_frags / deaths, 2) if deaths > 0 else float(p.total_frags)
-        
-        grand_frags += p.total_frags or 0
-        grand_deaths += deaths
-        
-        players_list.append({
-            "name": p.name,
-            "total_missions": p.total_missions,
-            "total_frags": p.total_frags,
-            "total_frags_veh": p.total_frags_veh or 0,
-            "total_frags_inf": p.total_frags_inf or 0,
-            "total_deaths": deaths,
-            "total_destroyed_vehicles": p.total_destroyed_vehicles or 0,
-            "kd_ratio": kd
-        })
-        
-    # Process Missions
     # Note: A squad might appear multiple times in same mission if it has split tags?
     # e.g. "Alpha" and "[Alpha]" in same mission. 
     # We should aggregate them per mission.
+    missions_by_target = {name: {} for name in targets}  # -> mission_id -> data
+    for m in res_missions.all():
+        for owner in term_owners[m.squad_tag]:
+            missions_map = missions_by_target[owner]
+            if m.id not in missions_map:
+                missions_map[m.id] = {
+                    "mission_id": m.id,
+                    "mission_name": m.mission_name,
+                    "map_name": m.map_name,
+                    "date": m.file_date,
+                    "duration_time": m.duration_time,
+                    "frags": 0,
+                    "deaths": 0,
+                    "squad": None,
+                    "side": None
+                }
+            missions_map[m.id]["frags"] += (m.frags or 0)
+            missions_map[m.id]["deaths"] += (m.death or 0)
     
-    missions_map = {} # mission_id -> data
-    
-    for m in missions_rows:
-        mid = m.id
-        if mid not in missions_map:
-            missions_map[mid] = {
-                "mission_id": m.id,
-                "mission_name": m.mission_name,
-                "map_name": m.map_name,
-                "date": m.file_date,
-                "duration_time": m.duration_time,
-                "frags": 0,
-                "deaths": 0
-            }
+    for name, (target_canonical, _) in targets.items():
+        players = players_by_target[name]
+        missions = missions_by_target[name]
+        if not players and not missions:
+            profiles[name] = None
+            continue
         
-        missions_map[mid]["frags"] += (m.frags or 0)
-        missions_map[mid]["deaths"] += (m.death or 0)
+        grand_frags = 0
+        grand_deaths = 0
         
-    final_missions_list = []
-    for m in missions_map.values():
-        fr = m["frags"]
-        d = m["deaths"]
-        kd = round(fr / d, 2) if d > 0 else float(fr)
-        m["kd"] = kd
-        final_missions_list.append(m)
+        # Most active players first (ties by name)
+        players_list = sorted(players.values(), key=lambda p: (-p["total_missions"], p["name"]))
+        for p in players_list:
+            deaths = p["total_deaths"]
+            p["kd_ratio"] = round(p["total_frags"] / deaths, 2) if deaths > 0 else float(p["total_frags"])
+            grand_frags += p["total_frags"]
+            grand_deaths += deaths
         
-    # Sort missions by date descending
-    final_missions_list.sort(key=lambda x: x["date"], reverse=True)
-    
-    squad_kd = round(grand_frags / grand_deaths, 2) if grand_deaths > 0 else float(grand_frags)
-    
-    return {
-        "squad_name": target_canonical,
-        "total_missions": len(final_missions_list),
-        "total_frags": grand_frags,
-        "total_deaths": grand_deaths,
-        "kd_ratio": squad_kd,
-        "players": players_list,
-        "missions": final_missions_list
-    }
+        final_missions_list = []
+        for m in missions.values():
+            fr = m["frags"]
+            d = m["deaths"]
+            m["kd"] = round(fr / d, 2) if d > 0 else float(fr)
+            final_missions_list.append(m)
+        
+        # Sort missions by date descending
+        final_missions_list.sort(key=lambda x: (x["date"], x["mission_id"]), reverse=True)
+        
+        squad_kd = round(grand_frags / grand_deaths, 2) if grand_deaths > 0 else float(grand_frags)
+        
+        profiles[name] = {
+            "squad_name": target_canonical,
+            "total_missions": len(final_missions_list),
+            "total_frags": grand_frags,
+            "total_deaths": grand_deaths,
+            "kd_ratio": squad_kd,
+            "players": players_list,
+            "missions": final_missions_list
+        }
+    return profiles
+
+@router.post("/batch", response_model=Dict[str, Optional[SquadDetailedStats]])
+@fast_response("squads.batch", Dict[str, Optional[SquadDetailedStats]])
+@cached_route("squads.batch")
+async def get_squads_batch(req: BatchRequest, db: AsyncSession = Depends(get_read_db)):
+    """Several squad profiles in one request: name -> same body as /squads/{name}, null when not found"""
+    names = list(dict.fromkeys(req.names))
+    if len(names) > BATCH_MAX_NAMES:
+        raise HTTPException(status_code=400, detail=f"Too many names (max {BATCH_MAX_NAMES})")
+    return await build_squad_profiles(db, names, req.rotation_id)
+
+@router.get("/{squad_name}", response_model=SquadDetailedStats)
+@fast_response("squads.profile", SquadDetailedStats)
+@cached_route("squads.profile")
+async def get_squad_stats(squad_name: str, rotation_id: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
+    profiles = await build_squad_profiles(db, [squad_name], rotation_id)
+    profile = profiles[squad_name]
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Squad not found")
+    return profile
@@ -132,6 +132,13 @@ class PlayerAggregatedStats(BaseModel):
     missions: List[MissionPerformance] = []
     timeline: List[TimelineSegment] = []
 
+# Max names per /players/batch or /squads/batch request
+BATCH_MAX_NAMES = 50
+
+class BatchRequest(BaseModel):
+    names: List[str]
+    rotation_id: Optional[int] = None
+
 class SideMissionStat(BaseModel):
     date: str
     mission_name: str
@@ -148,6 +155,31 @@ class SquadDetailedStats(SquadAggregatedStats):
     players: List[SquadPlayerStats]
     missions: List[MissionPerformance] = []
 
+class LeaderboardRow(BaseModel):
+    rank: Optional[int] = None # None: below the qualification thresholds
+    name: str
+    missions: int
+    frags: int
+    frags_veh: int
+    frags_inf: int
+    deaths: int
+    destroyed_vehicles: int
+    distance: float
+    kd: float
+
+class LeaderboardPage(BaseModel):
+    metric: str
+    rotation_id: Optional[int] = None
+    items: List[LeaderboardRow]
+    total: int
+    next_cursor: Optional[str] = None
+
+class LeaderboardPlayerRank(BaseModel):
+    metric: str
+    rotation_id: Optional[int] = None
+    total: int # Ranked players, "#57 of 812"
+    entry: LeaderboardRow
+
 class RotationBase(BaseModel):
     name: str # e.g. "Season 1"
     start_date: str # YYYY-MM-DD
@@ -167,3 +199,70 @@ class Rotation(RotationBase):
 
     class Config:
         from_attributes = True
+
+# --- Admin listings ---
+# Slim rows without the JSON blob columns, which are deferred on the models
+
+class AdminPlayerRow(BaseModel):
+    id: int
+    mission_id: Optional[int] = None
+    player_uid: Optional[int] = None
+    name: Optional[str] = None
+    side: Optional[str] = None
+    squad: Optional[str] = None
+    frags: int = 0
+    frags_veh: int = 0
+    frags_inf: int = 0
+    death: int = 0
+    tk: int = 0
+    destroyed_veh: int = 0
+    distance: float = 0.0
+
+    class Config:
+        from_attributes = True
+
+class AdminPlayerList(BaseModel):
+    items: List[AdminPlayerRow]
+    total: int
+    next_cursor: Optional[str] = None
+
+class AdminSquadStatRow(BaseModel):
+    id: int
+    mission_id: Optional[int] = None
+    squad_tag: Optional[str] = None
+    side: Optional[str] = None
+    frags: int = 0
+    death: int = 0
+    tk: int = 0
+
+    class Config:
+        from_attributes = True
+
+class AdminSquadStatList(BaseModel):
+    items: List[AdminSquadStatRow]
+    total: int
+    next_cursor: Optional[str] = None
+
+class AdminMissionRow(BaseModel):
+    id: int
+    file_name: Optional[str] = None
+    file_date: Optional[str] = None
+    mission_name: Optional[str] = None
+    world_name: Optional[str] = None
+    map_name: Optional[str] = None
+    game_type: Optional[str] = None
+    duration_frames: Optional[int] = None
+    duration_time: Optional[float] = None
+    win_side: Optional[str] = None
+    total_players: int = 0
+    west_count: int = 0
+    east_count: int = 0
+    guer_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+class AdminMissionList(BaseModel):
+    items: List[AdminMissionRow]
+    total: int
+    next_cursor: Optional[str] = None
@@ -0,0 +1,140 @@
+"""
+Per-route latency histograms and per-request SQL query counts.
+
+TimingMiddleware is the outermost middleware, so it times everything a client waits
+for, 304s and stored compressed bodies included. Requests are grouped by route template
+("GET /players/{player_name}"). A 304 or stored body never reaches routing; it counts
+under the template its path was last routed to, or under "other" like unknown paths.
+Each route keeps a latency histogram over LATENCY_BUCKETS_MS plus the number of SQL
+statements its requests ran (counted by the hooks in logic/query_stats.py).
+
+Each response carries X-Query-Count and Server-Timing (app and db time up to the
+response start), so the browser devtools show them per request. Requests that run
+more than VOSTOKSTAT_MANY_QUERIES statements (default 50) are printed. That is usually
+an N+1.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from starlette.datastructures import MutableHeaders
+
+from logic.query_stats import RequestQueries, current_request
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+MANY_QUERIES = int(os.getenv("VOSTOKSTAT_MANY_QUERIES", "50"))
+PATH_MEMO_MAX = 10000
+
+
+class RouteTiming:
+    __slots__ = ("buckets", "count", "total", "worst", "queries", "max_queries")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)  # Last one is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.queries = 0
+        self.max_queries = 0
+
+    def observe(self, seconds: float, queries: int):
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+        self.count += 1
+        self.total += seconds
+        self.worst = max(self.worst, seconds)
+        self.queries += queries
+        self.max_queries = max(self.max_queries, queries)
+
+    def quantile_ms(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-quantile (None: above the last bucket)"""
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total * 1000 / self.count, 1),
+            "max_ms": round(self.worst * 1000, 1),
+            "p50_ms": self.quantile_ms(0.5),
+            "p95_ms": self.quantile_ms(0.95),
+            "avg_queries": round(self.queries / self.count, 1),
+            "max_queries": self.max_queries,
+        }
+
+
+_lock = threading.Lock()
+route_timings = {}  # "METHOD /route/{template}" -> RouteTiming
+path_templates = {}  # Request path -> route template, for requests that never reach routing
+
+
+def route_key(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        template = route.path
+        if len(path_templates) >= PATH_MEMO_MAX:
+            path_templates.clear()
+        path_templates[scope["path"]] = template
+    else:
+        # Answered before routing (304, stored compressed body): the template this path had last time
+        template = path_templates.get(scope["path"], "other")
+    return f"{scope['method']} {template}"
+
+
+def observe(key: str, seconds: float, queries: int):
+    with _lock:
+        timing = route_timings.get(key)
+        if timing is None:
+            timing = route_timings[key] = RouteTiming()
+        timing.observe(seconds, queries)
+
+
+class TimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        queries = RequestQueries()
+        token = current_request.set(queries)
+        streaming = False
+
+        async def send_with_timing(message):
+            nonlocal streaming
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                # The SSE stream never finishes, its duration is not a latency
+                streaming = headers.get("content-type", "").startswith("text/event-stream")
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers["X-Query-Count"] = str(queries.count)
+                headers["Server-Timing"] = f"app;dur={elapsed_ms:.1f}, db;dur={queries.seconds * 1000:.1f}"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            if not streaming:
+                key = route_key(scope)
+                observe(key, time.perf_counter() - started, queries.count)
+                if queries.count > MANY_QUERIES:
+                    print(f"Many queries: {key} ran {queries.count} statements ({scope['path']})")
+
+
+def get_timing_stats() -> dict:
+    with _lock:
+        routes = {key: timing.stats() for key, timing in route_timings.items()}
+    return dict(sorted(routes.items(), key=lambda item: item[1]["avg_ms"] * item[1]["count"], reverse=True))
+
+
+def reset_timing_stats():
+    with _lock:
+        route_timings.clear()
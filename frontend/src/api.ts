@@ -1,3 +1,5 @@
+import type { MissionSummary } from './types';
+
 
 const API_BASE = '/api';
 
@@ -77,12 +79,37 @@ export const fetchMissions = async (limit: number = 20, skip: number = 0, rotati
     return response.json();
 };
 
+// Server-Sent Events: called with the summary of every newly ingested mission.
+// Returns the unsubscribe function. EventSource reconnects on its own (Last-Event-ID).
+export const subscribeMissionIngested = (onMission: (mission: MissionSummary) => void) => {
+    const source = new EventSource(`${API_BASE}/events/stream`);
+    source.addEventListener('mission_ingested', (e) => onMission(JSON.parse((e as MessageEvent).data)));
+    return () => source.close();
+};
+
 export const fetchMissionDetails = async (id: number) => {
     const response = await fetch(`${API_BASE}/missions/${id}`);
     if (!response.ok) throw new Error('Failed to fetch mission details');
     return response.json();
 };
 
+// Events of one player in a mission, fetched when the player row is expanded.
+// The feed is paged, follow next_cursor until the last page.
+export const fetchMissionPlayerEvents = async (missionId: number, playerId: number, kind: 'kills' | 'vehicles' | 'deaths') => {
+    const items: any[] = [];
+    let cursor: string | null = null;
+    do {
+        let url = `${API_BASE}/missions/${missionId}/players/${playerId}/events?kind=${kind}&limit=500`;
+        if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+        const response = await fetch(url);
+        if (!response.ok) throw new Error('Failed to fetch player events');
+        const data = await response.json();
+        items.push(...data.items);
+        cursor = data.next_cursor;
+    } while (cursor);
+    return items;
+};
+
 export const fetchTopSquads = async (rotationId?: number | null) => {
     let url = `${API_BASE}/squads/top`;
     if (rotationId) url += `?rotation_id=${rotationId}`;
@@ -153,6 +180,27 @@ export const fetchSquadProfile = async (name: string, rotationId?: number | null
     return response.json();
 };
 
+// Several profiles in one request: name -> profile (null if not found)
+export const fetchPlayerProfiles = async (names: string[], rotationId?: number | null) => {
+    const response = await fetch(`${API_BASE}/players/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ names, rotation_id: rotationId || null })
+    });
+    if (!response.ok) throw new Error('Failed to fetch player profiles');
+    return response.json();
+};
+
+export const fetchSquadProfiles = async (names: string[], rotationId?: number | null) => {
+    const response = await fetch(`${API_BASE}/squads/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ names, rotation_id: rotationId || null })
+    });
+    if (!response.ok) throw new Error('Failed to fetch squad profiles');
+    return response.json();
+};
+
 // Squad Total Stats
 export interface SideMissionStat {
     date: string;
@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { fetchMissionDetails } from '../api';
-import type { MissionDetail as MissionDetailType, PlayerStats, SquadStats } from '../types';
+import { fetchMissionDetails, fetchMissionPlayerEvents } from '../api';
+import type { MissionDetail as MissionDetailType, PlayerStats, SquadStats, KillEvent, DestroyedVehicleEvent } from '../types';
 import './MissionDetail.css';
 import { formatDuration, formatPlayerName, getCleanName } from '../utils';
 
@@ -28,6 +28,8 @@ export const MissionDetail: React.FC<MissionDetailProps> = ({ missionId, onBack
     const [squadSort, setSquadSort] = useState<SortConfig<SquadStats>>({ key: 'frags', direction: 'desc' });
     const [selectedSquadTag, setSelectedSquadTag] = useState<string | null>(null);
     const [selectedPlayerId, setSelectedPlayerId] = useState<number | null>(null);
+    // Event lists are not part of the mission summary, they are loaded per player on expand
+    const [playerEvents, setPlayerEvents] = useState<Record<number, { victims_players: KillEvent[]; destroyed_vehicles: DestroyedVehicleEvent[] }>>({});
 
     const toggleSquad = (squadTag: string) => {
         if (selectedSquadTag === squadTag) {
@@ -42,6 +44,17 @@ export const MissionDetail: React.FC<MissionDetailProps> = ({ missionId, onBack
             setSelectedPlayerId(null);
         } else {
             setSelectedPlayerId(playerId);
+            if (!playerEvents[playerId]) {
+                Promise.all([
+                    fetchMissionPlayerEvents(missionId, playerId, 'kills'),
+                    fetchMissionPlayerEvents(missionId, playerId, 'vehicles')
+                ])
+                    .then(([kills, vehicles]) => setPlayerEvents(prev => ({
+                        ...prev,
+                        [playerId]: { victims_players: kills, destroyed_vehicles: vehicles }
+                    })))
+                    .catch(e => console.error(e));
+            }
         }
     };
 
@@ -240,7 +253,9 @@ export const MissionDetail: React.FC<MissionDetailProps> = ({ missionId, onBack
                         <span onClick={() => handleSort('death', playerSort, setPlayerSort)}>Смерти {renderSortArrow('death', playerSort)}</span>
                         <span>K/D</span>
                     </div>
-                    {currentPlayers.map(p => (
+                    {currentPlayers.map(row => {
+                        const p = { ...row, ...playerEvents[row.id] };
+                        return (
                         <React.Fragment key={p.id}>
                             <div
                                 className={`table-row clickable-row ${selectedPlayerId === p.id ? 'active-row' : ''}`}
@@ -306,7 +321,8 @@ export const MissionDetail: React.FC<MissionDetailProps> = ({ missionId, onBack
                                 </div>
                             )}
                         </React.Fragment>
-                    ))}
+                        );
+                    })}
                 </div>
             </div>
 
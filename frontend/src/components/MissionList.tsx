@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import { fetchMissions } from '../api';
+import { fetchMissions, subscribeMissionIngested } from '../api';
 import type { MissionSummary } from '../types';
 import './MissionList.css';
 import { formatDuration } from '../utils';
@@ -17,11 +17,13 @@ export const MissionList: React.FC<MissionListProps> = ({ onSelectMission }) =>
 
     useEffect(() => {
         loadMissions();
+        // New missions are pushed by the server; refetch so the rotation filter still applies
+        return subscribeMissionIngested(() => loadMissions(true));
     }, [currentRotationId]);
 
-    const loadMissions = async () => {
+    const loadMissions = async (quiet: boolean = false) => {
         try {
-            setLoading(true);
+            if (!quiet) setLoading(true);
             const data = await fetchMissions(20, 0, currentRotationId);
             setMissions(data);
         } catch {
@@ -0,0 +1,99 @@
+"""
+Optional in-process autocomplete for /search/ (VOSTOKSTAT_AUTOCOMPLETE=1).
+
+Player names and squad names/tags are kept in sorted arrays of casefolded keys;
+a prefix lookup is two bisects plus picking the best few of the range by mission
+count, without touching the database.
+
+The arrays are built from search_index at startup. process_ocap adds a mission's
+players incrementally. Any other data change (admin edits, another process ingesting)
+moves the data generation, and the arrays are rebuilt on the next lookup.
+
+Unlike the search index this matches prefixes only.
+"""
+import heapq
+import os
+import threading
+from bisect import bisect_left, insort
+
+from sqlalchemy import select
+
+from database import SearchEntry, SyncSessionLocal
+from logic.cache import current_generation
+from logic.search_index import fold
+
+AUTOCOMPLETE_ENABLED = os.getenv("VOSTOKSTAT_AUTOCOMPLETE", "0").lower() in ("1", "true", "yes")
+KINDS = ("player", "squad")
+
+
+class Autocomplete:
+    def __init__(self):
+        # kind -> sorted list of (key, name, label)
+        self.keys = {kind: [] for kind in KINDS}
+        # (kind, name) -> number of missions
+        self.weights = {}
+        self.generation = None
+        self.lock = threading.Lock()
+
+    def is_fresh(self) -> bool:
+        return self.generation == current_generation()
+
+    def build(self, session):
+        generation = current_generation()
+        rows = session.execute(
+            select(SearchEntry.kind, SearchEntry.key, SearchEntry.name, SearchEntry.label, SearchEntry.weight)
+            .where(SearchEntry.kind.in_(KINDS))
+        ).all()
+
+        keys = {kind: [] for kind in KINDS}
+        weights = {}
+        for kind, key, name, label, weight in rows:
+            keys[kind].append((key, name, label))
+            weights[(kind, name)] = weight or 0
+        for entries in keys.values():
+            entries.sort()
+
+        with self.lock:
+            self.keys = keys
+            self.weights = weights
+            self.generation = generation
+
+    def build_sync(self):
+        with SyncSessionLocal() as session:
+            self.build(session)
+        print(f"Autocomplete ready: {len(self.keys['player'])} players, {len(self.keys['squad'])} squad keys")
+
+    async def ensure(self, db):
+        if not self.is_fresh():
+            await db.run_sync(self.build)
+
+    def add_players(self, names):
+        """One more mission for each name (process_ocap, after commit)"""
+        with self.lock:
+            for name in set(names):
+                if not name:
+                    continue
+                if ("player", name) in self.weights:
+                    self.weights[("player", name)] += 1
+                else:
+                    self.weights[("player", name)] = 1
+                    insort(self.keys["player"], (fold(name), name, None))
+            self.generation = current_generation()
+
+    def lookup(self, kind: str, q: str, limit: int = 10) -> list:
+        """[(name, label)] whose key starts with q: exact match first, then most missions"""
+        q_folded = fold(q)
+        if not q_folded:
+            return []
+        with self.lock:
+            entries = self.keys[kind]
+            lo = bisect_left(entries, (q_folded,))
+            hi = bisect_left(entries, (q_folded + "\U0010ffff",), lo)
+            best = heapq.nsmallest(
+                limit, (entries[i] for i in range(lo, hi)),
+                key=lambda e: (e[0] != q_folded, -self.weights.get((kind, e[1]), 0), e[1])
+            )
+        return [(name, label) for _, name, label in best]
+
+
+autocomplete = Autocomplete()
@@ -1,13 +1,20 @@
 import os
 import shutil
+import sqlite3
 import zipfile
 import datetime
-import requests
 import asyncio
+import time
 from typing import Optional
 
+from sqlalchemy.engine import make_url
+
+from database import DATABASE_URL, IS_SQLITE
+from logic.metrics import BACKUP_SECONDS
+
 # Constants
-DB_PATH = "vostokstat.db"
+# File of the SQLite database DATABASE_URL points at (None for other backends)
+DB_PATH = make_url(DATABASE_URL).database if IS_SQLITE else None
 BACKUP_DIR = "backups"
 
 def create_backup_zip() -> str:
@@ -15,6 +22,12 @@ def create_backup_zip() -> str:
     Creates a ZIP backup of the database.
     Returns the absolute path to the created ZIP file.
     """
+    if not IS_SQLITE:
+        raise RuntimeError("File backups are only supported for SQLite. Use pg_dump for PostgreSQL.")
+
+    if not DB_PATH or DB_PATH == ":memory:" or not os.path.exists(DB_PATH):
+        raise FileNotFoundError(f"Database file {DB_PATH} not found.")
+
     if not os.path.exists(BACKUP_DIR):
         os.makedirs(BACKUP_DIR)
 
@@ -22,21 +35,25 @@ def create_backup_zip() -> str:
     backup_name = f"vostokstat_backup_{timestamp}.zip"
     zip_path = os.path.join(BACKUP_DIR, backup_name)
 
-    # Use a temporary file for the DB copy to avoid locking issues if possible,
-    # though with SQLite shutil.copy is usually fine for read-only copy.
-    # For extra safety, we might want to wal_checkpoint if we were doing this perfectly,
-    # but for this scale, direct copy zipping is standard.
-    
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        if os.path.exists(DB_PATH):
-            zipf.write(DB_PATH, arcname="vostokstat.db")
-        else:
-            raise FileNotFoundError(f"Database file {DB_PATH} not found.")
+    # The DB runs in WAL mode, so recent commits may still live in the -wal file.
+    # Take a consistent snapshot with SQLite's online backup API instead of copying the file.
+    snapshot_path = zip_path + ".db"
+    source = sqlite3.connect(DB_PATH)
+    target = sqlite3.connect(snapshot_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+    try:
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            zipf.write(snapshot_path, arcname="vostokstat.db")
+    finally:
+        os.remove(snapshot_path)
 
     return os.path.abspath(zip_path)
 
-import httpx
-import datetime
 
 # Logging helper
 def log_debug(msg):
@@ -51,6 +68,8 @@ async def send_to_telegram(file_path: str, bot_token: str, chat_id: str) -> bool
         log_debug("Telegram Bot Token or Chat ID not configured.")
         return False
 
+    import httpx  # Only needed twice a week, keep it out of API startup
+
     url = f"https://api.telegram.org/bot{bot_token}/sendDocument"
     
     try:
@@ -81,8 +100,17 @@ async def run_backup_task(get_config_func):
     """
     Main task to be run by scheduler.
     """
+    if not IS_SQLITE:
+        msg = f"Backup skipped: {make_url(DATABASE_URL).get_backend_name()} database, file backups are SQLite only (use pg_dump)."
+        log_debug(msg)
+        print(msg)
+        BACKUP_SECONDS.observe(0, result="skipped")
+        return
+
     log_debug("=== Starting Backup Task (Async HTTPX) ===")
     print("=== Starting Backup Task ===")
+    started = time.perf_counter()
+    result = "ok"
     try:
         # Create Zip
         log_debug("Creating zip...")
@@ -99,6 +127,7 @@ async def run_backup_task(get_config_func):
             log_debug(f"Config Retrieved. Token: {'Yes' if bot_token else 'No'}, ChatID: {chat_id}")
         except Exception as e:
             log_debug(f"Config Fetch Failed: {e}")
+            result = "config_failed"
             return
 
         if bot_token and chat_id:
@@ -106,6 +135,8 @@ async def run_backup_task(get_config_func):
             # Directly await the async function, no to_thread needed for IO
             success = await send_to_telegram(zip_path, bot_token, chat_id)
             log_debug(f"Upload Result: {success}")
+            if not success:
+                result = "upload_failed"
         else:
             log_debug("Telegram not configured. Skipping upload.")
             print("Telegram not configured. Skipping upload.")
@@ -113,4 +144,7 @@ async def run_backup_task(get_config_func):
     except Exception as e:
         log_debug(f"Backup task CRITICAL FAIL: {e}")
         print(f"Backup task failed: {e}")
+        result = "failed"
+    finally:
+        BACKUP_SECONDS.observe(time.perf_counter() - started, result=result)
     print("=== Backup Task Finished ===")
@@ -0,0 +1,199 @@
+"""
+Data generation counter and response cache.
+
+The generation changes whenever stored stats change (process_ocap commit, admin edits).
+Cache keys include it, so a bump invalidates every cached response at once without
+having to track what depends on what.
+
+By default everything is in-process. With VOSTOKSTAT_CACHE_DIR set, the generation and
+cached responses are also shared through files in that directory, so several API workers
+and the ingestion process see the same generation.
+
+The generation is per process and changes on restart, so HTTP validators use the data
+version instead: derived from event_log (see logic/events.py), which every data change
+writes to. It is the same in every process and survives restarts.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_DIR = os.getenv("VOSTOKSTAT_CACHE_DIR")
+CACHE_MAX_ENTRIES = int(os.getenv("VOSTOKSTAT_CACHE_MAX_ENTRIES", "512"))
+
+_lock = threading.Lock()
+_generation = time.time_ns()
+_generation_mtime = None
+
+
+def _generation_file() -> Path:
+    path = Path(CACHE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path / "generation"
+
+
+def current_generation() -> int:
+    """Opaque token that changes whenever stored data changes"""
+    global _generation, _generation_mtime
+    if not CACHE_DIR:
+        return _generation
+
+    gen_file = _generation_file()
+    try:
+        mtime = gen_file.stat().st_mtime_ns
+    except FileNotFoundError:
+        bump_generation()
+        return _generation
+
+    if mtime != _generation_mtime:
+        try:
+            value = int(gen_file.read_text())
+        except ValueError:
+            return _generation  # Caught mid-write, keep the previous value
+        with _lock:
+            _generation = value
+            _generation_mtime = mtime
+    return _generation
+
+
+def bump_generation():
+    """Mark all cached data as stale. Call after committing a change to stats data."""
+    global _generation
+    with _lock:
+        # time based, so independent processes never hand out the same value twice
+        _generation = max(_generation + 1, time.time_ns())
+        value = _generation
+
+    if CACHE_DIR:
+        gen_file = _generation_file()
+        tmp = gen_file.with_name(f"generation.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(str(value))
+        os.replace(tmp, gen_file)
+
+
+_data_version = None  # (newest event_log id, rows among the ids before it), None until loaded
+_data_modified = 0.0  # Unix time of the newest change
+
+
+def data_version() -> tuple:
+    """(version, modified time) of the stored data; version is None until first loaded"""
+    return _data_version, _data_modified
+
+
+def note_data_version(version: tuple, modified: float):
+    """Take a version read from the DB, unless one already seen is newer"""
+    global _data_version, _data_modified
+    with _lock:
+        if _data_version is None or version > _data_version:
+            _data_version = version
+            _data_modified = modified
+
+
+def make_key(route: str, params: dict, generation: int) -> str:
+    raw = json.dumps([route, sorted(params.items()), generation], default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU cache with a size cap, hit/miss counters and an optional shared disk backend"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, cache_dir: str | None = CACHE_DIR):
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.disk_path = Path(cache_dir) / "responses" if cache_dir else None
+        if self.disk_path:
+            self.disk_path.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+
+        if self.disk_path:
+            value = self._disk_get(key)
+            if value is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                    self.hits += 1
+                self._memory_set(key, value)
+                return value
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value):
+        self._memory_set(key, value)
+        if self.disk_path:
+            self._disk_set(key, value)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "shared": bool(self.disk_path),
+            }
+
+    def _memory_set(self, key: str, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def _disk_get(self, key: str):
+        try:
+            with (self.disk_path / f"{key}.json").open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _disk_set(self, key: str, value):
+        path = self.disk_path / f"{key}.json"
+        tmp = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False, default=str)
+            os.replace(tmp, path)
+        except (TypeError, OSError) as e:
+            print(f"Response cache: could not write {path.name}: {e}")
+            return
+        self._disk_prune()
+
+    def _disk_prune(self):
+        # Entries of old generations are never read again, keep the directory bounded
+        files = list(self.disk_path.glob("*.json"))
+        excess = len(files) - self.max_entries * 4
+        if excess <= 0:
+            return
+        files.sort(key=lambda f: f.stat().st_mtime)
+        for f in files[:excess]:
+            try:
+                f.unlink()
+            except OSError:
+                pass
+
+
+response_cache = ResponseCache()
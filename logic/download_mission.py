@@ -1,15 +1,31 @@
 import os
 import requests
+import time
 from pathlib import Path
-from time import sleep
 from datetime import datetime, timedelta
 
+from sqlalchemy import select
+
 from logic.mission_pars import process_ocap
-from database import get_app_config_sync
+from database import Mission, SyncSessionLocal, get_app_config_sync, set_app_config_sync
+from logic.metrics import INGEST_FILES_PENDING, INGEST_LAST_SUCCESS, INGEST_ROUNDS, INGEST_STAGE_SECONDS
 
 DEFAULT_OCAPS_URL = 'http://185.236.20.167:5000/api/v1/operations'
 DEFAULT_OCAP_URL = 'http://185.236.20.167:5000/data/%s'
 
+# Date of the last round that went through the whole listing. Missing means the DB was
+# never fully synced (or an "init" was interrupted), see full_sync_needed().
+WATERMARK_KEY = "INGEST_WATERMARK"
+UPDATE_OVERLAP = timedelta(days=2)
+
+
+def full_sync_needed() -> bool:
+    """First round after a start: "init" only for an empty DB or a missing watermark"""
+    if not get_app_config_sync(WATERMARK_KEY, ""):
+        return True
+    with SyncSessionLocal() as session:
+        return session.execute(select(Mission.id).limit(1)).first() is None
+
 def download_new_ocaps(mode="init"):
     # Get config from DB
     ocaps_url = get_app_config_sync("OCAPS_URL", DEFAULT_OCAPS_URL)
@@ -31,7 +47,11 @@ def download_new_ocaps(mode="init"):
         # Скачиваем вообще всё, игнорируя конфиг
         start_date = datetime(2015, 1, 1).date()
     elif mode == "update":
-        start_date = today - timedelta(days=2)
+        start_date = today - UPDATE_OVERLAP
+        # After downtime catch up from the last completed round, not just the last two days
+        watermark = get_app_config_sync(WATERMARK_KEY, "")
+        if watermark:
+            start_date = min(start_date, datetime.strptime(watermark, "%Y-%m-%d").date() - UPDATE_OVERLAP)
     else:
         raise ValueError("Unknown mode: must be 'init' or 'update'")
         
@@ -47,7 +67,7 @@ def download_new_ocaps(mode="init"):
         ocaps_list = response.json()
     except requests.RequestException as e:
         print(f"Ошибка соединения с сервером обновлений: {e}")
-        return []
+        return None
 
     filtered_ocaps = []
     for o in ocaps_list:
@@ -91,10 +111,12 @@ def download_new_ocaps(mode="init"):
         filepath = OCAPS_PATH / new_filename
         try:
             print(f"Скачиваем: {new_filename}")
+            started = time.perf_counter()
             r = requests.get(ocap_url_template % ocap["filename"], timeout=60)
             r.raise_for_status()
             filepath.write_text(r.text, encoding="utf-8")
-            sleep(1)
+            INGEST_STAGE_SECONDS.observe(time.perf_counter() - started, stage="download")
+            time.sleep(1)
             downloaded_files.append(filepath)
         except Exception as ex:
             print(f"Ошибка при скачивании {ocap['filename']}: {ex}")
@@ -109,13 +131,17 @@ DOWNLOAD_LOCK = threading.Lock()
 # Flag to indicate a full rebuild is in progress
 IS_REBUILDING = False
 
-def main(mode="init"):
+def main(mode="init", lease=None) -> bool:
+    """
+    Download and process new missions. With a lease, stops early once it is lost.
+    True when the round went through the whole listing.
+    """
     global IS_REBUILDING
     
     # If we are just updating, check if a full rebuild is busy
     if mode == "update" and IS_REBUILDING:
         print("Skipping 'update' because a full 'init' rebuild is in progress.")
-        return
+        return False
 
     print(f"Acquiring lock for main (mode={mode})...")
     with DOWNLOAD_LOCK:
@@ -124,18 +150,34 @@ def main(mode="init"):
         
         try:
             print(f"Lock acquired. Starting {mode}...")
+            if mode == "init":
+                # Only a finished init sets it again, an interrupted one is redone on the next start
+                set_app_config_sync(WATERMARK_KEY, None)
+            listed_on = datetime.today().date()
             new_ocaps = download_new_ocaps(mode=mode)
+            if new_ocaps is None:
+                INGEST_ROUNDS.inc(mode=mode, result="listing_failed")
+                return False  # Listing failed, keep the old watermark
             if not new_ocaps:
                 print(f"No new missions found for mode {mode}.")
-                return
             
-            for ocap_file in new_ocaps:
+            for pending, ocap_file in enumerate(new_ocaps):
+                INGEST_FILES_PENDING.set(len(new_ocaps) - pending)
+                if lease is not None and not lease.held:
+                    print("Ingestion lease lost, stopping this round.")
+                    INGEST_ROUNDS.inc(mode=mode, result="lease_lost")
+                    return False
                 print(f"Обрабатываем: {ocap_file.name}")
                 try:
                     process_ocap(ocap_file)
                 except Exception as e:
                     print(f"Skipping {ocap_file.name} due to error: {e}")
+            set_app_config_sync(WATERMARK_KEY, listed_on.strftime("%Y-%m-%d"))
+            INGEST_ROUNDS.inc(mode=mode, result="ok")
+            INGEST_LAST_SUCCESS.set(time.time())
+            return True
         finally:
+            INGEST_FILES_PENDING.set(0)
             if mode == "init":
                 IS_REBUILDING = False
                 print("Rebuild finished. Updates enabled.")
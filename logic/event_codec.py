@@ -0,0 +1,137 @@
+"""
+Compact storage format for kill/death/vehicle event lists.
+
+v1 (legacy) is a plain list of dicts, exactly as built by process_ocap.
+v2 is column oriented and drops duplicated data:
+
+    {
+        "v": 2,
+        "k": ["name", "weapon", ...],        # keys that vary between events
+        "r": [["[TAG] Nick", "AK", ...], ...],  # one row per event
+        "c": {"killer_name": "nick"},        # keys with the same value in every event
+        "a": {"OcapPos": "position"},        # keys that always equal another key
+    }
+
+Positions ({"x", "y"} dicts) are stored as [x, y] rounded to POSITION_PRECISION.
+With VOSTOKSTAT_EVENT_COMPRESSION=zlib (or msgpack, if installed) the v2 payload is
+additionally packed into {"v": 2, "z": <codec>, "d": <base64>}.
+
+decode_events() accepts both versions, so reads are transparent.
+"""
+import base64
+import json
+import os
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # Optional dependency
+    msgpack = None
+
+FORMAT_VERSION = 2
+POSITION_PRECISION = 2
+POSITION_KEYS = ("position", "killer_position", "OcapPos")
+
+
+def get_compression() -> str | None:
+    codec = os.getenv("VOSTOKSTAT_EVENT_COMPRESSION", "").lower()
+    if codec == "msgpack" and msgpack is None:
+        codec = "zlib"
+    return codec if codec in ("zlib", "msgpack") else None
+
+
+def _pack_position(pos):
+    if not pos:
+        return None
+    return [round(pos["x"], POSITION_PRECISION), round(pos["y"], POSITION_PRECISION)]
+
+
+def _unpack_position(pos):
+    if not pos:
+        return None
+    return {"x": pos[0], "y": pos[1]}
+
+
+def encode_events(events: list | None) -> dict | list | None:
+    if events is None:
+        return None
+    if isinstance(events, dict):
+        return events  # Already encoded
+    if not events:
+        return []
+
+    keys: list[str] = []
+    for e in events:
+        for k in e:
+            if k not in keys:
+                keys.append(k)
+
+    def value(e, k):
+        v = e.get(k)
+        return _pack_position(v) if k in POSITION_KEYS else v
+
+    aliases = {}
+    for k in POSITION_KEYS:
+        if k in keys and "position" in keys and k != "position":
+            if all(e.get(k) == e.get("position") for e in events):
+                aliases[k] = "position"
+
+    constants = {}
+    if len(events) > 1:
+        for k in keys:
+            if k in aliases or k in POSITION_KEYS:
+                continue
+            first = events[0].get(k)
+            if all(k in e and e[k] == first for e in events):
+                constants[k] = first
+
+    columns = [k for k in keys if k not in aliases and k not in constants]
+    payload = {
+        "v": FORMAT_VERSION,
+        "k": columns,
+        "r": [[value(e, k) for k in columns] for e in events],
+    }
+    if constants:
+        payload["c"] = constants
+    if aliases:
+        payload["a"] = aliases
+
+    codec = get_compression()
+    if codec == "msgpack":
+        raw = zlib.compress(msgpack.packb(payload, use_bin_type=True))
+    elif codec == "zlib":
+        raw = zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    else:
+        return payload
+    return {"v": FORMAT_VERSION, "z": codec, "d": base64.b64encode(raw).decode("ascii")}
+
+
+def decode_events(stored) -> list | None:
+    if stored is None:
+        return None
+    if isinstance(stored, list):
+        return stored  # v1: plain list of dicts
+
+    if "z" in stored:
+        raw = zlib.decompress(base64.b64decode(stored["d"]))
+        if stored["z"] == "msgpack":
+            if msgpack is None:
+                raise RuntimeError("msgpack is required to read these events (pip install msgpack)")
+            stored = msgpack.unpackb(raw, raw=False)
+        else:
+            stored = json.loads(raw)
+
+    columns = stored["k"]
+    constants = stored.get("c", {})
+    aliases = stored.get("a", {})
+    events = []
+    for row in stored["r"]:
+        e = {}
+        for k, v in zip(columns, row):
+            e[k] = _unpack_position(v) if k in POSITION_KEYS else v
+        for k, v in constants.items():
+            e[k] = v
+        for k, source in aliases.items():
+            e[k] = e.get(source)
+        events.append(e)
+    return events
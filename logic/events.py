@@ -0,0 +1,255 @@
+"""
+Data change events for Server-Sent Events clients (/events/stream).
+
+Ingestion may run in another process (logic/ingest_worker.py), so events go through
+the event_log table. process_ocap writes them with record_event() in its own transaction,
+admin edits commit through commit_change(), and every API process runs relay_events().
+The relay polls the table for new rows and hands them to its Broadcaster. Event ids are
+the row ids, so they keep increasing across processes and restarts.
+
+On PostgreSQL, ids come from a sequence and can commit out of order: id 8 may become
+visible after id 9. So the relay re-reads the last RELAY_WINDOW ids on every poll. It
+delivers new rows in id order and holds back rows behind a missing id for up to
+GAP_WAIT_SECONDS, the time that id may still need to commit. A row that commits later
+than that still invalidates the caches. It is not sent to SSE clients, because they are
+already past its id.
+
+The same window gives the data version behind the HTTP validators (api/conditional.py):
+the newest id plus the number of rows in the window. The count catches a late commit
+below the newest id. Every process computes the same version from the same table.
+
+When the relay sees rows written by another process, that process has changed the data,
+so the relay also bumps the local data generation. The API caches then follow a separate
+worker, or an admin edit made through another uvicorn worker, even without
+VOSTOKSTAT_CACHE_DIR.
+
+The Broadcaster keeps recent events in a small ring buffer. All clients wait on one
+shared asyncio.Event that is set and replaced on every delivery. A delivery costs the
+same no matter how many clients are connected, and an idle client is just a parked
+coroutine. A client that reconnects with Last-Event-ID is replayed what it missed.
+
+Events:
+- mission_ingested: the mission summary, same shape as the items of /missions/
+- rollups_refreshed: the mission id and the leaderboard scopes that were recounted
+- data_changed: an admin edit, with the kind of data ("missions", "players", "squads",
+  "rotations", ...) and the id or name it touched
+- baseline: written by init_db into an empty table, so the data version has a real id
+  and time from the start; only relayed to the caches, not to SSE clients
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+
+from sqlalchemy import delete, func, select
+
+from database import BASELINE_EVENT, EventLogEntry, ReadSessionLocal
+from logic.cache import bump_generation, note_data_version
+from logic.lease import process_id
+
+EVENT_HISTORY = 100
+EVENT_LOG_KEEP = 1000
+EVENT_POLL_SECONDS = float(os.getenv("VOSTOKSTAT_EVENT_POLL", "2"))
+RELAY_WINDOW = 200
+GAP_WAIT_SECONDS = 10
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 5000
+
+ORIGIN = process_id()
+
+
+def mission_summary(m) -> dict:
+    """A Mission row as an item of /missions/ (MissionSummary)"""
+    return {
+        "id": m.id,
+        "file": m.file_name,
+        "file_date": m.file_date,
+        "game_type": m.game_type,
+        "duration_frames": m.duration_frames,
+        "duration_time": m.duration_time,
+        "missionName": m.mission_name,
+        "worldName": m.world_name,
+        "win_side": m.win_side,
+        "map": m.map_name,
+        "players_count": {
+            "total": m.total_players,
+            "WEST": m.west_count,
+            "EAST": m.east_count,
+            "GUER": m.guer_count
+        }
+    }
+
+
+def format_event(seq: int, kind: str, payload: str) -> str:
+    return f"id: {seq}\nevent: {kind}\ndata: {payload}\n\n"
+
+
+def record_event(session, kind: str, data: dict):
+    """Queue an event in the caller's transaction; relayed to SSE clients once committed"""
+    session.add(EventLogEntry(
+        kind=kind, payload=json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str),
+        origin=ORIGIN, created_at=time.time()
+    ))
+    # Relays only look at recent rows, keep the table small
+    newest = session.scalar(select(func.max(EventLogEntry.id)))
+    if newest and newest > EVENT_LOG_KEEP:
+        session.execute(delete(EventLogEntry).where(EventLogEntry.id <= newest - EVENT_LOG_KEEP))
+
+
+def window_version(window) -> tuple:
+    """(data version, modified time) of the rows of a relay window, ordered by id"""
+    if not window:
+        return (0, 0), 0.0
+    newest = window[-1].id
+    recent = [row for row in window if row.id > newest - RELAY_WINDOW]
+    return (newest, len(recent)), max(row.created_at or 0.0 for row in recent)
+
+
+def refresh_data_version(session):
+    """After committing a change in this process: take its version now, not on the next relay poll"""
+    newest = select(func.max(EventLogEntry.id)).scalar_subquery()
+    try:
+        window = session.execute(
+            select(EventLogEntry.id, EventLogEntry.created_at)
+            .where(EventLogEntry.id > newest - RELAY_WINDOW).order_by(EventLogEntry.id)
+        ).all()
+    except Exception as e:
+        print(f"Data version not refreshed (the relay catches up): {e}")
+        return
+    note_data_version(*window_version(window))
+
+
+async def commit_change(db, scope: str, **details):
+    """
+    Commit an admin edit of stats data (AsyncSession) together with a data_changed event.
+    Other processes only learn about changes through event_log, so without the event
+    their caches would keep serving the old data.
+    """
+    await db.run_sync(lambda session: record_event(session, "data_changed", {"scope": scope, **details}))
+    await db.commit()
+    # Generation first: until the version moves, a request may pair the old tag with new
+    # data (revalidated later), never the new tag with old cached data
+    bump_generation()
+    await db.run_sync(refresh_data_version)
+
+
+class Broadcaster:
+    def __init__(self, history: int = EVENT_HISTORY):
+        self.buffer = deque(maxlen=history)  # (seq, kind, json payload)
+        self.seq = 0
+        self.wakeup = asyncio.Event()
+        self.clients = 0
+        self.published = 0
+
+    def deliver(self, seq: int, kind: str, payload: str):
+        """Hand an event to every connected client (event loop only)"""
+        self.seq = seq
+        self.published += 1
+        self.buffer.append((seq, kind, payload))
+        wakeup, self.wakeup = self.wakeup, asyncio.Event()
+        wakeup.set()
+
+    async def listen(self, last_id: int | None = None):
+        """SSE chunks for one client, forever (cancelled when the client disconnects)"""
+        self.clients += 1
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            if last_id is None or last_id > self.seq:
+                last = self.seq
+            else:
+                last = last_id
+                if self.buffer and last < self.buffer[0][0] - 1:
+                    # Missed more than the buffer holds: the client should refetch everything
+                    yield format_event(self.seq, "resync", "{}")
+                    last = self.seq
+
+            while True:
+                # Snapshot and wakeup are taken together (no await in between), so an event
+                # published while we are sending is either in the snapshot or sets `wakeup`
+                pending = [e for e in self.buffer if e[0] > last]
+                wakeup = self.wakeup
+                for seq, kind, payload in pending:
+                    yield format_event(seq, kind, payload)
+                    last = seq
+                try:
+                    await asyncio.wait_for(wakeup.wait(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"  # Keeps proxies from closing idle streams
+        finally:
+            self.clients -= 1
+
+    def stats(self) -> dict:
+        return {"clients": self.clients, "published": self.published, "last_id": self.seq}
+
+
+broadcaster = Broadcaster()
+
+
+def window_query(seq: int):
+    return (
+        select(EventLogEntry.id, EventLogEntry.origin, EventLogEntry.created_at)
+        .where(EventLogEntry.id > seq - RELAY_WINDOW)
+        .order_by(EventLogEntry.id)
+    )
+
+
+def deliverable(rows, seq: int, now: float) -> list:
+    """Ids after seq that can go out in order: up to the first missing id that may still commit"""
+    ids = []
+    expected = seq + 1
+    for row in rows:
+        if row.id <= seq:
+            continue
+        if row.id != expected and now - (row.created_at or 0) < GAP_WAIT_SECONDS:
+            break
+        ids.append(row.id)
+        expected = row.id + 1
+    return ids
+
+
+async def relay_events():
+    """API process: deliver new event_log rows to this process's SSE clients, forever"""
+    seen = None  # Ids of the trailing window the caches already follow; None until the first read
+    delay = 0  # First read right away
+    while True:
+        await asyncio.sleep(delay)
+        delay = EVENT_POLL_SECONDS
+        try:
+            async with ReadSessionLocal() as db:
+                if seen is None:
+                    # Start at the newest row: what happened before this process started is not replayed
+                    window = (await db.execute(window_query(await db.scalar(select(func.max(EventLogEntry.id))) or 0))).all()
+                    broadcaster.seq = window[-1].id if window else 0
+                    note_data_version(*window_version(window))
+                    seen = {row.id for row in window}
+                    continue
+                window = (await db.execute(window_query(broadcaster.seq))).all()
+                new = [row for row in window if row.id not in seen]
+                ids = deliverable(window, broadcaster.seq, time.time())
+                if not new and not ids:
+                    continue
+                payloads = []
+                if ids:
+                    res = await db.execute(
+                        select(EventLogEntry.id, EventLogEntry.kind, EventLogEntry.payload)
+                        .where(EventLogEntry.id.in_(ids)).order_by(EventLogEntry.id)
+                    )
+                    payloads = res.all()
+
+            if any(row.origin != ORIGIN for row in new):
+                bump_generation()  # Another process (ingestion worker, admin edit) changed the data
+            note_data_version(*window_version(window))
+            late = [row.id for row in new if row.id <= broadcaster.seq]
+            if late:
+                print(f"Event relay: ids {late} committed late, caches refreshed, not sent to SSE clients")
+            seen.update(row.id for row in new)
+            for seq, kind, payload in payloads:
+                if kind == BASELINE_EVENT:
+                    broadcaster.seq = seq  # Skipped, later ids still count as in order
+                    continue
+                broadcaster.deliver(seq, kind, payload)
+            floor = broadcaster.seq - RELAY_WINDOW
+            seen = {i for i in seen if i > floor}
+        except Exception as e:
+            print(f"Event relay error: {e}")
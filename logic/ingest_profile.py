@@ -0,0 +1,118 @@
+"""
+Opt-in per-mission ingest profiling.
+
+Enabled by VOSTOKSTAT_INGEST_PROFILE or the INGEST_PROFILING config key (the env var
+wins):
+- "1": cProfile plus tracemalloc for peak memory. tracemalloc slows ingest down a lot,
+  so the timings are only comparable between profiled runs.
+- "cpu": cProfile only, without the much larger tracemalloc slowdown.
+- "0" (default): off, process_ocap pays one config lookup per mission.
+
+Every profiled mission gets an IngestProfile row with:
+- the stage timings of process_ocap (decode, model_build, aggregate, write), with
+  model_build split by OCAP.from_file into json, validation, position_index, ai_names
+  and vehicle_search
+- entity, event and frame counts
+- the top functions by own time
+The admin endpoints /admin/ingest-profiles show the rows. Only the latest PROFILE_KEEP
+are kept.
+
+While profiling, OCAP.from_file validates players, vehicles and events one after the
+other instead of in three threads, because cProfile only sees the calling thread.
+"""
+import cProfile
+import os
+import pstats
+import time
+import tracemalloc
+
+from sqlalchemy import delete, func, select
+
+from database import IngestProfile, SyncSessionLocal, get_app_config_sync
+from logic.metrics import StageClock
+
+PROFILE_KEY = "INGEST_PROFILING"
+PROFILE_KEEP = 200
+TOP_FUNCTIONS = 25
+
+
+def profiling_mode() -> str | None:
+    value = os.getenv("VOSTOKSTAT_INGEST_PROFILE") or get_app_config_sync(PROFILE_KEY, "0")
+    value = value.strip().lower()
+    if value in ("", "0", "false", "no", "off"):
+        return None
+    return "cpu" if value == "cpu" else "full"
+
+
+def top_functions(profile: cProfile.Profile, limit: int = TOP_FUNCTIONS) -> list:
+    stats = pstats.Stats(profile)
+    rows = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({name})" if line else name,
+            "calls": calls, "tottime": round(tottime, 4), "cumtime": round(cumtime, 4),
+        })
+    rows.sort(key=lambda row: row["tottime"], reverse=True)
+    return rows[:limit]
+
+
+class MissionProfiler:
+    """Profiles one process_ocap run. start() returns None when profiling is off."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.clock = StageClock()  # Sub-stages of OCAP.from_file
+        self.profile = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.active = True
+        self.own_tracemalloc = mode == "full" and not tracemalloc.is_tracing()
+        if self.own_tracemalloc:
+            tracemalloc.start()
+        self.profile.enable()
+
+    @classmethod
+    def start(cls):
+        mode = profiling_mode()
+        if not mode:
+            return None
+        try:
+            return cls(mode)
+        except ValueError as e:  # Another profiler is already running in this thread
+            print(f"Ingest profiling skipped: {e}")
+            return None
+
+    def stop(self):
+        if not self.active:
+            return None
+        self.active = False
+        self.profile.disable()
+        peak = None
+        if self.own_tracemalloc:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        return peak
+
+    def finish(self, ocap_file, result: str, stages: dict, counts: dict, mission_id: int = None):
+        """Stop and store the record. Never raises: profiling must not fail an ingest."""
+        total = time.perf_counter() - self.started
+        peak = self.stop()
+        stages = {name: round(seconds, 4) for name, seconds in stages.items()}
+        stages.update({f"model_build/{name}": round(seconds, 4) for name, seconds in self.clock.stages.items()})
+        try:
+            record = IngestProfile(
+                mission_id=mission_id, file_name=ocap_file.name, result=result, created_at=time.time(),
+                total_seconds=round(total, 4), peak_memory=peak, file_bytes=ocap_file.stat().st_size,
+                stages=stages, counts=counts, top_functions=top_functions(self.profile),
+            )
+            with SyncSessionLocal() as session:
+                session.add(record)
+                newest = session.scalar(select(func.max(IngestProfile.id)))
+                if newest and newest >= PROFILE_KEEP:
+                    session.execute(delete(IngestProfile).where(IngestProfile.id <= newest - PROFILE_KEEP))
+                session.commit()
+        except Exception as e:
+            print(f"Could not store the ingest profile of {ocap_file.name}: {e}")
+            return
+        slowest = max(stages, key=stages.get) if stages else "-"
+        memory = f", peak {peak / 2**20:.0f} MB" if peak else ""
+        print(f"Profile: {ocap_file.name} {total:.2f}s (slowest stage {slowest}){memory}")
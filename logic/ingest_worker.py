@@ -0,0 +1,107 @@
+"""
+Mission ingestion worker.
+
+Exactly one process ingests at a time: whoever holds the "ingest" lease (logic/lease.py).
+That is either the standalone worker (`python main.py`) or, unless
+VOSTOKSTAT_EMBEDDED_INGEST=0, one of the API processes. Any number of uvicorn workers
+can run; the ones without the lease only stand by and take over when it expires.
+
+A full "init" sync runs only while the DB is empty or has never been completely synced
+(no watermark, see logic/download_mission.py). Otherwise every round, the first one after
+a restart included, is an "update" that catches up from the watermark. Rounds run every
+UPDATE_INTERVAL seconds. API processes never download themselves. They ask for work with
+request_ingest() (e.g. a full reload after delete all), and the holder picks the
+request up on its next round. A request is marked done only once its round went through
+the whole listing, so a failed round is retried.
+"""
+import os
+import time
+
+from sqlalchemy import select, update
+
+from database import IngestRequest, SyncSessionLocal
+from logic.lease import Lease
+
+INGEST_LEASE = "ingest"
+UPDATE_INTERVAL = int(os.getenv("VOSTOKSTAT_UPDATE_INTERVAL", "20"))
+EMBEDDED_INGEST = os.getenv("VOSTOKSTAT_EMBEDDED_INGEST", "1").lower() in ("1", "true", "yes")
+
+
+def request_ingest(session, mode: str = "init"):
+    """Ask the ingestion worker for a run (sync Session; from async code use run_sync)"""
+    session.add(IngestRequest(mode=mode, requested_at=time.time()))
+
+
+def pending_requests() -> tuple[str | None, list]:
+    """Mode asked for by the pending requests ("init" wins over "update") and their ids"""
+    with SyncSessionLocal() as session:
+        pending = session.execute(
+            select(IngestRequest.id, IngestRequest.mode).where(IngestRequest.done_at.is_(None))
+        ).all()
+    if not pending:
+        return None, []
+    mode = "init" if any(req.mode == "init" for req in pending) else "update"
+    return mode, [req.id for req in pending]
+
+
+def finish_requests(ids: list):
+    """Mark requests done once their round went through; a failed round leaves them pending"""
+    if not ids:
+        return
+    with SyncSessionLocal() as session:
+        session.execute(update(IngestRequest).where(IngestRequest.id.in_(ids)).values(done_at=time.time()))
+        session.commit()
+
+
+class IngestWorker:
+    def __init__(self):
+        self.lease = Lease(INGEST_LEASE)
+        self.busy = False
+        self.standing_by = False
+
+    def step(self) -> bool:
+        """One round of ingestion. False when another process holds the lease."""
+        if not self.lease.try_acquire():
+            if not self.standing_by:
+                print(f"Ingestion lease held by {self.lease.holder()}, standing by.")
+                self.standing_by = True
+            return False
+        self.standing_by = False
+
+        # Imported here: requests and the OCAP models are not needed until the first round,
+        # and API processes without the lease never load them
+        from logic.download_mission import full_sync_needed, main as download_main
+
+        # Until an init has gone through the whole listing (e.g. it failed or the previous
+        # holder died mid-way), every round is an init
+        requested, request_ids = pending_requests()
+        mode = requested or ("init" if full_sync_needed() else "update")
+        self.busy = True
+        self.lease.keep_alive()
+        try:
+            print(f"=== Ingestion round (mode={mode}) ===")
+            if download_main(mode=mode, lease=self.lease):
+                finish_requests(request_ids)
+        finally:
+            self.lease.stop_keep_alive()
+            self.busy = False
+        return True
+
+    def release(self):
+        # A round still running in a thread keeps the lease until it expires on its own
+        if self.lease.held and not self.busy:
+            self.lease.release()
+
+
+def run_worker():
+    """Standalone entry point: ingest forever (or stand by while another process ingests)"""
+    worker = IngestWorker()
+    try:
+        while True:
+            try:
+                worker.step()
+            except Exception as e:
+                print(f"Ошибка: {e}")
+            time.sleep(UPDATE_INTERVAL)
+    finally:
+        worker.release()
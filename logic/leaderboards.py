@@ -0,0 +1,231 @@
+"""
+Precomputed player leaderboards.
+
+Every player's totals are kept per scope in the leaderboard table (LeaderboardEntry):
+scope 0 is all time, any other scope is a rotation id and counts only the rotation's
+date range and whitelisted squads (same filters as /players/top/). Each row also holds
+its position in every ranking of METRICS, so a page of a leaderboard or one player's
+rank is an index lookup instead of an aggregation over player_stats. Ranks are
+competition ranks: equal values share a rank and the next one skips (1, 2, 2, 4);
+within a rank rows are listed by name, which pages use as the second cursor key.
+
+Qualification thresholds come from AppConfig:
+- LEADERBOARD_MIN_MISSIONS: missions needed to be ranked at all (default 3)
+- LEADERBOARD_KD_MIN_DEATHS: deaths needed to be ranked by KD (default 0)
+
+Maintenance:
+- process_ocap calls record_mission(): only the mission's players are recounted, only
+  in the scopes the mission falls into, then those scopes are re-ranked
+- admin edits call refresh_players() for the players they touched
+- rotation / squad / threshold changes call rebuild_scope() / rebuild_rotations() / rerank_all()
+- rebuild_all() fills the table from scratch (first start)
+"""
+from sqlalchemy import and_, delete, func, select
+
+from database import AppConfig, casefold, LeaderboardEntry, Mission, PlayerStat, SyncSessionLocal, writer_lock
+from logic.rotations import load_contexts_sync
+
+ALL_TIME = 0
+MIN_DURATION = 100  # Same cut as the stats pages
+
+# metric -> (value column, rank column)
+METRICS = {
+    "kd": (LeaderboardEntry.kd, LeaderboardEntry.rank_kd),
+    "frags": (LeaderboardEntry.frags, LeaderboardEntry.rank_frags),
+    "frags_veh": (LeaderboardEntry.frags_veh, LeaderboardEntry.rank_frags_veh),
+    "destroyed_vehicles": (LeaderboardEntry.destroyed_vehicles, LeaderboardEntry.rank_destroyed_vehicles),
+    "missions": (LeaderboardEntry.missions, LeaderboardEntry.rank_missions),
+    "distance": (LeaderboardEntry.distance, LeaderboardEntry.rank_distance),
+}
+
+THRESHOLD_DEFAULTS = {
+    "LEADERBOARD_MIN_MISSIONS": 3,
+    "LEADERBOARD_KD_MIN_DEATHS": 0,
+}
+
+
+def load_thresholds(session) -> dict:
+    thresholds = dict(THRESHOLD_DEFAULTS)
+    rows = session.execute(select(AppConfig).where(AppConfig.key.in_(THRESHOLD_DEFAULTS))).scalars().all()
+    for row in rows:
+        try:
+            thresholds[row.key] = int(row.value)
+        except (TypeError, ValueError):
+            print(f"Leaderboard: bad {row.key} value {row.value!r}, using {thresholds[row.key]}")
+    return thresholds
+
+
+def rank_key(metric: str, entry):
+    """Sort key of a ranking: best value first, ties listed by name"""
+    return (-getattr(entry, metric), entry.name)
+
+
+def competition_ranks(ranked: list, metric: str) -> dict:
+    """entry id -> rank over entries sorted by rank_key; equal values share the rank"""
+    ranks = {}
+    previous = rank = None
+    for pos, e in enumerate(ranked, 1):
+        value = getattr(e, metric)
+        if value != previous:
+            rank, previous = pos, value
+        ranks[e.id] = rank
+    return ranks
+
+
+def qualifies(metric: str, entry, thresholds: dict) -> bool:
+    if entry.missions < thresholds["LEADERBOARD_MIN_MISSIONS"]:
+        return False
+    if metric == "kd" and entry.deaths < thresholds["LEADERBOARD_KD_MIN_DEATHS"]:
+        return False
+    return True
+
+
+def covers(rot, file_date: str) -> bool:
+    """Whether a mission of file_date counts for the rotation (same bounds as the routers)"""
+    if not (rot.start_date and rot.end_date):
+        return True
+    return rot.start_date <= file_date <= rot.end_date + " 23:59:59"
+
+
+def totals_stmt(rot=None, names=None):
+    """Per-player totals for a scope (rot=None: all time), optionally for some names only"""
+    stmt = (
+        select(
+            PlayerStat.name,
+            func.count(PlayerStat.mission_id),
+            func.sum(PlayerStat.frags),
+            func.sum(PlayerStat.frags_veh),
+            func.sum(PlayerStat.frags_inf),
+            func.sum(PlayerStat.death),
+            func.sum(PlayerStat.destroyed_veh),
+            func.sum(PlayerStat.distance),
+        )
+        .join(Mission, PlayerStat.mission_id == Mission.id)
+        .where(Mission.duration_time >= MIN_DURATION)
+        .group_by(PlayerStat.name)
+    )
+    if rot is not None:
+        if rot.start_date and rot.end_date:
+            stmt = stmt.where(and_(Mission.file_date >= rot.start_date, Mission.file_date <= rot.end_date + " 23:59:59"))
+        if rot.whitelist_names:
+            stmt = stmt.where(casefold(PlayerStat.squad).in_(rot.whitelist_tags))
+    if names is not None:
+        stmt = stmt.where(PlayerStat.name.in_(names))
+    return stmt
+
+
+def _store_totals(session, scope: int, rows):
+    for name, missions, frags, frags_veh, frags_inf, deaths, destroyed, distance in rows:
+        if not name:
+            continue
+        frags, deaths = frags or 0, deaths or 0
+        session.add(LeaderboardEntry(
+            scope=scope, name=name, player_key=name.lower(),
+            missions=missions, frags=frags, frags_veh=frags_veh or 0, frags_inf=frags_inf or 0,
+            deaths=deaths, destroyed_vehicles=destroyed or 0, distance=round(distance or 0.0, 1),
+            kd=round(frags / deaths, 2) if deaths > 0 else float(frags),
+        ))
+
+
+def recount(session, scope: int, rot, names=None):
+    """Replace the totals of a scope (or of some names in it) from player_stats"""
+    stmt = delete(LeaderboardEntry).where(LeaderboardEntry.scope == scope)
+    if names is not None:
+        names = {n for n in names if n}
+        if not names:
+            return
+        stmt = stmt.where(LeaderboardEntry.name.in_(names))
+    session.execute(stmt)
+    _store_totals(session, scope, session.execute(totals_stmt(rot, names)).all())
+
+
+def rerank(session, scope: int, thresholds: dict = None):
+    """Recompute every ranking of a scope; only rows whose rank moved are written"""
+    thresholds = thresholds or load_thresholds(session)
+    session.flush()
+    entries = session.execute(select(LeaderboardEntry).where(LeaderboardEntry.scope == scope)).scalars().all()
+    for metric, (value_col, rank_col) in METRICS.items():
+        ranked = sorted((e for e in entries if qualifies(metric, e, thresholds)), key=lambda e: rank_key(metric, e))
+        ranks = competition_ranks(ranked, metric)
+        for e in entries:
+            rank = ranks.get(e.id)
+            if getattr(e, rank_col.key) != rank:
+                setattr(e, rank_col.key, rank)
+
+
+def rebuild_scope(session, scope: int, contexts: dict = None):
+    """Recount and re-rank one scope; a scope whose rotation is gone is dropped"""
+    if scope == ALL_TIME:
+        recount(session, ALL_TIME, None)
+    else:
+        contexts = contexts if contexts is not None else load_contexts_sync(session)
+        rot = contexts.get(scope)
+        if rot is None:
+            session.execute(delete(LeaderboardEntry).where(LeaderboardEntry.scope == scope))
+            return
+        recount(session, scope, rot)
+    rerank(session, scope)
+
+
+def rebuild_rotations(session):
+    """After squad tag edits: every rotation's whitelist may have changed"""
+    contexts = load_contexts_sync(session)
+    session.execute(delete(LeaderboardEntry).where(
+        LeaderboardEntry.scope != ALL_TIME, LeaderboardEntry.scope.not_in(list(contexts))
+    ))
+    for rotation_id in contexts:
+        rebuild_scope(session, rotation_id, contexts)
+
+
+def rebuild_all(session):
+    session.execute(delete(LeaderboardEntry))
+    rebuild_scope(session, ALL_TIME)
+    rebuild_rotations(session)
+
+
+def rerank_all(session):
+    """After a threshold change"""
+    thresholds = load_thresholds(session)
+    for scope in session.execute(select(LeaderboardEntry.scope).distinct()).scalars().all():
+        rerank(session, scope, thresholds)
+
+
+def refresh_players(session, names):
+    """Admin edits: recount the given player names in every scope"""
+    names = {n for n in names if n}
+    if not names:
+        return
+    thresholds = load_thresholds(session)
+    scopes = {ALL_TIME: None, **load_contexts_sync(session)}
+    for scope, rot in scopes.items():
+        recount(session, scope, rot, names)
+        rerank(session, scope, thresholds)
+
+
+def record_mission(session, file_date: str, duration_time: float, player_names) -> list:
+    """Ingest: recount a new mission's players in the scopes the mission counts for. Returns the scopes."""
+    if duration_time < MIN_DURATION:
+        return []
+    names = {n for n in player_names if n}
+    if not names:
+        return []
+    thresholds = load_thresholds(session)
+    scopes = {ALL_TIME: None}
+    scopes.update({rid: rot for rid, rot in load_contexts_sync(session).items() if covers(rot, file_date)})
+    for scope, rot in scopes.items():
+        recount(session, scope, rot, names)
+        rerank(session, scope, thresholds)
+    return list(scopes)
+
+
+def ensure_leaderboards():
+    """Startup: build the leaderboards once for databases that predate them"""
+    with writer_lock(), SyncSessionLocal() as session:
+        if session.execute(select(LeaderboardEntry.id).limit(1)).first():
+            return
+        if not session.execute(select(PlayerStat.id).limit(1)).first():
+            return
+        print("Building leaderboards...")
+        rebuild_all(session)
+        session.commit()
+        print(f"Leaderboards built: {session.scalar(select(func.count(LeaderboardEntry.id)))} rows.")
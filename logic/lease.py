@@ -0,0 +1,110 @@
+"""
+Cross-process lease stored in the leases table.
+
+A lease is a row (name, owner, expires_at). Taking or renewing it is one conditional
+UPDATE ("mine already, or expired"), so it is atomic on SQLite and PostgreSQL alike and
+works across processes and hosts sharing the database. A holder that dies simply stops
+renewing, and the lease can be taken over once it expires.
+
+Long jobs use keep_alive() to renew from a background thread. `held` turns False when
+a renewal fails, and the job should stop at the next safe point.
+"""
+import os
+import socket
+import threading
+import time
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from database import Lease as LeaseRow, SyncSessionLocal
+
+LEASE_TTL = int(os.getenv("VOSTOKSTAT_LEASE_TTL", "60"))
+
+
+def process_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Lease:
+    def __init__(self, name: str, ttl: int = LEASE_TTL, owner: str | None = None):
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner or process_id()
+        self.held = False
+        self._stop = None
+        self._thread = None
+
+    def try_acquire(self) -> bool:
+        """Take the lease if it is free or expired, or renew it if we hold it"""
+        now = time.time()
+        with SyncSessionLocal() as session:
+            res = session.execute(
+                update(LeaseRow)
+                .where(LeaseRow.name == self.name, or_(LeaseRow.owner == self.owner, LeaseRow.expires_at < now))
+                .values(owner=self.owner, expires_at=now + self.ttl)
+            )
+            if res.rowcount:
+                session.commit()
+                self.held = True
+                return True
+            if session.get(LeaseRow, self.name) is None:
+                session.add(LeaseRow(name=self.name, owner=self.owner, expires_at=now + self.ttl))
+                try:
+                    session.commit()
+                    self.held = True
+                    return True
+                except IntegrityError:
+                    session.rollback()  # Someone else created it first
+        self.held = False
+        return False
+
+    renew = try_acquire
+
+    def release(self):
+        self.stop_keep_alive()
+        with SyncSessionLocal() as session:
+            session.execute(
+                update(LeaseRow)
+                .where(LeaseRow.name == self.name, LeaseRow.owner == self.owner)
+                .values(expires_at=0)
+            )
+            session.commit()
+        self.held = False
+
+    def holder(self) -> str | None:
+        """Current owner, or None when nobody holds it"""
+        with SyncSessionLocal() as session:
+            row = session.get(LeaseRow, self.name)
+            if row is None or row.expires_at < time.time():
+                return None
+            return row.owner
+
+    def keep_alive(self):
+        """Renew every ttl/3 from a background thread until stop_keep_alive()"""
+        if self._thread is not None:
+            return
+        self._stop = threading.Event()
+
+        def renew_loop(stop):
+            renewed_at = time.time()
+            while not stop.wait(self.ttl / 3):
+                try:
+                    if not self.renew():
+                        print(f"Lease '{self.name}' lost to {self.holder()}")
+                        return
+                    renewed_at = time.time()
+                except Exception as e:
+                    print(f"Lease '{self.name}' renewal failed: {e}")
+                    if time.time() - renewed_at > self.ttl:
+                        self.held = False  # Expired meanwhile, someone else may hold it now
+                        return
+
+        self._thread = threading.Thread(target=renew_loop, args=(self._stop,), name=f"lease-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop_keep_alive(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,247 @@
+"""
+Prometheus text-format metrics, without the client library.
+
+Counters, gauges and histograms are module-level objects that the code updates in
+place: a dict update under one lock, cheap enough for per-file and per-request calls.
+Values that already live elsewhere (cache stats, route timings, pool state) are not
+copied. Collectors registered with add_collector() read them at scrape time.
+
+Everything is per process. The API serves its own metrics (plus the embedded ingestion
+ones) at GET /metrics. The standalone worker (main.py) serves its metrics when
+VOSTOKSTAT_METRICS_PORT is set.
+"""
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy import event
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_lock = threading.Lock()
+REGISTRY = []
+COLLECTORS = []
+
+
+def format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + "}"
+
+
+def family(name: str, kind: str, help_text: str, samples) -> list:
+    """Text lines of one metric family; samples are (labels dict, value) or (suffix, labels, value)"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for sample in samples:
+        suffix, labels, value = sample if len(sample) == 3 else ("", *sample)
+        lines.append(f"{name}{suffix}{format_labels(labels)} {format_value(value)}")
+    return lines
+
+
+def histogram_samples(labels: dict, bounds, counts, total: float, count: int) -> list:
+    """Samples of one histogram series; counts are per bucket (not cumulative), the last one is +Inf"""
+    samples = []
+    cumulative = 0
+    for bound, n in zip(list(bounds) + [float("inf")], counts):
+        cumulative += n
+        samples.append(("_bucket", {**labels, "le": format_value(float(bound))}, cumulative))
+    samples.append(("_sum", labels, round(total, 6)))
+    samples.append(("_count", labels, count))
+    return samples
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}  # label values -> value
+        REGISTRY.append(self)
+
+    def key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> list:
+        return [(dict(zip(self.labels, key)), value) for key, value in self.values.items()]
+
+    def render(self) -> list:
+        with _lock:
+            samples = self.samples()
+        return family(self.name, self.kind, self.help, samples)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with _lock:
+            self.values[self.key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=(0.1, 0.5, 1, 5, 10, 60)):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with _lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> list:
+        samples = []
+        for key, (counts, total, count) in self.values.items():
+            samples.extend(histogram_samples(dict(zip(self.labels, key)), self.buckets, counts, total, count))
+        return samples
+
+
+def add_collector(collector):
+    """collector() -> list of text lines (see family()), called on every scrape"""
+    COLLECTORS.append(collector)
+    return collector
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for collector in COLLECTORS:
+        try:
+            lines.extend(collector())
+        except Exception as e:
+            lines.append(f"# collector {getattr(collector, '__name__', collector)} failed: {e}")
+    return "\n".join(lines) + "\n"
+
+
+class StageClock:
+    """Lap timer for a multi-stage job: each lap() ends a stage and observes its duration"""
+
+    def __init__(self, histogram: Histogram = None):
+        self.histogram = histogram
+        self.stages = {}  # stage -> seconds
+        self.last = time.perf_counter()
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        elapsed = now - self.last
+        self.last = now
+        self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+        if self.histogram is not None:
+            self.histogram.observe(elapsed, stage=stage)
+        return elapsed
+
+    def skip(self):
+        """Start the next stage now, without counting the time since the last lap"""
+        self.last = time.perf_counter()
+
+
+# --- Ingestion ---
+
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+MISSIONS_INGESTED = Counter(
+    "vostokstat_missions_ingested_total", "OCAP files handled by ingestion, by result (added, skipped, failed)",
+    ["result"],
+)
+INGEST_STAGE_SECONDS = Histogram(
+    "vostokstat_ingest_stage_seconds", "Time per ingestion stage of one mission (download, decode, model_build, aggregate, write)",
+    ["stage"], buckets=STAGE_BUCKETS,
+)
+OCAP_BYTES = Counter("vostokstat_ocap_bytes_total", "Bytes of OCAP JSON decoded by ingestion")
+INGEST_ROUNDS = Counter("vostokstat_ingest_rounds_total", "Ingestion rounds, by mode and result", ["mode", "result"])
+INGEST_FILES_PENDING = Gauge("vostokstat_ingest_files_pending", "Files of the running ingestion round not processed yet")
+INGEST_LAST_SUCCESS = Gauge(
+    "vostokstat_ingest_last_success_timestamp_seconds", "Unix time of the last ingestion round that went through the whole listing"
+)
+
+# --- Backups ---
+
+BACKUP_SECONDS = Histogram(
+    "vostokstat_backup_duration_seconds", "Backup task duration (zip and upload), by result",
+    ["result"], buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+
+# --- Database pools ---
+
+DB_POOL_CHECKOUTS = Counter("vostokstat_db_pool_checkouts_total", "Connections checked out of a pool", ["engine"])
+_pools = {}  # engine label -> pool
+
+
+def watch_pool(sync_engine, label: str):
+    """Count checkouts of an engine's pool (for async engines pass engine.sync_engine)"""
+    _pools[label] = sync_engine.pool
+
+    @event.listens_for(sync_engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.inc(engine=label)
+
+
+@add_collector
+def pool_collector() -> list:
+    # SingletonThreadPool / NullPool (some SQLite setups) have no checkedout()
+    samples = [
+        ({"engine": label}, pool.checkedout())
+        for label, pool in _pools.items() if hasattr(pool, "checkedout")
+    ]
+    return family("vostokstat_db_pool_checked_out", "gauge", "Connections currently checked out", samples)
+
+
+# --- Standalone worker ---
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the worker log
+
+
+def start_metrics_server(port: int = None):
+    """Serve /metrics from a daemon thread (VOSTOKSTAT_METRICS_PORT); no-op without a port"""
+    port = port or int(os.getenv("VOSTOKSTAT_METRICS_PORT", "0"))
+    if not port:
+        return None
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"Metrics on http://0.0.0.0:{port}/metrics")
+    return server
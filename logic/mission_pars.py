@@ -5,21 +5,36 @@ from pathlib import Path
 import os
 from datetime import datetime
 
-from module.ocap_models import OCAP, Vehicle
 from logic.name_logic import extract_name_and_squad
 from module.ConvertPos import ocap_coords
 from functools import lru_cache
+from typing import TYPE_CHECKING
 
 # Database imports
-from database import SyncSessionLocal, Mission, PlayerStat, MissionSquadStat, GlobalSquad, get_app_config_sync
-from sqlalchemy import select
+from database import SyncSessionLocal, WRITE_LOCK, Mission, PlayerStat, MissionSquadStat, AppConfig, get_app_config_sync, set_app_config_sync
+from logic.event_codec import FORMAT_VERSION
+from logic.cache import bump_generation
+from logic.events import mission_summary, record_event, refresh_data_version
+from logic.squad_registry import squad_registry
+from logic.search_index import index_mission
+from logic.squad_history import record_mission
+from logic import leaderboards
+from logic.autocomplete import AUTOCOMPLETE_ENABLED, autocomplete
+from logic.metrics import INGEST_STAGE_SECONDS, MISSIONS_INGESTED, OCAP_BYTES, StageClock
+from logic.ingest_profile import MissionProfiler
+from sqlalchemy import select, update
+from sqlalchemy.orm import undefer_group
+from sqlalchemy.orm.attributes import flag_modified
+
+if TYPE_CHECKING:
+    from module.ocap_models import OCAP
 
 @lru_cache(maxsize=200000)
 def cached_ocap_coords(x, y, map_name):
     return ocap_coords(x, y, map_name)
 
 
-def get_player_position_ocap(ocap: OCAP, player_id: int, frame: int, map_name: str) -> dict | None:
+def get_player_position_ocap(ocap: "OCAP", player_id: int, frame: int, map_name: str) -> dict | None:
     player = ocap.players.get(player_id)
     if not player or frame >= len(player.positions):
         return None
@@ -54,7 +69,13 @@ def get_player_distance(player, map_name: str, step: int = 10, tolerance: float
 
 
 def process_ocap(ocap_file: Path):
+    # The OCAP models are only needed by ingestion, not by API processes importing this module
+    from module.ocap_models import OCAP, Vehicle
+
     session = SyncSessionLocal()
+    locked = False
+    profiler = MissionProfiler.start()  # None unless INGEST_PROFILING is on
+    clock = StageClock(INGEST_STAGE_SECONDS)
     try:
         stem = ocap_file.stem
         if "__" in stem:
@@ -64,6 +85,8 @@ def process_ocap(ocap_file: Path):
 
         with ocap_file.open("r", encoding="utf-8") as f:
             raw_data = json.load(f)
+        OCAP_BYTES.inc(ocap_file.stat().st_size)
+        clock.lap("decode")
         mission_name = raw_data.get("missionName", "Unknown Mission")
 
         print(f"Checking existing: {mission_name} / {file_date}")
@@ -74,20 +97,20 @@ def process_ocap(ocap_file: Path):
 
         if existing_mission:
             print(f"Миссия '{mission_name}' от {file_date} уже есть в БД, пропускаю.")
+            MISSIONS_INGESTED.inc(result="skipped")
             return
 
-        ocap = OCAP.from_file(ocap_file)
+        if profiler:
+            profiler.clock.skip()
+            ocap = OCAP.from_file(ocap_file, clock=profiler.clock, threaded=False)
+        else:
+            ocap = OCAP.from_file(ocap_file)
+        clock.lap("model_build")
         world_name = raw_data.get("worldName", "Unknown World")
         map_name = world_name
         
-        # --- SQUAD MAPPING INITIALIZATION ---
-        global_squads = session.query(GlobalSquad).all()
-        squad_map = {}
-        for gs in global_squads:
-            squad_map[gs.name.lower()] = gs.name
-            if gs.tags:
-                for tag in gs.tags:
-                    squad_map[tag.lower()] = gs.name
+        # --- SQUAD MAPPING (shared registry) ---
+        squad_map = squad_registry.get_sync(session).tag_to_canonical
 
         players_stats: dict[int, dict] = {}
         unique_players: dict[str, dict] = {} # Map Name -> Stats Object
@@ -98,7 +121,7 @@ def process_ocap(ocap_file: Path):
             # Normalize and Map Squad
             squad_tag = squad.upper() if squad else None
             if squad_tag:
-                lower_tag = squad_tag.lower()
+                lower_tag = squad_tag.strip().lower()
                 if lower_tag in squad_map:
                     squad_tag = squad_map[lower_tag]
 
@@ -127,6 +150,7 @@ def process_ocap(ocap_file: Path):
                     "death": 0,
                     "victims_players": [],
                     "destroyed_vehicles": [],
+                    "death_events": [],
                     "destroyed_veh": 0,
                     "distance": distance
                 }
@@ -173,7 +197,7 @@ def process_ocap(ocap_file: Path):
                     kill_type = "kill"
                     killer_stats["frags_inf"] += 1
 
-                killer_stats["victims_players"].append({
+                kill_event = {
                     "name": getattr(killed, "name", "unknown"),
                     "weapon": weapon_name,
                     "distance": distance_kill,
@@ -184,7 +208,12 @@ def process_ocap(ocap_file: Path):
                     "position": get_player_position_ocap(ocap, killed.id, frame, map_name),
                     "killer_position": get_player_position_ocap(ocap, killer.id, frame, map_name),
                     "OcapPos": get_player_position_ocap(ocap, killed.id, frame, map_name)
-                })
+                }
+                killer_stats["victims_players"].append(kill_event)
+
+                # Store the same event on the victim, so mission views don't have to reverse-map kills
+                if hasattr(killed, "id") and killed.id in players_stats:
+                    players_stats[killed.id]["death_events"].append(kill_event)
 
             if not is_killed_vehicle and hasattr(killed, "id") and killed.id in players_stats:
                 players_stats[killed.id]["death"] += 1
@@ -222,8 +251,7 @@ def process_ocap(ocap_file: Path):
             s["death"] += player["death"]
             s["tk"] += player["tk"]
 
-            for v in player["victims_players"]:
-                s["victims_players"].append(v)
+            # Kills are not copied into the squad row anymore, they live on the members' PlayerStat rows
 
             s["squad_players"].append({
                 "name": player["name"],
@@ -233,7 +261,14 @@ def process_ocap(ocap_file: Path):
                 "distance": player["distance"]
             })
 
+        clock.lap("aggregate")
+
         # --- DB INSERTION ---
+        # One writer at a time (database.WRITE_LOCK); the reads above are finished first so
+        # the lock only covers the inserts
+        session.commit()
+        WRITE_LOCK.acquire()
+        locked = True
         win_side = None
         for event in raw_data.get("events", []):
             if isinstance(event, list) and len(event) >= 2 and event[1] == "endMission":
@@ -256,7 +291,8 @@ def process_ocap(ocap_file: Path):
                 mission_id=new_mission.id, player_uid=p["id"], name=p["name"], side=str(p["side"]),
                 squad=p["squad"], frags=p["frags"], frags_veh=p["frags_veh"], frags_inf=p["frags_inf"],
                 death=p["death"], tk=p["tk"], destroyed_veh=p["destroyed_veh"], distance=p["distance"],
-                victims_players=p["victims_players"], destroyed_vehicles=p["destroyed_vehicles"]
+                victims_players=p["victims_players"], destroyed_vehicles=p["destroyed_vehicles"],
+                death_events=p["death_events"]
             )
             session.add(ps)
 
@@ -269,7 +305,30 @@ def process_ocap(ocap_file: Path):
             )
             session.add(mss)
 
+        player_names = [p["name"] for p in unique_players.values()]
+        index_mission(session, mission_name, player_names)
+        record_mission(session, file_date, new_mission.duration_time,
+                       [(p["name"], p["squad"]) for p in unique_players.values()])
+        leaderboard_scopes = leaderboards.record_mission(session, file_date, new_mission.duration_time, player_names)
+        record_event(session, "mission_ingested", mission_summary(new_mission))
+        record_event(session, "rollups_refreshed", {"mission_id": new_mission.id, "leaderboard_scopes": leaderboard_scopes})
+
+        autocomplete_fresh = autocomplete.is_fresh()
         session.commit()
+        WRITE_LOCK.release()
+        locked = False
+        clock.lap("write")
+        MISSIONS_INGESTED.inc(result="added")
+        if profiler:
+            profiler.finish(ocap_file, "added", clock.stages, {
+                "entities": len(raw_data.get("entities", [])), "raw_events": len(raw_data.get("events", [])),
+                "players": len(ocap.players), "vehicles": len(ocap.vehicles), "kill_events": len(ocap.events),
+                "frames": ocap.max_frame, "player_rows": len(unique_players), "squads": len(squads_stats),
+            }, mission_id=new_mission.id)
+        bump_generation()
+        refresh_data_version(session)
+        if AUTOCOMPLETE_ENABLED and autocomplete_fresh:
+            autocomplete.add_players(player_names)
         print(f"Добавлена миссия '{mission_name}' ({file_date}) [SQLite]")
         
         temp_path_str = get_app_config_sync("TEMP_PATH_STR", "temp")
@@ -281,7 +340,126 @@ def process_ocap(ocap_file: Path):
     
     except Exception as e:
         session.rollback()
+        MISSIONS_INGESTED.inc(result="failed")
         print(f"Error processing OCAP: {e}")
+        if profiler and profiler.active:
+            profiler.finish(ocap_file, "failed", clock.stages, {"error": str(e)[:500]})
         raise e
+    finally:
+        if locked:
+            WRITE_LOCK.release()
+        if profiler:
+            profiler.stop()  # Skipped missions are not recorded
+        session.close()
+
+
+DEATH_EVENTS_KEY = "DEATH_EVENTS_BACKFILLED"
+
+def backfill_death_events():
+    """
+    Fill PlayerStat.death_events for missions ingested before the column existed.
+    Victims are matched by their clean name, the same way ingest names players.
+    Once nothing is left a marker in AppConfig skips the player_stats scan on later starts.
+    """
+    if get_app_config_sync(DEATH_EVENTS_KEY, "") == "1":
+        return
+
+    session = SyncSessionLocal()
+    try:
+        mission_ids = [
+            row[0] for row in
+            session.query(PlayerStat.mission_id).filter(PlayerStat.death_events.is_(None)).distinct().all()
+        ]
+        if not mission_ids:
+            set_app_config_sync(DEATH_EVENTS_KEY, "1")
+            return
+
+        print(f"Backfilling death events for {len(mission_ids)} missions...")
+        session.commit()  # End the read snapshot before the writes
+        for mission_id in mission_ids:
+            with WRITE_LOCK:
+                players = (
+                    session.query(PlayerStat)
+                    .options(undefer_group("events"))
+                    .filter(PlayerStat.mission_id == mission_id)
+                    .all()
+                )
+
+                death_map: dict[str, list] = {}
+                for p in players:
+                    for k in p.victims_players or []:
+                        victim_name = k.get("name")
+                        if not victim_name:
+                            continue
+                        clean_name, _ = extract_name_and_squad(victim_name)
+                        event = dict(k)
+                        event.setdefault("killer_name", p.name)
+                        death_map.setdefault(clean_name, []).append(event)
+
+                for p in players:
+                    p.death_events = death_map.get(p.name, [])
+
+                session.commit()
+        set_app_config_sync(DEATH_EVENTS_KEY, "1")
+        print("Death events backfill finished.")
+    except Exception as e:
+        session.rollback()
+        print(f"Error backfilling death events: {e}")
+    finally:
+        session.close()
+
+
+EVENT_FORMAT_KEY = "EVENT_BLOB_VERSION"
+
+def migrate_event_blobs(batch_size: int = 500):
+    """
+    Re-encode stored event lists into the current compact format (see logic.event_codec)
+    and drop the duplicated kill lists from mission_squad_stats. Runs once, then a marker
+    in AppConfig makes it a no-op.
+    """
+    if get_app_config_sync(EVENT_FORMAT_KEY, "1") == str(FORMAT_VERSION):
+        return
+
+    session = SyncSessionLocal()
+    try:
+        print(f"Migrating event blobs to format v{FORMAT_VERSION}...")
+        last_id = 0
+        converted = 0
+        while True:
+            with WRITE_LOCK:
+                rows = (
+                    session.query(PlayerStat)
+                    .options(undefer_group("events"))
+                    .filter(PlayerStat.id > last_id)
+                    .order_by(PlayerStat.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not rows:
+                    session.commit()
+                    break
+                for ps in rows:
+                    # Values are decoded on load, marking them modified re-encodes them on flush
+                    for column in ("victims_players", "destroyed_vehicles", "death_events"):
+                        if getattr(ps, column) is not None:
+                            flag_modified(ps, column)
+                session.commit()
+            converted += len(rows)
+            last_id = rows[-1].id
+            session.expunge_all()
+
+        with WRITE_LOCK:
+            session.execute(update(MissionSquadStat).values(victims_players=[]))
+
+            marker = session.get(AppConfig, EVENT_FORMAT_KEY)
+            if marker:
+                marker.value = str(FORMAT_VERSION)
+            else:
+                session.add(AppConfig(key=EVENT_FORMAT_KEY, value=str(FORMAT_VERSION)))
+            session.commit()
+        print(f"Event blobs migrated ({converted} player rows). Run VACUUM to reclaim space.")
+    except Exception as e:
+        session.rollback()
+        print(f"Error migrating event blobs: {e}")
     finally:
         session.close()
@@ -0,0 +1,138 @@
+"""
+SQL statement timing for every engine (database.py installs the hooks).
+
+before/after_cursor_execute time each statement. Totals are kept per statement text
+(the SQL is parameterized, so one query shape is one entry) and per engine.
+
+Statements slower than VOSTOKSTAT_SLOW_QUERY_MS (default 200) are printed with their
+parameters and query plan (EXPLAIN QUERY PLAN on SQLite, EXPLAIN on PostgreSQL) and
+kept in a small ring for /admin/timing.
+
+API requests are counted too: api/timing.py puts a RequestQueries into the
+current_request context variable, and every statement executed on behalf of that
+request (async sessions and asyncio.to_thread alike) adds to it. A route with a query
+count that grows with the page size is an N+1.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+SLOW_QUERY_MS = float(os.getenv("VOSTOKSTAT_SLOW_QUERY_MS", "200"))
+SLOW_QUERY_KEEP = 50
+MAX_STATEMENTS = 500  # Distinct statement texts tracked, later ones only count in the engine totals
+PARAMS_REPR_LIMIT = 500
+
+_lock = threading.Lock()
+statement_stats = {}  # SQL text -> [count, total seconds, max seconds]
+engine_stats = {}  # engine label -> [count, total seconds]
+slow_queries = deque(maxlen=SLOW_QUERY_KEEP)
+
+
+class RequestQueries:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+current_request: ContextVar[RequestQueries | None] = ContextVar("current_request", default=None)
+
+
+def explain(conn, statement: str, parameters) -> list:
+    """Query plan of a slow statement, on the raw DBAPI connection so no events fire again"""
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return []
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if conn.dialect.name == "sqlite":
+        return [row[-1] for row in rows]  # (id, parent, notused, detail)
+    return [row[0] for row in rows]
+
+
+def record_slow(label: str, conn, statement: str, parameters, elapsed: float, executemany: bool):
+    params = repr(parameters)
+    if len(params) > PARAMS_REPR_LIMIT:
+        params = params[:PARAMS_REPR_LIMIT] + "..."
+    plan = []
+    if not executemany:
+        try:
+            plan = explain(conn, statement, parameters)
+        except Exception as e:
+            plan = [f"EXPLAIN failed: {e}"]
+    slow_queries.append({
+        "at": time.time(), "engine": label, "ms": round(elapsed * 1000, 1),
+        "statement": statement, "params": params, "plan": plan,
+    })
+    print(f"Slow query ({label}, {elapsed * 1000:.0f} ms): {' '.join(statement.split())[:300]}")
+    print(f"  params: {params}")
+    for line in plan:
+        print(f"  plan: {line}")
+
+
+def install_query_hooks(sync_engine, label: str):
+    """Time every statement of an engine (for async engines pass engine.sync_engine)"""
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        with _lock:
+            totals = engine_stats.setdefault(label, [0, 0.0])
+            totals[0] += 1
+            totals[1] += elapsed
+            entry = statement_stats.get(statement)
+            if entry is None and len(statement_stats) < MAX_STATEMENTS:
+                entry = statement_stats[statement] = [0, 0.0, 0.0]
+            if entry is not None:
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] = max(entry[2], elapsed)
+
+        request = current_request.get()
+        if request is not None:
+            request.count += 1
+            request.seconds += elapsed
+
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            record_slow(label, conn, statement, parameters, elapsed, executemany)
+
+
+def get_query_stats(top: int = 20) -> dict:
+    with _lock:
+        by_total = sorted(statement_stats.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        engines = {
+            label: {"queries": count, "total_ms": round(total * 1000, 1)}
+            for label, (count, total) in engine_stats.items()
+        }
+    return {
+        "slow_query_ms": SLOW_QUERY_MS,
+        "engines": engines,
+        "top_statements": [
+            {
+                "statement": " ".join(statement.split())[:300], "count": count,
+                "total_ms": round(total * 1000, 1), "avg_ms": round(total * 1000 / count, 2),
+                "max_ms": round(worst * 1000, 1),
+            }
+            for statement, (count, total, worst) in by_total
+        ],
+        "slow_queries": list(slow_queries),
+    }
+
+
+def reset_query_stats():
+    with _lock:
+        statement_stats.clear()
+        engine_stats.clear()
+        slow_queries.clear()
@@ -0,0 +1,123 @@
+"""
+Process-wide cache of rotations resolved for filtering.
+
+All rotations are small, so they are loaded together (with their squads) and kept as
+RotationContext objects keyed by id. The cache is reloaded when explicitly invalidated
+(admin rotation create/update/delete) or when the data generation changes, which also
+covers squad tag edits that change the expanded tag set.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from database import GlobalSquad, Rotation, RotationSquad
+from logic.cache import current_generation
+from logic.squad_registry import SquadMaps, squad_registry
+
+
+@dataclass(frozen=True)
+class RotationContext:
+    id: int
+    name: str
+    # Bounds in the file_date format (YYYY_MM_DD)
+    start_date: str
+    end_date: str
+    # Canonical squad names of the rotation's whitelist
+    whitelist_names: frozenset
+    # Every lower tag that maps to a whitelisted squad
+    whitelist_tags: frozenset
+    squad_ids: tuple
+    is_active: bool
+
+    def bounds(self):
+        """(start_date, end_date, whitelist_names), the shape the routers used to compute per request"""
+        return self.start_date, self.end_date, set(self.whitelist_names)
+
+
+ROTATIONS_STMT = select(Rotation).options(selectinload(Rotation.squads).selectinload(RotationSquad.squad))
+
+
+def build_contexts(rotations, maps):
+    """({id: RotationContext}, active rotation id) from Rotation rows with squads loaded"""
+    contexts = {}
+    active_id = None
+    for rot in rotations:
+        names = frozenset(rs.squad.name for rs in rot.squads if rs.squad)
+        contexts[rot.id] = RotationContext(
+            id=rot.id,
+            name=rot.name,
+            start_date=(rot.start_date or "").replace('-', '_'),
+            end_date=(rot.end_date or "").replace('-', '_'),
+            whitelist_names=names,
+            whitelist_tags=frozenset(maps.tags_for(names)),
+            squad_ids=tuple(rs.squad_id for rs in rot.squads),
+            is_active=bool(rot.is_active),
+        )
+        # If several are flagged active, the newest one wins
+        if rot.is_active and (active_id is None or rot.id > active_id):
+            active_id = rot.id
+    return contexts, active_id
+
+
+def load_contexts_sync(session) -> dict:
+    """
+    {id: RotationContext} read with a sync Session, bypassing the process caches, so
+    uncommitted squad/rotation edits of that session are seen (leaderboard maintenance)
+    """
+    maps = SquadMaps.build(session.execute(select(GlobalSquad)).scalars().all())
+    rotations = session.execute(ROTATIONS_STMT.execution_options(populate_existing=True)).scalars().all()
+    contexts, _ = build_contexts(rotations, maps)
+    return contexts
+
+
+class RotationResolver:
+    def __init__(self):
+        self.contexts: dict[int, RotationContext] = {}
+        self.active_id: Optional[int] = None
+        self.generation = None
+        self.lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        return self.generation != current_generation()
+
+    def invalidate(self):
+        self.generation = None
+
+    async def _load(self, db):
+        generation = current_generation()
+        maps = await squad_registry.get(db)
+        res = await db.execute(ROTATIONS_STMT)
+        contexts, active_id = build_contexts(res.scalars().all(), maps)
+
+        with self.lock:
+            self.contexts = contexts
+            self.active_id = active_id
+            self.generation = generation
+
+    async def get(self, db, rotation_id: Optional[int]) -> Optional[RotationContext]:
+        if not rotation_id:
+            return None
+        if self.is_stale():
+            await self._load(db)
+        return self.contexts.get(rotation_id)
+
+    async def active(self, db) -> Optional[RotationContext]:
+        if self.is_stale():
+            await self._load(db)
+        if self.active_id is None:
+            return None
+        return self.contexts.get(self.active_id)
+
+
+rotation_resolver = RotationResolver()
+
+
+async def get_rotation_context(db, rotation_id: Optional[int]):
+    """(start_date, end_date, whitelist_names) for a rotation, or Nones when not filtering"""
+    rot = await rotation_resolver.get(db, rotation_id)
+    if not rot:
+        return None, None, None
+    return rot.bounds()
@@ -0,0 +1,184 @@
+"""
+Search index over distinct player names, squad names/tags and mission names.
+
+Entries live in the small search_index table (SearchEntry) instead of being found
+with ILIKE scans over player_stats. On SQLite the keys are also in the search_fts
+trigram FTS5 table, so substring matches are index lookups. Queries of 1-2 characters
+(shorter than a trigram) and other databases use LIKE over search_index.
+
+Keys are casefolded in Python, so Cyrillic matches case-insensitively on every backend.
+Results are ranked: exact match, then prefix match, then substring, then by weight
+(number of missions).
+
+Maintenance:
+- process_ocap calls index_mission() in its own transaction
+- admin edits call refresh_players() / refresh_missions() / refresh_squads()
+- rebuild_search_index() fills the table from scratch (first start, delete all)
+"""
+from sqlalchemy import case, column, delete, func, select, table
+
+from database import IS_SQLITE, GlobalSquad, Mission, PlayerStat, SearchEntry, SyncSessionLocal, writer_lock
+
+search_fts = table("search_fts", column("rowid"), column("key"))
+TRIGRAM = 3
+
+_fts_ready = None
+
+
+def fold(text) -> str:
+    return str(text or "").strip().casefold()
+
+
+def fts_ready(session) -> bool:
+    global _fts_ready
+    if _fts_ready is None:
+        if not IS_SQLITE:
+            _fts_ready = False
+        else:
+            found = session.execute(
+                select(func.count()).select_from(table("sqlite_master", column("name")))
+                .where(column("name") == "search_fts")
+            ).scalar()
+            _fts_ready = bool(found)
+    return _fts_ready
+
+
+def match_clause(q_folded: str, use_fts: bool):
+    """Filter on SearchEntry rows whose key contains q_folded"""
+    if use_fts and len(q_folded) >= TRIGRAM:
+        phrase = '"' + q_folded.replace('"', '""') + '"'
+        return SearchEntry.id.in_(select(search_fts.c.rowid).where(search_fts.c.key.match(phrase)))
+    return SearchEntry.key.contains(q_folded, autoescape=True)
+
+
+def rank_expr(q_folded: str):
+    return case(
+        (SearchEntry.key == q_folded, 0),
+        (func.substr(SearchEntry.key, 1, len(q_folded)) == q_folded, 1),
+        else_=2,
+    )
+
+
+def search_stmt(kind: str, q: str, use_fts: bool):
+    """SearchEntry rows of one kind matching q, best first"""
+    q_folded = fold(q)
+    return (
+        select(SearchEntry)
+        .where(SearchEntry.kind == kind, match_clause(q_folded, use_fts))
+        .order_by(rank_expr(q_folded), SearchEntry.weight.desc(), SearchEntry.name)
+    )
+
+
+def names_subquery(kind: str, q: str, use_fts: bool):
+    """Names matching q, for filtering the big tables: .where(Model.name.in_(...))"""
+    return select(SearchEntry.name).where(SearchEntry.kind == kind, match_clause(fold(q), use_fts))
+
+
+async def search(db, kind: str, q: str, limit: int = 10) -> list:
+    """Ranked SearchEntry rows for an AsyncSession"""
+    use_fts = await db.run_sync(fts_ready)
+    res = await db.execute(search_stmt(kind, q, use_fts).limit(limit))
+    return res.scalars().all()
+
+
+async def names_filter(db, kind: str, q: str):
+    use_fts = await db.run_sync(fts_ready)
+    return names_subquery(kind, q, use_fts)
+
+
+# --- Maintenance (sync Session; from async code use `await db.run_sync(...)`) ---
+
+def _replace(session, kind: str, names, rows):
+    """Replace the entries of `names` with rows [(name, weight)], dropping names with no rows"""
+    names = {n for n in names if n}
+    if not names:
+        return
+    session.execute(delete(SearchEntry).where(SearchEntry.kind == kind, SearchEntry.name.in_(names)))
+    for name, weight in rows:
+        session.add(SearchEntry(kind=kind, key=fold(name), name=name, weight=weight))
+
+
+def refresh_players(session, names):
+    """Recount the given player names from player_stats"""
+    names = {n for n in names if n}
+    rows = session.execute(
+        select(PlayerStat.name, func.count(func.distinct(PlayerStat.mission_id)))
+        .where(PlayerStat.name.in_(names))
+        .group_by(PlayerStat.name)
+    ).all() if names else []
+    _replace(session, "player", names, rows)
+
+
+def refresh_missions(session, names):
+    """Recount the given mission names from missions"""
+    names = {n for n in names if n}
+    rows = session.execute(
+        select(Mission.mission_name, func.count(Mission.id))
+        .where(Mission.mission_name.in_(names))
+        .group_by(Mission.mission_name)
+    ).all() if names else []
+    _replace(session, "mission", names, rows)
+
+
+def refresh_squads(session):
+    """Squads come from GlobalSquad (few rows): rebuild all their entries"""
+    session.execute(delete(SearchEntry).where(SearchEntry.kind == "squad"))
+    for sq in session.execute(select(GlobalSquad)).scalars().all():
+        if not sq.name:
+            continue
+        name = sq.name.strip()
+        seen = {fold(name)}
+        session.add(SearchEntry(kind="squad", key=fold(name), name=name))
+        for t in sq.tags or []:
+            if fold(t) and fold(t) not in seen:
+                seen.add(fold(t))
+                session.add(SearchEntry(kind="squad", key=fold(t), name=name, label=str(t).strip()))
+
+
+def index_mission(session, mission_name: str, player_names):
+    """Add one freshly ingested mission: bump weights, insert names seen for the first time"""
+    for kind, names in (("player", set(player_names)), ("mission", {mission_name})):
+        names = {n for n in names if n}
+        if not names:
+            continue
+        existing = session.execute(
+            select(SearchEntry).where(SearchEntry.kind == kind, SearchEntry.name.in_(names))
+        ).scalars().all()
+        for entry in existing:
+            entry.weight = (entry.weight or 0) + 1
+            names.discard(entry.name)
+        for name in names:
+            session.add(SearchEntry(kind=kind, key=fold(name), name=name, weight=1))
+
+
+def rebuild_search_index(session=None):
+    if session is None:
+        with writer_lock(), SyncSessionLocal() as own_session:
+            rebuild_search_index(own_session)
+            own_session.commit()
+        return
+
+    session.execute(delete(SearchEntry))
+    players = session.execute(
+        select(PlayerStat.name, func.count(func.distinct(PlayerStat.mission_id))).group_by(PlayerStat.name)
+    ).all()
+    missions = session.execute(
+        select(Mission.mission_name, func.count(Mission.id)).group_by(Mission.mission_name)
+    ).all()
+    session.add_all(SearchEntry(kind="player", key=fold(n), name=n, weight=w) for n, w in players if n)
+    session.add_all(SearchEntry(kind="mission", key=fold(n), name=n, weight=w) for n, w in missions if n)
+    refresh_squads(session)
+
+
+def ensure_search_index():
+    """Startup: build the index once for databases that predate it"""
+    with writer_lock(), SyncSessionLocal() as session:
+        has_entries = session.execute(select(SearchEntry.id).limit(1)).first()
+        has_data = session.execute(select(PlayerStat.id).limit(1)).first() or \
+            session.execute(select(GlobalSquad.id).limit(1)).first()
+        if has_entries or not has_data:
+            return
+        print("Building search index...")
+        rebuild_search_index(session)
+        session.commit()
+        print("Search index built.")
@@ -0,0 +1,203 @@
+"""
+Squad membership history of players (the timeline on the player profile).
+
+Runs are stored in player_squad_runs and appended at ingest: a mission either extends
+the player's latest run (same squad) or starts a new one. A mission older than the
+latest run (out of order ingest) and admin edits rebuild the affected players' runs
+from player_stats instead.
+"""
+from datetime import datetime
+
+from sqlalchemy import delete, func, select
+
+from database import Mission, PlayerSquadRun, PlayerStat, SearchEntry, SyncSessionLocal, writer_lock
+from logic.search_index import fold
+
+NO_SQUAD = "No Squad"
+MIN_DURATION = 100  # Same cut as the stats pages
+
+
+class RunBuilder:
+    """Collapse (squad, date) pairs, oldest first, into runs"""
+
+    def __init__(self):
+        self.runs = []
+
+    def add(self, squad, date):
+        squad = squad or NO_SQUAD
+        if self.runs and self.runs[-1]["squad"] == squad:
+            self.runs[-1]["end_str"] = date
+            self.runs[-1]["count"] += 1
+        else:
+            self.runs.append({"squad": squad, "start_str": date, "end_str": date, "count": 1})
+
+
+def parse_dt(d_str):
+    if isinstance(d_str, datetime):
+        return d_str
+    s = str(d_str).strip()
+    formats = [
+        "%Y_%m_%d__%H_%M",   # Stored file_date with time (from the OCAP filename)
+        "%Y_%m_%d",          # Stored file_date
+        "%Y-%m-%d %H:%M:%S",
+        "%Y-%m-%d %H:%M",
+        "%Y-%m-%d",
+        "%Y-%m-%dT%H:%M:%S",
+        "%Y-%m-%d_%H-%M-%S", # Standard OCAP
+    ]
+    for fmt in formats:
+        try:
+            return datetime.strptime(s, fmt)
+        except ValueError:
+            continue
+    # returning now() causes 1-day segments, but keeps the timeline usable
+    print(f"Date parse error for: {d_str}")
+    return datetime.now()
+
+
+def build_timeline(raw_runs) -> list:
+    """Runs -> timeline segments. A segment ends where the next one starts, the last one now."""
+    timeline = []
+    now = datetime.now()
+    for i, run in enumerate(raw_runs):
+        s_date = parse_dt(run["start_str"])
+        if i < len(raw_runs) - 1:
+            e_date = parse_dt(raw_runs[i + 1]["start_str"])  # End is next Start
+        else:
+            e_date = now  # Last segment extends to the current date
+
+        days = (e_date - s_date).days
+        if days < 1:
+            days = 1
+
+        timeline.append({
+            "squad": run["squad"],
+            "start_date": s_date.strftime("%Y-%m-%d %H:%M:%S"),
+            "end_date": e_date.strftime("%Y-%m-%d %H:%M:%S"),
+            "days": days,
+            "mission_count": run["count"],
+        })
+    return timeline
+
+
+def _runs_to_dicts(runs) -> list:
+    return [
+        {"squad": r.squad, "start_str": r.start_date, "end_str": r.last_date, "count": r.mission_count}
+        for r in runs
+    ]
+
+
+async def load_runs(db, player_keys) -> dict:
+    """player key -> runs (oldest first) for several players in one query"""
+    if not player_keys:
+        return {}
+    res = await db.execute(
+        select(PlayerSquadRun)
+        .where(PlayerSquadRun.player_key.in_(player_keys))
+        .order_by(PlayerSquadRun.start_date, PlayerSquadRun.id)
+    )
+    by_key = {}
+    for run in res.scalars().all():
+        by_key.setdefault(run.player_key, []).append(run)
+    return {key: _runs_to_dicts(runs) for key, runs in by_key.items()}
+
+
+def rebuild_players(session, keys):
+    """Recompute the runs of the given player keys (lower names) from player_stats"""
+    keys = {k for k in keys if k}
+    if not keys:
+        return
+    session.execute(delete(PlayerSquadRun).where(PlayerSquadRun.player_key.in_(keys)))
+
+    # Exact spellings from the search index, so player_stats is read through its name index
+    spellings = (
+        select(SearchEntry.name)
+        .where(SearchEntry.kind == "player", SearchEntry.key.in_({fold(k) for k in keys}))
+    )
+    rows = session.execute(
+        select(PlayerStat.name, PlayerStat.squad, Mission.file_date)
+        .join(Mission, PlayerStat.mission_id == Mission.id)
+        .where(PlayerStat.name.in_(spellings), Mission.duration_time >= MIN_DURATION)
+        .order_by(Mission.file_date, Mission.id)
+    ).all()
+
+    builders = {}
+    for name, squad, file_date in rows:
+        key = name.lower()
+        if key in keys:
+            builders.setdefault(key, RunBuilder()).add(squad, file_date)
+    for key, builder in builders.items():
+        _store(session, key, builder.runs)
+
+
+def _store(session, key, runs):
+    for run in runs:
+        session.add(PlayerSquadRun(
+            player_key=key, squad=run["squad"], start_date=run["start_str"],
+            last_date=run["end_str"], mission_count=run["count"]
+        ))
+
+
+def record_mission(session, file_date: str, duration_time: float, players):
+    """Ingest: extend or start runs for players [(name, squad)] of a new mission"""
+    if duration_time < MIN_DURATION:
+        return
+    squads = {}
+    for name, squad in players:
+        if name:
+            squads.setdefault(name.lower(), squad or NO_SQUAD)
+    if not squads:
+        return
+
+    latest = {}
+    res = session.execute(
+        select(PlayerSquadRun)
+        .where(PlayerSquadRun.player_key.in_(squads.keys()))
+        .order_by(PlayerSquadRun.start_date, PlayerSquadRun.id)
+    )
+    for run in res.scalars():
+        latest[run.player_key] = run
+
+    out_of_order = []
+    for key, squad in squads.items():
+        run = latest.get(key)
+        if run is not None and file_date < run.last_date:
+            out_of_order.append(key)
+        elif run is not None and run.squad == squad:
+            run.last_date = file_date
+            run.mission_count += 1
+        else:
+            _store(session, key, [{"squad": squad, "start_str": file_date, "end_str": file_date, "count": 1}])
+
+    if out_of_order:
+        rebuild_players(session, out_of_order)
+
+
+def rebuild_all(session):
+    session.execute(delete(PlayerSquadRun))
+    rows = session.execute(
+        select(PlayerStat.name, PlayerStat.squad, Mission.file_date)
+        .join(Mission, PlayerStat.mission_id == Mission.id)
+        .where(Mission.duration_time >= MIN_DURATION)
+        .order_by(Mission.file_date, Mission.id)
+        .execution_options(yield_per=5000)
+    )
+    builders = {}
+    for name, squad, file_date in rows:
+        if name:
+            builders.setdefault(name.lower(), RunBuilder()).add(squad, file_date)
+    for key, builder in builders.items():
+        _store(session, key, builder.runs)
+
+
+def ensure_squad_history():
+    """Startup: build the history once for databases that predate it"""
+    with writer_lock(), SyncSessionLocal() as session:
+        if session.execute(select(PlayerSquadRun.id).limit(1)).first():
+            return
+        if not session.execute(select(PlayerStat.id).limit(1)).first():
+            return
+        print("Building squad history...")
+        rebuild_all(session)
+        session.commit()
+        print(f"Squad history built: {session.scalar(select(func.count(PlayerSquadRun.id)))} runs.")
@@ -0,0 +1,99 @@
+"""
+Process-wide registry of known squads (GlobalSquad) and their tag mappings.
+
+Loaded once and shared by ingestion and the API. It is reloaded when explicitly
+invalidated (admin squad create/update/delete) or when the data generation changes.
+"""
+import threading
+from dataclasses import dataclass, field
+
+from sqlalchemy.future import select
+
+from database import GlobalSquad, SyncSessionLocal
+from logic.cache import current_generation
+
+
+@dataclass(frozen=True)
+class SquadMaps:
+    # lower tag (or lower canonical name) -> canonical name
+    tag_to_canonical: dict = field(default_factory=dict)
+    # canonical name -> list of lower tags, including the canonical name itself
+    canonical_to_tags: dict = field(default_factory=dict)
+    # canonical name -> {"side": str, "name": str}
+    canonical_meta: dict = field(default_factory=dict)
+    # canonical name -> tags as entered in the admin panel (for display)
+    raw_tags: dict = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, squads) -> "SquadMaps":
+        tag_to_canonical = {}
+        canonical_to_tags = {}
+        canonical_meta = {}
+        raw_tags = {}
+
+        for sq in squads:
+            if not sq.name:
+                continue
+            c_name = sq.name.strip()
+            canonical_meta[c_name] = {"side": sq.side, "name": c_name}
+            raw_tags[c_name] = list(sq.tags or [])
+
+            tags = {c_name.lower()}
+            for t in sq.tags or []:
+                tags.add(str(t).strip().lower())
+
+            canonical_to_tags[c_name] = list(tags)
+            for t in tags:
+                tag_to_canonical[t] = c_name
+
+        return cls(tag_to_canonical, canonical_to_tags, canonical_meta, raw_tags)
+
+    def tags_for(self, canonical_names) -> set:
+        """Expand canonical squad names to every lower tag that maps to them"""
+        tags = set()
+        for name in canonical_names:
+            c_name = name.strip()
+            tags.add(c_name.lower())
+            tags.update(self.canonical_to_tags.get(c_name, []))
+        return tags
+
+
+class SquadRegistry:
+    def __init__(self):
+        self.maps = SquadMaps()
+        self.generation = None
+        self.lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        return self.generation != current_generation()
+
+    def invalidate(self):
+        self.generation = None
+
+    def _store(self, squads, generation) -> SquadMaps:
+        maps = SquadMaps.build(squads)
+        with self.lock:
+            self.maps = maps
+            self.generation = generation
+        return maps
+
+    async def get(self, db) -> SquadMaps:
+        """Squad maps for API handlers, loading them with the request's session if stale"""
+        if not self.is_stale():
+            return self.maps
+        generation = current_generation()
+        res = await db.execute(select(GlobalSquad))
+        return self._store(res.scalars().all(), generation)
+
+    def get_sync(self, session=None) -> SquadMaps:
+        """Squad maps for the (synchronous) ingestion code"""
+        if not self.is_stale():
+            return self.maps
+        generation = current_generation()
+        if session is not None:
+            return self._store(session.query(GlobalSquad).all(), generation)
+        with SyncSessionLocal() as own_session:
+            return self._store(own_session.query(GlobalSquad).all(), generation)
+
+
+squad_registry = SquadRegistry()
@@ -0,0 +1,58 @@
+"""
+Time-to-first-request benchmark for the API.
+
+Starts the app in a fresh interpreter (so imports count), runs its lifespan startup and
+times the first GET of a public route, a few times over. Uses whatever database the
+environment points at (DATABASE_URL, or vostokstat.db in the working directory), so run
+it against a copy of a production-sized DB. Ingestion is disabled in the child process.
+
+Usage: python -m logic.startup_bench [--runs 5] [--path /missions/]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+import api.main
+from fastapi.testclient import TestClient
+t1 = time.perf_counter()
+with TestClient(api.main.app) as client:
+    t2 = time.perf_counter()
+    status = client.get(sys.argv[1]).status_code
+    t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "startup": t2 - t1, "first_request": t3 - t2, "status": status}))
+"""
+
+
+def run_once(path: str) -> dict:
+    env = dict(os.environ, VOSTOKSTAT_EMBEDDED_INGEST="0")
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, path], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    # The app prints its own startup messages, the measurement is the last line
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/missions/")
+    args = parser.parse_args()
+
+    results = [run_once(args.path) for _ in range(args.runs)]
+    if any(r["status"] != 200 for r in results):
+        print(f"Warning: {args.path} answered {sorted({r['status'] for r in results})}")
+    for key in ("import", "startup", "first_request"):
+        values = [r[key] * 1000 for r in results]
+        print(f"{key:>14}: median {statistics.median(values):7.1f} ms  max {max(values):7.1f} ms")
+    total = [sum(r[k] for k in ("import", "startup", "first_request")) * 1000 for r in results]
+    print(f"{'total':>14}: median {statistics.median(total):7.1f} ms  max {max(total):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Concurrent read/write benchmark for the SQLite storage profile.
+
+Runs one writer thread (mission-sized inserts, like process_ocap) against several
+reader threads (aggregate queries, like the public API) on a scratch DB file,
+once with SQLite defaults and once with the tuned profile from database.py.
+
+Usage: python -m logic.storage_bench [--seconds 10] [--readers 4]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from database import Base, Mission, PlayerStat, SQLITE_PRAGMAS
+
+READ_QUERY = text(
+    "SELECT name, count(mission_id), sum(frags), sum(death) "
+    "FROM player_stats GROUP BY name ORDER BY sum(frags) DESC LIMIT 50"
+)
+
+
+def make_engine(db_path: str, pragmas: dict, query_only: bool = False):
+    eng = create_engine(f"sqlite:///{db_path}", echo=False)
+
+    @event.listens_for(eng, "connect")
+    def _apply(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for key, value in pragmas.items():
+            cursor.execute(f"PRAGMA {key}={value}")
+        if query_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return eng
+
+
+def write_mission(session: Session, n: int, players: int = 150):
+    mission = Mission(file_name=f"bench_{n}.json", file_date="2026_01_01", mission_name=f"Bench {n}",
+                      duration_time=3600.0, total_players=players)
+    session.add(mission)
+    session.flush()
+    for i in range(players):
+        session.add(PlayerStat(mission_id=mission.id, name=f"player{i % 400}", side="WEST",
+                               squad="BENCH", frags=i % 7, death=i % 3,
+                               victims_players=[{"name": "x", "frame": j} for j in range(i % 7)]))
+    session.commit()
+
+
+def run(label: str, pragmas: dict, seconds: float, readers: int) -> dict:
+    fd, db_path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    writer_engine = make_engine(db_path, pragmas)
+    reader_engine = make_engine(db_path, pragmas, query_only=bool(pragmas))
+    Base.metadata.create_all(writer_engine)
+
+    stop = threading.Event()
+    latencies: list[float] = []
+    errors = {"read": 0, "write": 0}
+    writes = 0
+    lock = threading.Lock()
+
+    def writer():
+        nonlocal writes
+        n = 0
+        while not stop.is_set():
+            try:
+                with Session(writer_engine) as session:
+                    write_mission(session, n)
+                writes += 1
+            except OperationalError:
+                errors["write"] += 1
+            n += 1
+
+    def reader():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                with reader_engine.connect() as conn:
+                    conn.execute(READ_QUERY).all()
+            except OperationalError:
+                with lock:
+                    errors["read"] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    writer_engine.dispose()
+    reader_engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    latencies.sort()
+    return {
+        "profile": label,
+        "missions_written": writes,
+        "reads": len(latencies),
+        "read_p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "read_p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else None,
+        "read_errors": errors["read"],
+        "write_errors": errors["write"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    for label, pragmas in (("default", {}), ("tuned", SQLITE_PRAGMAS)):
+        result = run(label, pragmas, args.seconds, args.readers)
+        print(" | ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
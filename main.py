@@ -1,15 +1,13 @@
-import time
-from logic.download_mission import main
+import asyncio
+from database import init_db
+from logic.ingest_worker import run_worker
+from logic.metrics import start_metrics_server
 
+# Standalone ingestion worker. Run it next to the API started with
+# VOSTOKSTAT_EMBEDDED_INGEST=0; the ingest lease keeps it to one ingesting process.
+# VOSTOKSTAT_METRICS_PORT=9101 serves its Prometheus metrics.
 if __name__ == "__main__":
-    print("=== Инициализация миссий ===")
-    main(mode="init")
-
-    while True:
-        try:
-            print("=== Поиск новых миссий (последние 2 дня) ===")
-            main(mode="update")
-        except Exception as e:
-            print(f"Ошибка: {e}")
-        print("Перезапуск через 10 секунд...")
-        time.sleep(10)
+    asyncio.run(init_db())
+    print("=== Ingestion worker started ===")
+    start_metrics_server()
+    run_worker()
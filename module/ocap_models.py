@@ -302,22 +302,26 @@ class OCAP(BaseModel):
     max_frame: int
 
     @classmethod
-    def from_file(cls, path: Path) -> "OCAP":
+    def from_file(cls, path: Path, clock=None, threaded: bool = True) -> "OCAP":
+        # clock: optional lap timer (logic.metrics.StageClock) for ingest profiling.
+        # threaded=False validates in the calling thread, so a profiler can see it.
         with path.open("r", encoding="UTF-8") as fd:
             data = json.load(fd)
+        if clock:
+            clock.lap("json")
 
         queue = Queue()
 
-        players_thread = threading.Thread(target=Player.map_from_ocap_queued, args=(data, queue), daemon=True)
-        players_thread.start()
-        vehicles_thread = threading.Thread(target=Vehicle.map_from_ocap_queued, args=(data, queue), daemon=True)
-        vehicles_thread.start()
-        events_thread = threading.Thread(target=KillEventRaw.list_from_ocap_queued, args=(data, queue), daemon=True)
-        events_thread.start()
-
-        players_thread.join()
-        vehicles_thread.join()
-        events_thread.join()
+        mappers = (Player.map_from_ocap_queued, Vehicle.map_from_ocap_queued, KillEventRaw.list_from_ocap_queued)
+        if threaded:
+            threads = [threading.Thread(target=mapper, args=(data, queue), daemon=True) for mapper in mappers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            for mapper in mappers:
+                mapper(data, queue)
 
         thread_1, thread_2, thread_3 = {}, {}, {}
         with suppress(Empty):
@@ -333,6 +337,8 @@ class OCAP(BaseModel):
         events = threads_data.get("events", {})
 
         events = KillEvent.map_from_ocap(players, vehicles, events)
+        if clock:
+            clock.lap("validation")
 
         positions = defaultdict(
             lambda: defaultdict(
@@ -345,6 +351,9 @@ class OCAP(BaseModel):
                     (pos.coordinates.x, pos.coordinates.y)
                 ].append(i.id)
 
+        if clock:
+            clock.lap("position_index")
+
         ocap = cls(
             players=players,
             vehicles=vehicles,
@@ -362,6 +371,8 @@ class OCAP(BaseModel):
                     if pos.player_name and p.name != pos.player_name:
                         p.name = f"{pos.player_name} [AI]"
                         break
+        if clock:
+            clock.lap("ai_names")
 
         # Заполнение ТС, на котором был убийца во время фрага.
         for e in ocap.events:
@@ -378,6 +389,8 @@ class OCAP(BaseModel):
                 #     positions[EntityType.UNIT][e.frame][(killer_pos.x, killer_pos.y)]
                 # )
                 # print('!>>>', parse_players_in_vehicle(ocap, e.killer_vehicle.id, e.frame))
+        if clock:
+            clock.lap("vehicle_search")
 
         return ocap
 
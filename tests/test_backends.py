@@ -0,0 +1,27 @@
+from sqlalchemy import literal, select
+from sqlalchemy.orm import Session
+
+from database import GlobalSquad, casefold
+
+
+def test_casefold_folds_cyrillic(backend_engine):
+    with Session(backend_engine) as session:
+        assert session.scalar(select(casefold(literal("ВоСтОк Alpha")))) == "восток alpha"
+
+
+def test_squad_search_is_case_insensitive(backend_engine):
+    with Session(backend_engine) as session:
+        session.add_all([GlobalSquad(name="ЖУК"), GlobalSquad(name="Wolf"), GlobalSquad(name="Орёл")])
+        session.flush()
+        found = session.scalars(select(GlobalSquad.name).where(casefold(GlobalSquad.name).in_(["жук", "wolf"]))).all()
+        assert sorted(found) == ["Wolf", "ЖУК"]
+        found = session.scalars(select(GlobalSquad.name).where(casefold(GlobalSquad.name).contains("рё"))).all()
+        assert found == ["Орёл"]
+        session.rollback()
+
+
+def test_builtin_lower_is_not_overridden(database):
+    from database import sync_engine
+    with sync_engine.connect() as conn:
+        # SQLite's own lower(): ASCII only, no Python call per row
+        assert conn.exec_driver_sql("SELECT lower('ЖУК Wolf')").scalar() == "ЖУК wolf"
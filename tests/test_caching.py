@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from api.caching import _inflight, cached_route
+from logic.cache import ResponseCache, bump_generation, current_generation, response_cache
+
+
+def test_results_are_cached_until_the_generation_moves():
+    calls = []
+
+    @cached_route("test_generation")
+    async def handler(value: int):
+        calls.append(value)
+        return {"value": value, "run": len(calls)}
+
+    async def scenario():
+        first = await handler(value=1)
+        assert await handler(value=1) == first
+        assert await handler(value=2) == {"value": 2, "run": 2}  # Other params, other entry
+        generation = current_generation()
+        bump_generation()
+        assert current_generation() > generation
+        assert await handler(value=1) == {"value": 1, "run": 3}
+
+    asyncio.run(scenario())
+    assert calls == [1, 2, 1]
+
+
+def test_errors_are_not_cached():
+    calls = 0
+
+    @cached_route("test_errors")
+    async def handler(value: int):
+        nonlocal calls
+        calls += 1
+        raise HTTPException(status_code=404, detail="Not found")
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(HTTPException):
+                await handler(value=1)
+
+    asyncio.run(scenario())
+    assert calls == 2
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, cache_dir=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"], stats["hits"], stats["misses"]) == (2, 1, 3, 1)
+
+
+def test_disk_cache_is_shared_between_processes(tmp_path):
+    writer = ResponseCache(max_entries=4, cache_dir=str(tmp_path))
+    reader = ResponseCache(max_entries=4, cache_dir=str(tmp_path))  # Another worker
+    writer.set("key", {"name": "Жук"})
+    assert reader.get("key") == {"name": "Жук"}
+    assert reader.stats()["disk_hits"] == 1
+
+
+def test_cancelled_leader_hands_over_to_one_waiter():
+    calls = 0
+    release = None
+
+    @cached_route("test_cancelled_leader")
+    async def handler(value: int):
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"value": value, "run": calls}
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        response_cache.clear()
+
+        leader = asyncio.create_task(handler(value=1))
+        await asyncio.sleep(0)  # Leader registers its in-flight future
+        waiters = [asyncio.create_task(handler(value=1)) for _ in range(5)]
+        await asyncio.sleep(0)  # Waiters join it
+
+        leader.cancel()
+        await asyncio.sleep(0.01)  # Waiters notice and one of them takes over
+        release.set()
+        results = await asyncio.gather(*waiters)
+
+        assert leader.cancelled()
+        assert calls == 2  # The leader plus exactly one replacement, not one per waiter
+        assert all(r == {"value": 1, "run": 2} for r in results)
+        assert not _inflight
+
+    asyncio.run(scenario())
@@ -0,0 +1,112 @@
+import asyncio
+import gzip
+import json
+import threading
+
+import pytest
+
+from api import compression
+from api.compression import ETAG_SCOPE_KEY, CompressionMiddleware, compressed_cache, negotiate
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("gzip", "gzip"),
+    ("GZIP, deflate", "gzip"),
+    ("deflate", None),
+    ("*", "br"),
+    ("*;q=0", None),
+    ("gzip;q=0", None),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip;q=0, *", "br"),
+    ("br;q=0, zstd;q=0, *;q=0.5", "gzip"),
+    ("zstd;q=0.1, gzip", "zstd"),  # Any q > 0 counts, our preference decides
+    ("br;q=abc, gzip", "gzip"),
+])
+def test_negotiate(header, expected, monkeypatch):
+    monkeypatch.setattr(compression, "ENCODINGS", ["br", "zstd", "gzip"])
+    assert negotiate(header) == expected
+
+
+def test_negotiate_skips_missing_encodings(monkeypatch):
+    monkeypatch.setattr(compression, "ENCODINGS", ["gzip"])
+    assert negotiate("br, zstd") is None
+    assert negotiate("br, *") == "gzip"
+
+
+class JsonApp:
+    """Counts handler runs; sends a JSON body of `size` bytes"""
+
+    def __init__(self, size: int, status: int = 200):
+        self.body = json.dumps({"data": "x" * size}).encode()
+        self.status = status
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        await send({"type": "http.response.start", "status": self.status,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": self.body})
+
+
+def request(app, encoding="gzip", etag='"tag-1"'):
+    scope = {"type": "http", "method": "GET", "path": "/missions/1", "headers": [(b"accept-encoding", encoding.encode())]}
+    if etag:
+        scope[ETAG_SCOPE_KEY] = etag
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(CompressionMiddleware(app)(scope, receive, send))
+    start, body = messages
+    return start["status"], dict(start["headers"]), body["body"]
+
+
+def test_stored_body_is_reused():
+    compressed_cache.clear()
+    app = JsonApp(5000)
+    status, headers, body = request(app)
+    assert status == 200 and headers[b"content-encoding"] == b"gzip"
+    assert gzip.decompress(body) == app.body
+
+    assert request(app) == (status, headers, body)
+    assert app.calls == 1  # Second answer came from compressed_cache
+    request(app, etag='"tag-2"')  # Another data version
+    assert app.calls == 2
+
+
+def test_untagged_errors_and_small_bodies_are_not_stored():
+    compressed_cache.clear()
+    untagged = JsonApp(5000)
+    request(untagged, etag=None)
+    request(untagged, etag=None)
+    assert untagged.calls == 2
+    missing = JsonApp(5000, status=404)
+    request(missing)
+    request(missing)
+    assert missing.calls == 2
+    small = JsonApp(10)
+    _, headers, body = request(small)
+    assert b"content-encoding" not in headers and body == small.body
+
+
+def test_large_bodies_compress_off_the_event_loop(monkeypatch):
+    compressed_cache.clear()
+    threads = []
+    original = compression.compress
+
+    def tracking(body, encoding, stored=False):
+        threads.append(threading.current_thread())
+        return original(body, encoding, stored)
+
+    monkeypatch.setattr(compression, "compress", tracking)
+    monkeypatch.setattr(compression, "COMPRESS_THREAD_BYTES", 4096)
+    request(JsonApp(2000), etag='"small"')
+    request(JsonApp(8000), etag='"large"')
+    assert threads[0] is threading.main_thread()
+    assert threads[1] is not threading.main_thread()
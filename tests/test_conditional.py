@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from database import BASELINE_EVENT, EventLogEntry, SyncSessionLocal, init_db
+from logic import cache
+from logic.events import record_event, refresh_data_version
+
+
+@pytest.fixture
+def versioned(client, monkeypatch):
+    """Client with the data version loaded from event_log, as the relay does at startup"""
+    monkeypatch.setattr(cache, "_data_version", None)
+    asyncio.run(init_db())  # clean_db emptied event_log, init_db puts the baseline row back
+    with SyncSessionLocal() as session:
+        refresh_data_version(session)
+    return client
+
+
+def change():
+    with SyncSessionLocal() as session:
+        record_event(session, "data_changed", {"scope": "test"})
+        session.commit()
+        refresh_data_version(session)
+
+
+def test_init_db_writes_one_baseline_row(clean_db):
+    for _ in range(2):
+        asyncio.run(init_db())
+    with SyncSessionLocal() as session:
+        rows = session.query(EventLogEntry).all()
+    assert [r.kind for r in rows] == [BASELINE_EVENT]
+    assert rows[0].created_at > 0
+
+
+def test_etag_and_304(versioned):
+    first = versioned.get("/missions/")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "public, no-cache"
+    assert "1970" not in first.headers["last-modified"]
+
+    again = versioned.get("/missions/", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+    assert versioned.get("/missions/", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    # Only the tag revalidates
+    assert versioned.get("/missions/", headers={"If-Modified-Since": first.headers["last-modified"]}).status_code == 200
+
+    change()
+    after = versioned.get("/missions/", headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["etag"] != etag
+
+
+def test_tag_depends_on_query_and_encoding(versioned):
+    def tag(url, encoding="identity"):
+        return versioned.get(url, headers={"Accept-Encoding": encoding}).headers["etag"]
+
+    plain = tag("/missions/?skip=0&limit=5")
+    assert tag("/missions/?limit=5&skip=0") == plain
+    assert tag("/missions/?limit=6&skip=0") != plain
+    assert tag("/missions/?skip=0&limit=5", "gzip") != plain
+
+
+def test_no_last_modified_without_a_change_time(versioned, monkeypatch):
+    monkeypatch.setattr(cache, "_data_version", (7, 1))
+    monkeypatch.setattr(cache, "_data_modified", 0.0)
+    res = versioned.get("/missions/")
+    assert "etag" in res.headers
+    assert "last-modified" not in res.headers
+
+
+def test_admin_routes_are_untouched(admin_client):
+    assert "etag" not in admin_client.get("/admin/missions").headers
@@ -0,0 +1,65 @@
+import pytest
+
+from logic import event_codec
+from logic.event_codec import FORMAT_VERSION, decode_events, encode_events
+
+
+def kills():
+    return [
+        {"name": "[ЖУК] Нико", "weapon": "AK-74", "frame": 120, "distance": 42.5,
+         "position": {"x": 1.234, "y": 5.678}, "OcapPos": {"x": 1.234, "y": 5.678}, "killer_name": "Wolf"},
+        {"name": "Bob", "weapon": "M4", "frame": 300, "distance": 0.0,
+         "position": {"x": -20.5, "y": 7.0}, "OcapPos": {"x": -20.5, "y": 7.0}, "killer_name": "Wolf"},
+        {"name": "Eve", "weapon": None, "frame": 301, "distance": 3.0,
+         "position": None, "OcapPos": None, "killer_name": "Wolf"},
+    ]
+
+
+def rounded(events):
+    for e in events:
+        for k in event_codec.POSITION_KEYS:
+            if e.get(k):
+                e[k] = {"x": round(e[k]["x"], 2), "y": round(e[k]["y"], 2)}
+    return events
+
+
+@pytest.mark.parametrize("codec", ["", "zlib", "msgpack"])
+def test_round_trip(codec, monkeypatch):
+    if codec == "msgpack":
+        pytest.importorskip("msgpack")
+    monkeypatch.setenv("VOSTOKSTAT_EVENT_COMPRESSION", codec)
+    stored = encode_events(kills())
+    assert stored["v"] == FORMAT_VERSION
+    assert ("z" in stored) == bool(codec)
+    assert decode_events(stored) == rounded(kills())
+
+
+def test_duplicates_are_dropped(monkeypatch):
+    monkeypatch.delenv("VOSTOKSTAT_EVENT_COMPRESSION", raising=False)
+    stored = encode_events(kills())
+    assert stored["c"] == {"killer_name": "Wolf"}
+    assert stored["a"] == {"OcapPos": "position"}
+    assert "killer_name" not in stored["k"] and "OcapPos" not in stored["k"]
+
+
+def test_legacy_and_empty_values_pass_through():
+    legacy = [{"name": "Bob", "frame": 1}]
+    assert decode_events(legacy) == legacy
+    assert encode_events(None) is None and decode_events(None) is None
+    assert encode_events([]) == []
+    stored = encode_events(kills())
+    assert encode_events(stored) is stored  # Already encoded
+
+
+def test_column_round_trip(clean_db):
+    from database import Mission, PlayerStat, SyncSessionLocal
+    with SyncSessionLocal() as session:
+        mission = Mission(file_name="codec.json", file_date="2026_01_01", mission_name="Codec")
+        session.add(mission)
+        session.flush()
+        session.add(PlayerStat(mission_id=mission.id, name="Wolf", victims_players=kills(), destroyed_vehicles=[]))
+        session.commit()
+    with SyncSessionLocal() as session:
+        row = session.query(PlayerStat).filter_by(name="Wolf").one()
+        assert row.victims_players == rounded(kills())
+        assert row.destroyed_vehicles == []
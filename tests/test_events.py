@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+from logic.events import GAP_WAIT_SECONDS, deliverable
+
+
+def rows(*ids, created_at=100.0):
+    return [SimpleNamespace(id=i, created_at=created_at) for i in ids]
+
+
+def test_rows_behind_a_fresh_gap_are_held():
+    assert deliverable(rows(11, 13, 14), seq=10, now=100.0) == [11]
+
+
+def test_rows_behind_an_old_gap_go_out():
+    assert deliverable(rows(11, 13, 14), seq=10, now=100.0 + GAP_WAIT_SECONDS) == [11, 13, 14]
+
+
+def test_already_delivered_ids_are_skipped():
+    assert deliverable(rows(9, 10, 11), seq=10, now=100.0) == [11]
+
+
+def test_relay_retries_a_failing_first_read(clean_db, monkeypatch):
+    import asyncio
+
+    from sqlalchemy.exc import OperationalError
+
+    from database import SyncSessionLocal, init_db
+    from logic import cache, events
+    from logic.events import broadcaster, record_event, relay_events
+
+    asyncio.run(init_db())  # Baseline row
+    calls = 0
+    real_sessions = events.ReadSessionLocal
+
+    def flaky_sessions():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise OperationalError("SELECT max(id) FROM event_log", {}, Exception("database is locked"))
+        return real_sessions()
+
+    monkeypatch.setattr(events, "ReadSessionLocal", flaky_sessions)
+    monkeypatch.setattr(events, "EVENT_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(cache, "_data_version", None)
+    monkeypatch.setattr(broadcaster, "seq", 0)
+    monkeypatch.setattr(broadcaster, "buffer", type(broadcaster.buffer)(maxlen=broadcaster.buffer.maxlen))
+
+    async def wait_for(condition):
+        for _ in range(300):
+            if condition():
+                return True
+            await asyncio.sleep(0.01)
+        return False
+
+    async def scenario():
+        task = asyncio.create_task(relay_events())
+        try:
+            assert await wait_for(lambda: cache.data_version()[0] is not None)
+            with SyncSessionLocal() as session:
+                record_event(session, "data_changed", {"scope": "test"})
+                session.commit()
+            assert await wait_for(lambda: len(broadcaster.buffer) == 1)
+        finally:
+            task.cancel()
+
+    asyncio.run(scenario())
+    assert calls > 2
+    assert [kind for _, kind, _ in broadcaster.buffer] == ["data_changed"]  # Not the baseline row
@@ -0,0 +1,114 @@
+import pytest
+from sqlalchemy import select
+
+from database import AppConfig, LeaderboardEntry, Mission, PlayerStat, SyncSessionLocal, set_app_config_sync
+from logic import leaderboards
+from logic.leaderboards import ALL_TIME
+
+
+@pytest.fixture
+def thresholds(clean_db):
+    """Set leaderboard thresholds for a test, restore the previous values afterwards"""
+    keys = list(leaderboards.THRESHOLD_DEFAULTS)
+    with SyncSessionLocal() as session:
+        saved = {k: session.get(AppConfig, k).value if session.get(AppConfig, k) else None for k in keys}
+
+    def apply(**values):
+        for key, value in values.items():
+            set_app_config_sync(key, str(value))
+
+    yield apply
+    for key, value in saved.items():
+        set_app_config_sync(key, value)
+
+
+def play(session, n, file_date="2026_01_01", duration=3600.0, **players):
+    """One mission; players: name=(frags, deaths)"""
+    mission = Mission(file_name=f"lb{n}.json", file_date=file_date, mission_name=f"M{n}", duration_time=duration)
+    session.add(mission)
+    session.flush()
+    for name, (frags, deaths) in players.items():
+        session.add(PlayerStat(mission_id=mission.id, name=name, squad="ЖУК", frags=frags, frags_inf=frags,
+                               death=deaths, distance=10.0))
+    session.flush()
+    leaderboards.record_mission(session, file_date, duration, players)
+    session.commit()
+
+
+def entries(session, scope=ALL_TIME):
+    return {e.name: e for e in session.scalars(select(LeaderboardEntry).where(LeaderboardEntry.scope == scope))}
+
+
+def test_record_mission_recounts_totals(thresholds):
+    thresholds(LEADERBOARD_MIN_MISSIONS=1, LEADERBOARD_KD_MIN_DEATHS=0)
+    with SyncSessionLocal() as session:
+        play(session, 1, Anna=(3, 1), Bob=(0, 2))
+        play(session, 2, Anna=(2, 1))
+        play(session, 3, duration=50.0, Anna=(10, 0))  # Too short to count
+        rows = entries(session)
+        assert (rows["Anna"].missions, rows["Anna"].frags, rows["Anna"].deaths, rows["Anna"].kd) == (2, 5, 2, 2.5)
+        assert (rows["Bob"].missions, rows["Bob"].kd) == (1, 0.0)
+        assert rows["Anna"].distance == 20.0
+
+
+def test_equal_values_share_a_rank(thresholds):
+    thresholds(LEADERBOARD_MIN_MISSIONS=1, LEADERBOARD_KD_MIN_DEATHS=0)
+    with SyncSessionLocal() as session:
+        play(session, 1, Dan=(5, 1), Anna=(5, 1), Cid=(5, 5), Bob=(1, 1))
+        rows = entries(session)
+        assert {n: e.rank_frags for n, e in rows.items()} == {"Anna": 1, "Cid": 1, "Dan": 1, "Bob": 4}
+        assert {n: e.rank_kd for n, e in rows.items()} == {"Anna": 1, "Dan": 1, "Cid": 3, "Bob": 3}
+
+
+def test_thresholds_decide_who_is_ranked(thresholds):
+    thresholds(LEADERBOARD_MIN_MISSIONS=2, LEADERBOARD_KD_MIN_DEATHS=3)
+    with SyncSessionLocal() as session:
+        play(session, 1, Anna=(4, 1), Bob=(1, 2))
+        play(session, 2, Anna=(4, 1), Bob=(1, 2))
+        play(session, 3, Cid=(9, 0))
+        rows = entries(session)
+        assert rows["Cid"].rank_frags is None  # One mission
+        assert rows["Anna"].rank_frags == 1 and rows["Anna"].rank_kd is None  # Only 2 deaths
+        assert rows["Bob"].rank_kd == 1
+
+    thresholds(LEADERBOARD_MIN_MISSIONS=1, LEADERBOARD_KD_MIN_DEATHS=0)
+    with SyncSessionLocal() as session:
+        leaderboards.rerank_all(session)
+        session.commit()
+        rows = entries(session)
+        assert (rows["Cid"].rank_frags, rows["Anna"].rank_frags, rows["Anna"].rank_kd) == (1, 2, 2)
+
+
+def test_pages_walk_tied_ranks_by_name(client, thresholds):
+    thresholds(LEADERBOARD_MIN_MISSIONS=1, LEADERBOARD_KD_MIN_DEATHS=0)
+    with SyncSessionLocal() as session:
+        play(session, 1, **{name: (frags, 1) for name, frags in
+                            [("Eve", 7), ("Anna", 5), ("Dan", 5), ("Cid", 5), ("Bob", 5), ("Fay", 1)]})
+
+    seen, cursor = [], None
+    while True:
+        url = "/leaderboard/frags?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url).json()
+        assert page["total"] == 6
+        seen += [(row["rank"], row["name"]) for row in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [(1, "Eve"), (2, "Anna"), (2, "Bob"), (2, "Cid"), (2, "Dan"), (6, "Fay")]
+
+
+def test_top_players_come_from_the_leaderboard(client, thresholds):
+    thresholds(LEADERBOARD_MIN_MISSIONS=1, LEADERBOARD_KD_MIN_DEATHS=0)
+    with SyncSessionLocal() as session:
+        play(session, 1, Anna=(6, 1), Bob=(9, 3), Cid=(2, 2))
+    top = client.get("/players/top/?limit=2").json()
+    assert [(p["name"], p["kd_ratio"], p["total_missions"]) for p in top] == [("Anna", 6.0, 1), ("Bob", 3.0, 1)]
+    assert [p["name"] for p in client.get("/players/top/?category=infantry").json()] == ["Anna", "Bob"]
+
+    thresholds(LEADERBOARD_MIN_MISSIONS=2)
+    with SyncSessionLocal() as session:
+        leaderboards.rerank_all(session)
+        session.commit()
+    from logic.cache import bump_generation
+    bump_generation()
+    assert client.get("/players/top/").json() == []
@@ -0,0 +1,60 @@
+import time
+
+from sqlalchemy import update
+
+from database import Lease as LeaseRow, SyncSessionLocal
+from logic.lease import Lease
+
+
+def expire(name: str):
+    """What the table looks like once a holder died and its ttl ran out"""
+    with SyncSessionLocal() as session:
+        session.execute(update(LeaseRow).where(LeaseRow.name == name).values(expires_at=time.time() - 1))
+        session.commit()
+
+
+def test_only_one_holder(clean_db):
+    a, b = Lease("test", owner="host-a:1"), Lease("test", owner="host-b:2")
+    assert a.try_acquire()
+    assert not b.try_acquire() and not b.held
+    assert a.renew()  # Renewing your own lease works any time
+    assert b.holder() == "host-a:1"
+
+
+def test_expired_lease_is_taken_over(clean_db):
+    a, b = Lease("test", owner="host-a:1"), Lease("test", owner="host-b:2")
+    assert a.try_acquire()
+    expire("test")
+    assert a.holder() is None
+    assert b.try_acquire()
+    assert b.holder() == "host-b:2"
+    assert not a.renew() and not a.held  # The old holder finds out on its next renewal
+
+
+def test_release_frees_the_lease_right_away(clean_db):
+    a, b = Lease("test", owner="host-a:1"), Lease("test", owner="host-b:2")
+    assert a.try_acquire()
+    a.release()
+    assert not a.held
+    assert b.try_acquire()
+
+
+def test_keep_alive_holds_past_the_ttl_and_notices_a_takeover(clean_db):
+    a, b = Lease("test", ttl=1, owner="host-a:1"), Lease("test", ttl=1, owner="host-b:2")
+    assert a.try_acquire()
+    a.keep_alive()
+    try:
+        time.sleep(1.5)
+        assert not b.try_acquire()
+        assert a.held
+
+        # Renewals stalled past the ttl (e.g. a long pause) and b took over meanwhile
+        with SyncSessionLocal() as session:
+            session.execute(update(LeaseRow).where(LeaseRow.name == "test")
+                            .values(owner="host-b:2", expires_at=time.time() + 60))
+            session.commit()
+        time.sleep(0.5)  # a's next renewal fails
+        assert not a.held
+        assert b.holder() == "host-b:2"
+    finally:
+        a.stop_keep_alive()
@@ -0,0 +1,70 @@
+import re
+
+from api.routers import metrics as metrics_router
+from logic.metrics import CONTENT_TYPE, MISSIONS_INGESTED
+
+NAME = r"[a-zA-Z_:][a-zA-Z0-9_:]*"
+LABEL = rf'{NAME}="(?:[^"\\\n]|\\["\\n])*"'
+SAMPLE = re.compile(rf"^({NAME})(\{{{LABEL}(?:,{LABEL})*\}})? (\S+)$")
+SUFFIXES = {"histogram": ("_bucket", "_sum", "_count"), "summary": ("_sum", "_count")}
+
+
+def parse(text: str) -> dict:
+    """family -> (type, [(sample name, labels text, value)]), checking the text format on the way"""
+    assert text.endswith("\n")
+    families, helped = {}, set()
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            name = line.split(" ", 3)[2]
+            assert name not in helped, f"HELP twice: {line}"
+            helped.add(name)
+        elif line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert kind in ("counter", "gauge", "histogram", "summary", "untyped"), line
+            assert name not in families, f"TYPE twice: {line}"
+            families[name] = (kind, [])
+        else:
+            assert not line.startswith("#"), f"collector failed: {line}"
+            match = SAMPLE.match(line)
+            assert match, f"bad sample line: {line!r}"
+            name, labels, value = match.groups()
+            float(value.replace("+Inf", "inf"))
+            owner = next((f for f, (kind, _) in families.items()
+                          if name == f or name in (f + s for s in SUFFIXES.get(kind, ()))), None)
+            assert owner, f"sample without a TYPE: {line}"
+            families[owner][1].append((name, labels or "", value))
+    return families
+
+
+def test_metrics_scrape(client):
+    client.get("/missions/")  # One timed route
+    MISSIONS_INGESTED.inc(result="added")
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"] == CONTENT_TYPE
+
+    families = parse(res.text)
+    for name, kind in [
+        ("vostokstat_http_request_duration_seconds", "histogram"),
+        ("vostokstat_http_request_queries_total", "counter"),
+        ("vostokstat_cache_hits_total", "counter"),
+        ("vostokstat_cache_hit_ratio", "gauge"),
+        ("vostokstat_missions_ingested_total", "counter"),
+        ("vostokstat_ingest_rounds_total", "counter"),
+        ("vostokstat_ingest_requests_pending", "gauge"),
+    ]:
+        assert families[name][0] == kind, name
+
+    route = [s for s in families["vostokstat_http_request_duration_seconds"][1] if 'route="/missions/"' in s[1]]
+    assert any(name.endswith("_bucket") and 'le="+Inf"' in labels for name, labels, _ in route)
+    assert any(name.endswith("_count") and float(value) >= 1 for name, _, value in route)
+    assert {labels for _, labels, _ in families["vostokstat_cache_hits_total"][1]} >= {'{cache="response"}'}
+    assert families["vostokstat_ingest_requests_pending"][1] == [("vostokstat_ingest_requests_pending", "", "0")]
+
+
+def test_metrics_token(client, monkeypatch):
+    # Read from VOSTOKSTAT_METRICS_TOKEN at import
+    monkeypatch.setattr(metrics_router, "METRICS_TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
@@ -0,0 +1,60 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from api.pagination import decode_cursor, encode_cursor, page_list, page_result, paginate
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2026_01_01", 42, "Жук")
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 3) == ["2026_01_01", 42, "Жук"]
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", encode_cursor(1, 2), encode_cursor(1, 2, 3, 4), "e30"])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, 3)
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_cover_every_row_once_with_ties(clean_db, descending):
+    from database import Mission, SyncSessionLocal
+    with SyncSessionLocal() as session:
+        # Several missions per date: the id breaks the tie
+        for i in range(11):
+            session.add(Mission(file_name=f"m{i}.json", file_date=f"2026_01_0{i % 3 + 1}", mission_name=f"M{i}"))
+        session.commit()
+        expected = sorted(session.execute(select(Mission.file_date, Mission.id)).all(), reverse=descending)
+
+        seen, cursor = [], None
+        while True:
+            stmt = paginate(select(Mission), [Mission.file_date, Mission.id], cursor, 0, 4, descending)
+            rows, cursor = page_result(session.scalars(stmt).all(), 4, lambda m: (m.file_date, m.id))
+            seen += [(m.file_date, m.id) for m in rows]
+            if cursor is None:
+                break
+    assert seen == [tuple(r) for r in expected]
+
+
+def test_skip_without_cursor(clean_db):
+    from database import Mission, SyncSessionLocal
+    with SyncSessionLocal() as session:
+        session.add_all(Mission(file_name=f"m{i}.json", file_date="2026_01_01", mission_name=f"M{i}") for i in range(5))
+        session.commit()
+        stmt = paginate(select(Mission.id), [Mission.id], None, 3, 10, descending=False)
+        ids = session.scalars(stmt).all()
+        assert len(ids) == 2
+
+
+def test_page_list():
+    items = list(range(7))
+    first = page_list(items, None, 3)
+    assert first["items"] == [0, 1, 2] and first["total"] == 7
+    second = page_list(items, first["next_cursor"], 3)
+    last = page_list(items, second["next_cursor"], 3)
+    assert second["items"] == [3, 4, 5]
+    assert last == {"items": [6], "total": 7, "next_cursor": None}
+    with pytest.raises(HTTPException):
+        page_list(items, encode_cursor(-1), 3)
@@ -0,0 +1,33 @@
+from database import Mission, PlayerStat, SearchEntry, SyncSessionLocal
+
+
+def add_missions(*players):
+    with SyncSessionLocal() as session:
+        for i, name in enumerate(players):
+            mission = Mission(file_name=f"p{i}.json", file_date=f"2026_01_0{i + 1}", mission_name=f"M{i}",
+                              map_name="altis", duration_time=3600.0)
+            session.add(mission)
+            session.flush()
+            session.add(PlayerStat(mission_id=mission.id, name=name, squad="ЖУК", side="WEST", frags=2, death=1))
+        session.commit()
+
+
+def test_profile_without_a_search_index_entry(client):
+    add_missions("Волк", "Волк")  # Ingested, the index not rebuilt yet
+    for requested in ("Волк", "вОЛК"):
+        res = client.get(f"/players/{requested}")
+        assert res.status_code == 200, requested
+        assert res.json()["total_missions"] == 2
+
+
+def test_stale_index_entry_does_not_hide_a_player(client):
+    add_missions("Wolf", "Wolf")
+    with SyncSessionLocal() as session:
+        # Spelling from before an admin rename, no rows have it any more
+        session.add(SearchEntry(kind="player", key="wolf", name="WOLF", weight=1))
+        session.commit()
+    assert client.get("/players/wolf").json()["total_missions"] == 2
+    profiles = client.post("/players/batch", json={"names": ["Wolf", "Nobody"]}).json()
+    assert profiles["Wolf"]["total_missions"] == 2
+    assert profiles["Nobody"] is None
+    assert client.get("/players/Nobody").status_code == 404
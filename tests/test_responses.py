@@ -0,0 +1,80 @@
+from typing import Dict, List, Optional
+
+import pytest
+from pydantic import BaseModel, Field
+
+from api import responses
+from api.responses import build_shape, trim
+from database import GlobalSquad, Mission, MissionSquadStat, PlayerStat, SyncSessionLocal
+
+
+class Member(BaseModel):
+    name: str
+    frags: int = 0
+    distance: float = 0.0
+
+
+class Squad(BaseModel):
+    tag: str
+    members: List[Member] = Field(default=[], alias="squad_players")
+    leader: Optional[Member] = None
+
+
+def test_trim_keeps_model_fields_only():
+    shape = build_shape(Dict[str, Optional[List[Squad]]])
+    value = {"a": [{"tag": "ЖУК", "internal": 1, "squad_players": [{"name": "Wolf", "distance": 12, "OcapPos": {"x": 1}}]}], "b": None}
+    full = trim(value, shape, fill_defaults=True)
+    assert full == {
+        "a": [{"tag": "ЖУК", "squad_players": [{"name": "Wolf", "frags": 0, "distance": 12.0}], "leader": None}], "b": None,
+    }
+    assert type(full["a"][0]["squad_players"][0]["distance"]) is float
+    assert trim(value, shape, fill_defaults=False) == {
+        "a": [{"tag": "ЖУК", "squad_players": [{"name": "Wolf", "distance": 12.0}]}], "b": None,
+    }
+
+
+def kill(victim, frame):
+    return {"name": victim, "weapon": "AK-74", "distance": 40, "kill_type": "kill", "frame": frame, "time": frame / 2,
+            "position": {"x": 1.5, "y": 2.5}, "OcapPos": {"x": 1.5, "y": 2.5}, "killer_name": "Wolf"}
+
+
+@pytest.fixture
+def mission(client):
+    with SyncSessionLocal() as session:
+        session.add(GlobalSquad(name="ЖУК", tags=["жук"]))
+        for n in range(3):
+            m = Mission(file_name=f"r{n}.json", file_date=f"2026_02_0{n + 1}", mission_name="Rally", world_name="altis",
+                        map_name="altis", game_type="tvt", duration_frames=7200, duration_time=3600.0,
+                        total_players=2, west_count=1, east_count=1, guer_count=0)
+            session.add(m)
+            session.flush()
+            session.add(PlayerStat(mission_id=m.id, player_uid=1, name="Wolf", side="WEST", squad="ЖУК", frags=2,
+                                   death=1, distance=12, victims_players=[kill("Bob", 10), kill("Eve", 20)]))
+            session.add(PlayerStat(mission_id=m.id, player_uid=2, name="Bob", side="EAST", squad="ЖУК", frags=0,
+                                   death=1, distance=3, death_events=[kill("Bob", 10)]))
+            session.add(MissionSquadStat(mission_id=m.id, squad_tag="ЖУК", side="WEST", frags=2, death=2,
+                                         squad_players=[{"name": "Wolf", "frags": 2, "death": 1, "tk": 0,
+                                                         "distance": 12, "extra": "x"}]))
+        session.commit()
+        return session.query(Mission.id).filter_by(file_name="r0.json").scalar()
+
+
+def test_strict_and_fast_responses_match(client, mission, monkeypatch):
+    requests = [
+        ("get", f"/missions/{mission}?include=events", None),
+        ("get", "/players/Wolf", None),
+        ("post", "/players/batch", {"names": ["Wolf", "Bob", "Nobody"]}),
+        ("get", "/squads/top", None),
+        ("get", "/squads/ЖУК", None),
+    ]
+    for method, path, body in requests:
+        fast = getattr(client, method)(path, json=body) if body else getattr(client, method)(path)
+        monkeypatch.setattr(responses, "STRICT_RESPONSES", True)
+        strict = getattr(client, method)(path, json=body) if body else getattr(client, method)(path)
+        monkeypatch.setattr(responses, "STRICT_RESPONSES", False)
+        assert fast.status_code == strict.status_code == 200, path
+        assert fast.content == strict.content, path
+
+    detail = client.get(f"/missions/{mission}?include=events").json()
+    assert "OcapPos" not in detail["players"][0]["victims_players"][0]
+    assert "extra" not in detail["squads"][0]["squad_players"][0]
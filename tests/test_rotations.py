@@ -0,0 +1,18 @@
+def test_active_rotation_is_public(admin_client):
+    assert admin_client.get("/rotations/active").json() is None
+
+    created = admin_client.post("/admin/rotations/", json={
+        "name": "Season 1", "start_date": "2026-01-01", "end_date": "2026-03-31", "is_active": True, "squad_ids": [],
+    })
+    assert created.status_code == 200
+
+    admin_client.post("/admin/auth/logout")
+    res = admin_client.get("/rotations/active")
+    assert res.status_code == 200
+    assert res.json()["id"] == created.json()["id"]
+    assert res.json()["name"] == "Season 1"
+
+
+def test_admin_rotation_routes_need_a_login(client):
+    assert client.get("/admin/rotations/").status_code == 401
+    assert client.get("/admin/rotations/active").status_code != 200
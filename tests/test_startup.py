@@ -0,0 +1,62 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from database import Mission, PlayerStat, SyncSessionLocal, set_app_config_sync
+from logic import download_mission
+from logic.leaderboards import ensure_leaderboards
+from logic.search_index import ensure_search_index
+from logic.squad_history import ensure_squad_history
+
+# Lifespan startup plus the first GET on a small, up-to-date DB; generous for slow CI
+FIRST_REQUEST_BOUND = 5.0
+
+
+@pytest.fixture
+def synced_db(clean_db):
+    """A DB as left by earlier runs: missions, derived tables built, watermark set"""
+    with SyncSessionLocal() as session:
+        for n in range(3):
+            mission = Mission(file_name=f"s{n}.json", file_date=f"2026_03_0{n + 1}", mission_name=f"M{n}",
+                              world_name="altis", map_name="altis", game_type="tvt", duration_frames=7200,
+                              duration_time=3600.0)
+            session.add(mission)
+            session.flush()
+            session.add(PlayerStat(mission_id=mission.id, name="Wolf", squad="ЖУК", frags=1, death=1))
+        session.commit()
+    ensure_search_index()
+    ensure_squad_history()
+    ensure_leaderboards()
+    set_app_config_sync(download_mission.WATERMARK_KEY, "2026-03-03")
+    yield
+    set_app_config_sync(download_mission.WATERMARK_KEY, None)
+
+
+def test_startup_on_a_synced_db(synced_db, monkeypatch, capsys):
+    import api.main
+
+    rounds = []
+
+    def fake_round(mode="init", lease=None):
+        rounds.append(mode)
+        return True
+
+    monkeypatch.setattr(download_mission, "main", fake_round)
+    monkeypatch.setattr(api.main, "EMBEDDED_INGEST", True)
+    monkeypatch.setattr(api.main, "INGEST_START_DELAY", 0)
+
+    started = time.perf_counter()
+    with TestClient(api.main.app) as client:
+        res = client.get("/missions/")
+        first_request = time.perf_counter() - started
+        for _ in range(200):  # The first ingestion round runs in the background
+            if rounds:
+                break
+            time.sleep(0.01)
+
+    assert res.status_code == 200
+    assert len(res.json()) == 3
+    assert first_request < FIRST_REQUEST_BOUND
+    assert rounds == ["update"]  # Catches up from the watermark, no initial sync
+    assert "Building" not in capsys.readouterr().out  # Nothing rebuilt at startup
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import time
+
+from sqlalchemy import func, select
+
+from database import (
+    SQLITE_PRAGMAS, WRITE_LOCK, AppConfig, GlobalSquad, SyncSessionLocal, get_write_db, writer_lock,
+)
+from logic import storage_bench
+
+
+def test_tuned_profile_reads_and_writes_concurrently():
+    result = storage_bench.run("tuned", SQLITE_PRAGMAS, seconds=1.0, readers=2)
+    assert result["missions_written"] > 0
+    assert result["reads"] > 0
+    assert result["read_errors"] == 0
+    assert result["write_errors"] == 0
+
+
+async def admin_write(name: str):
+    # The same dependency the admin routes use
+    gen = get_write_db()
+    db = await gen.__anext__()
+    try:
+        db.add(GlobalSquad(name=name))
+        await db.commit()
+    finally:
+        await gen.aclose()
+
+
+def test_admin_write_waits_for_a_long_ingest_write(clean_db, monkeypatch):
+    # busy_timeout shorter than the ingest write: without WRITE_LOCK the edit fails
+    # with "database is locked"
+    monkeypatch.setenv("VOSTOKSTAT_SQLITE_BUSY_TIMEOUT", "200")
+    from database import engine, sync_engine
+    sync_engine.dispose()
+    asyncio.run(engine.dispose())
+
+    started = threading.Event()
+
+    def ingest():
+        with writer_lock(), SyncSessionLocal() as session:
+            session.add(AppConfig(key="TEST_INGEST_MARK", value="1"))
+            session.flush()  # The write transaction is open from here
+            started.set()
+            time.sleep(0.6)
+            session.commit()
+
+    thread = threading.Thread(target=ingest)
+    thread.start()
+    started.wait()
+    try:
+        asyncio.run(admin_write("ADMIN_EDIT"))
+    finally:
+        thread.join()
+
+    assert not WRITE_LOCK.locked()
+    with SyncSessionLocal() as session:
+        assert session.scalar(select(func.count()).where(GlobalSquad.name == "ADMIN_EDIT")) == 1
+        session.delete(session.get(AppConfig, "TEST_INGEST_MARK"))
+        session.commit()
+    sync_engine.dispose()
+    asyncio.run(engine.dispose())